@@ -1,41 +1,103 @@
 #　下載功能
 from __future__ import annotations
 import os
+import hashlib
 import zipfile
 import requests
 import threading
+from urllib3.exceptions import MaxRetryError
 import calendar
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
+from GDELT_helper.inventory import LANDED_SUFFIXES
+from GDELT_helper.download.session import get_session, backoff_delay, RETRY_STATUSES, PROBE_RETRY_TOTAL
+
 
 BASE_URL = "http://data.gdeltproject.org/events/"
 REQUEST_TIMEOUT = 30
+MAX_ATTEMPTS = 4
+CHUNK_SIZE = 1024 * 256
+PART_SUFFIX = ".part"
+_RESTART = -1  # _fetch_to_part：.part 與伺服器不一致，已刪除需重抓
+
+# download_one 回傳狀態
+STATUS_DOWNLOADED = "downloaded"
+STATUS_SKIPPED = "skipped"
+STATUS_MISSING = "missing"
+STATUS_FAILED = "failed"
+STATUS_STOPPED = "stopped"
 
-def unzip_and_cleanup(file_path, out_dir, log):
+def unzip_and_cleanup(file_path, out_dir, log, inventory=None):
+    """
+    解壓後刪除壓縮檔；成功時回傳壓縮檔內的 ZipInfo 清單（供驗證大小），失敗回傳 None。
+    損壞的壓縮檔同樣刪除，下次執行會重新下載，而不是一再解壓同一個壞檔。
+    """
+    name = os.path.basename(file_path)
     try:
         with zipfile.ZipFile(file_path, 'r') as zip_ref:
             zip_ref.extractall(out_dir)
-        os.remove(file_path)
-        log(f"解壓完成並刪除壓縮檔：{os.path.basename(file_path)}")
+            infos = zip_ref.infolist()
     except zipfile.BadZipFile:
-        log(f"解壓縮失敗：{os.path.basename(file_path)}")
+        log(f"解壓縮失敗，已刪除待重新下載：{name}")
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        if inventory is not None:
+            inventory.discard(name)
+        return None
+    os.remove(file_path)
+    log(f"解壓完成並刪除壓縮檔：{name}")
+    if inventory is not None:
+        inventory.discard(name)
+        for info in infos:
+            inventory.add(info.filename)
+    return infos
+
+
+def check_zip(file_path, log, inventory=None):
+    """
+    保留壓縮檔模式：不解壓，只確認壓縮檔的目錄可讀且含 CSV（CRC 在資料處理讀取時檢查）。
+    成功時回傳 ZipInfo 清單；損壞的壓縮檔會刪除待下次重新下載，回傳 None。
+    """
+    name = os.path.basename(file_path)
+    try:
+        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            infos = zip_ref.infolist()
+    except zipfile.BadZipFile:
+        log(f"壓縮檔損壞，已刪除待重新下載：{name}")
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        if inventory is not None:
+            inventory.discard(name)
+        return None
+    if not any(not i.is_dir() and i.filename.lower().endswith(".csv") for i in infos):
+        log(f"壓縮檔內沒有 CSV：{name}")
+        return None
+    log(f"保留壓縮檔：{name}")
+    return infos
 
 
 def is_extracted(out_dir, base_filename):
     try:
         for f in os.listdir(out_dir):
-            if f.startswith(str(base_filename)) and f.lower().endswith(".csv"):
+            if f.startswith(str(base_filename)) and f.lower().endswith(LANDED_SUFFIXES):
                 return True
     except FileNotFoundError:
         return False
     return False
 
 
-def server_has(base_filename):
+def server_has(base_filename, session=None):
+    session = session or get_session()
     for suffix in (".export.CSV.zip", ".zip"):
         url = BASE_URL + base_filename + suffix
         try:
-            r = requests.head(url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+            r = session.head(url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
             if r.status_code == 200:
                 return True
         except requests.exceptions.RequestException:
@@ -43,52 +105,237 @@ def server_has(base_filename):
     return False
 
 
-def download_one(base_filename, out_dir, log, stop_event: threading.Event, perfile_cb=None, timeout=REQUEST_TIMEOUT):
+def _connect_exhausted(e):
+    """連線層（session 的 Retry）已重試過仍連不上；外層不必再重試。"""
+    return isinstance(e, requests.exceptions.ConnectionError) and bool(e.args) and isinstance(e.args[0], MaxRetryError)
+
+
+def _content_range_total(value):
+    """解析 Content-Range（如 'bytes 100-199/2000' 或 'bytes */2000'），回傳 (起點, 總長)。"""
+    try:
+        unit, spec = (value or "").split(" ", 1)
+        rng, total = spec.split("/", 1)
+        start = None if rng == "*" else int(rng.split("-", 1)[0])
+        return start, (None if total == "*" else int(total))
+    except ValueError:
+        return None, None
+
+
+def _fetch_to_part(session, url, part_path, stop_event, timeout, hasher=None, on_bytes=None, limiter=None,
+                   on_response=None):
+    """
+    把 url 寫入 part_path；已有部分內容時以 Range 續傳。
+    hasher：hashlib 物件，會涵蓋整個檔案（續傳時先讀入既有內容）。
+    on_bytes(delta)：寫入進度；作廢既有內容時以負值回報。
+    limiter：throttle.RateLimiter，每寫入一塊即扣額度（全域頻寬上限）。
+    on_response(response)：收到回應標頭時呼叫一次（量測 TTFB 與連線層重試用）。
+    回傳 (status_code, expected_total)；expected_total 為伺服器宣告的完整大小（未知為 None）。
+    中止時回傳 (None, None)，.part 保留供下次續傳。
+    """
+    on_bytes = on_bytes or (lambda _n: None)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else None
+    with session.get(url, stream=True, timeout=timeout, headers=headers) as r:
+        if on_response is not None:
+            on_response(r)
+        if r.status_code == 416 and offset:
+            _, total = _content_range_total(r.headers.get("Content-Range"))
+            if total == offset:
+                if hasher is not None:
+                    _hash_file(part_path, hasher)
+                return 200, total
+            os.remove(part_path)  # 本地比伺服器還長：作廢重來
+            on_bytes(-offset)
+            return _RESTART, None
+        if r.status_code == 206:
+            start, total = _content_range_total(r.headers.get("Content-Range"))
+            if start != offset:
+                os.remove(part_path)
+                on_bytes(-offset)
+                return _RESTART, None
+            if hasher is not None:
+                _hash_file(part_path, hasher)
+            mode = "ab"
+        elif r.status_code == 200:
+            length = r.headers.get("Content-Length")
+            total = int(length) if length and length.isdigit() else None
+            mode = "wb"  # 伺服器不支援 Range：從頭寫
+            if offset:
+                on_bytes(-offset)
+        else:
+            return r.status_code, None
+        with open(part_path, mode) as f:
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                if stop_event.is_set():
+                    return None, None
+                if chunk:
+                    f.write(chunk)
+                    if hasher is not None:
+                        hasher.update(chunk)
+                    on_bytes(len(chunk))
+                    if limiter is not None:
+                        limiter.consume(len(chunk), stop_event)
+        return 200, total
+
+
+def _hash_file(path, hasher):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(block)
+
+
+def fetch_one(base_filename, out_dir, log, stop_event: threading.Event, timeout=REQUEST_TIMEOUT,
+              session=None, filename=None, expected_size=None, expected_md5=None, bytes_cb=None, inventory=None,
+              limiter=None, controller=None, metric=None, keep_zip=False):
+    """
+    只負責把單一目標的壓縮檔下載到 out_dir（不解壓）；回傳 (STATUS_*, zip_path)。
+    zip_path 不為 None 代表有待解壓的壓縮檔（剛下載完成，或先前已存在）。
+    傳輸中的內容寫在 <壓縮檔>.part，中止或斷線後以 HTTP Range 續傳；
+    大小與伺服器 Content-Length 相符才改名為 .zip。
+    filename/expected_size/expected_md5：來自官方檔案清單時直接下載該檔（不再猜副檔名），
+    並在寫入時同步計算 MD5 驗證。bytes_cb(delta) 回報位元組進度。
+    inventory：LocalInventory；提供時以索引判斷是否已有檔案，不再逐一列目錄。
+    limiter/controller：throttle.RateLimiter 與 throttle.AdaptiveConcurrency；
+    每次失敗（逾時、5xx、429）都會通知 controller.on_error()。
+    metric：metrics.FileMetric；提供時就地填入檔名、實收位元組、TTFB 與重試次數。
+    keep_zip：保留壓縮檔模式，已有壓縮檔即視為已有此檔案（不再交回待解壓）。
+    """
     if stop_event.is_set():
-        return
-    candidates = [f"{base_filename}.export.CSV.zip", f"{base_filename}.zip"]
-    if is_extracted(out_dir, base_filename):
+        return STATUS_STOPPED, None
+    report = bytes_cb or (lambda _n: None)
+    received = report
+    if metric is not None:
+        def received(delta):
+            if delta > 0:
+                metric.bytes += delta
+            report(delta)
+    candidates = [filename] if filename else [f"{base_filename}.export.CSV.zip", f"{base_filename}.zip"]
+    have = inventory.has_extracted(base_filename) if inventory is not None else is_extracted(out_dir, base_filename)
+    if have:
         log(f"已有此檔案，跳過：{base_filename}")
-        if perfile_cb: perfile_cb(1)
-        return
+        report(expected_size or 0)
+        return STATUS_SKIPPED, None
     os.makedirs(out_dir, exist_ok=True)
+    session = session or get_session()
+    had_error = False
     for filename in candidates:
         if stop_event.is_set():
-            return
+            return STATUS_STOPPED, None
         url = BASE_URL + filename
         zip_path = os.path.join(out_dir, filename)
-        if os.path.exists(zip_path):
-            log(f"已有壓縮檔：{filename} 解壓縮中")
-            unzip_and_cleanup(zip_path, out_dir, log)
-            if perfile_cb: perfile_cb(1)
-            return
-        try:
-            with requests.get(url, stream=True, timeout=timeout) as r:
-                if r.status_code != 200:
-                    continue
-                downloaded = 0
-                chunk_size = 1024 * 256
-                with open(zip_path, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=chunk_size):
-                        if stop_event.is_set():
-                            log(f"已中止下載：{filename}")
-                            try:
-                                f.close()
-                                os.remove(zip_path)
-                            except Exception:
-                                pass
-                            return
-                        if chunk:
-                            f.write(chunk)
-                            downloaded += len(chunk)
-                mb = downloaded / 1024 / 1024
-                log(f"成功下載：{filename}（{mb:.2f} MB）")
-                unzip_and_cleanup(zip_path, out_dir, log)
-                if perfile_cb: perfile_cb(1)
-                return
-        except requests.exceptions.RequestException as e:
-            log(f"下載失敗（{filename}）：{e}")
+        part_path = zip_path + PART_SUFFIX
+        zip_exists = inventory.has(filename) if inventory is not None else os.path.exists(zip_path)
+        if zip_exists and keep_zip:
+            log(f"已有壓縮檔，跳過：{filename}")
+            report(expected_size or 0)
+            return STATUS_SKIPPED, None
+        if zip_exists:
+            log(f"已有壓縮檔：{filename} 待解壓")
+            report(expected_size or 0)
+            return STATUS_SKIPPED, zip_path
+        resumed_from = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if metric is not None:
+            metric.filename, metric.resumed_from = filename, resumed_from
+        if resumed_from:
+            log(f"續傳：{filename}（已有 {resumed_from / 1024 / 1024:.2f} MB）")
+            report(resumed_from)
+        for attempt in range(MAX_ATTEMPTS):
+            if attempt:
+                if metric is not None:
+                    metric.retries += 1
+                delay = backoff_delay(attempt - 1)
+                log(f"重試（{attempt}/{MAX_ATTEMPTS - 1}）：{filename}，{delay:.1f} 秒後")
+                if stop_event.wait(delay):
+                    return STATUS_STOPPED, None
+            hasher = hashlib.md5() if expected_md5 else None
+            on_response = None
+            if metric is not None:
+                sent = time.monotonic()
+                def on_response(r, sent=sent):
+                    metric.ttfb = time.monotonic() - sent
+                    # 連線層（urllib3 Retry）已自動重試的次數
+                    history = getattr(getattr(r.raw, "retries", None), "history", None)
+                    metric.retries += len(history or ())
+            try:
+                status, total = _fetch_to_part(session, url, part_path, stop_event, timeout,
+                                               hasher=hasher, on_bytes=received, limiter=limiter,
+                                               on_response=on_response)
+            except (requests.exceptions.RequestException, OSError) as e:
+                had_error = True
+                log(f"下載失敗（{filename}）：{e}")
+                if controller is not None:
+                    controller.on_error()
+                if _connect_exhausted(e):
+                    log(f"無法連線，放棄：{filename}")
+                    return STATUS_FAILED, None
+                continue
+            if status is None:
+                kept = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                log(f"已中止下載：{filename}（保留 {kept / 1024 / 1024:.2f} MB，下次續傳）")
+                return STATUS_STOPPED, None
+            if status == _RESTART:
+                log(f"續傳位置不符，重新下載：{filename}")
+                resumed_from = 0
+                continue
+            if status in RETRY_STATUSES:
+                # 暫時性錯誤：連線層不重試狀態碼，由這裡退避後重試（只有一層）
+                had_error = True
+                log(f"下載失敗（{filename}）：HTTP {status}")
+                if controller is not None:
+                    controller.on_error()
+                continue
+            if status != 200:
+                break
+            size = os.path.getsize(part_path)
+            if expected_size is not None and total is not None and total != expected_size:
+                log(f"伺服器大小與清單不符（{filename}）：{total:,} / 清單 {expected_size:,} bytes")
+            want = total if total is not None else expected_size
+            if want is not None and size != want:
+                had_error = True
+                log(f"檔案不完整（{filename}）：{size:,} / {want:,} bytes，續傳中")
+                continue
+            if hasher is not None and hasher.hexdigest() != expected_md5.lower():
+                had_error = True
+                log(f"MD5 驗證失敗，重新下載：{filename}")
+                os.remove(part_path)
+                report(-size)
+                resumed_from = 0
+                continue
+            os.replace(part_path, zip_path)
+            if inventory is not None:
+                inventory.add(filename)
+            mb = (size - resumed_from) / 1024 / 1024
+            log(f"成功下載：{filename}（{mb:.2f} MB{'，MD5 相符' if hasher is not None else ''}）")
+            return STATUS_DOWNLOADED, zip_path
+        else:
+            # 重試用盡仍失敗：不再嘗試其他副檔名，避免把暫時錯誤誤判成「找不到」
+            log(f"多次重試仍失敗：{filename}")
+            return STATUS_FAILED, None
     log(f"未找到可用檔案：{base_filename}")
+    return (STATUS_FAILED if had_error else STATUS_MISSING), None
+
+
+def download_one(base_filename, out_dir, log, stop_event: threading.Event, perfile_cb=None, timeout=REQUEST_TIMEOUT,
+                 session=None, filename=None, expected_size=None, expected_md5=None, bytes_cb=None, inventory=None,
+                 limiter=None, controller=None, metric=None, keep_zip=False):
+    """
+    下載並解壓單一目標；回傳 STATUS_* 其中之一。參數同 fetch_one；keep_zip 時不解壓，只檢查壓縮檔。
+    需要下載與解壓並行時請改用 download.pipeline.DownloadPipeline。
+    """
+    status, zip_path = fetch_one(
+        base_filename, out_dir, log, stop_event, timeout=timeout, session=session, filename=filename,
+        expected_size=expected_size, expected_md5=expected_md5, bytes_cb=bytes_cb, inventory=inventory,
+        limiter=limiter, controller=controller, metric=metric, keep_zip=keep_zip,
+    )
+    if zip_path is not None:
+        if keep_zip:
+            if not check_zip(zip_path, log, inventory=inventory):
+                return STATUS_FAILED
+        elif not unzip_and_cleanup(zip_path, out_dir, log, inventory=inventory):
+            return STATUS_FAILED
+    if status in (STATUS_DOWNLOADED, STATUS_SKIPPED) and perfile_cb:
+        perfile_cb(1)
+    return status
 
 
 def enumerate_targets_for_year(year: int):
@@ -117,11 +364,82 @@ def count_total_targets(years):
     return sum(len(enumerate_targets_for_year(int(y))) for y in years)
 
 
-def detect_latest_available_year(max_back_days=540):
+PROBES_PER_ROUND = 8
+LATEST_YEAR_TTL = 6 * 3600
+_latest_cache = {}
+
+
+def cached_latest_year(ttl=LATEST_YEAR_TTL):
+    """回傳仍在有效期內的偵測結果；沒有則回傳 None。"""
+    hit = _latest_cache.get("year")
+    if hit and time.time() - hit[1] <= ttl:
+        return hit[0]
+    return None
+
+
+def _latest_date_in_manifest(manifest):
+    dates = []
+    for name in manifest:
+        base = str(name).split(".", 1)[0]
+        if len(base) == 8 and base.isdigit():
+            dates.append(base)
+    if not dates:
+        return None
+    return datetime.strptime(max(dates), "%Y%m%d").date()
+
+
+def _probe_offsets(today, offsets, session):
+    """同時探測多個「往前第 n 天」，回傳 {n: 是否存在}。"""
+    offsets = sorted(set(offsets))
+    with ThreadPoolExecutor(max_workers=min(PROBES_PER_ROUND, len(offsets))) as pool:
+        found = pool.map(lambda n: server_has((today - timedelta(days=n)).strftime("%Y%m%d"), session=session), offsets)
+        return dict(zip(offsets, found))
+
+
+def detect_latest_available_year(max_back_days=540, manifest=None, session=None, ttl=LATEST_YEAR_TTL):
+    """
+    偵測伺服器上最新資料的年份。
+    有檔案清單時直接取最新日期；否則以「先近後遠、倍增回溯」找出有檔案的區間，
+    再在區間內多點二分，總請求數約為數十個 HEAD，且每輪並行送出。
+    結果在 ttl 秒內快取，重複呼叫不再連線。
+    """
+    cached = cached_latest_year(ttl)
+    if cached is not None:
+        return cached
     today = datetime.now(timezone.utc).date()
-    for i in range(max_back_days + 1):
-        dt = today - timedelta(days=i)
-        base = dt.strftime("%Y%m%d")
-        if server_has(base):
-            return dt.year
-    return today.year
\ No newline at end of file
+
+    latest = _latest_date_in_manifest(manifest) if manifest else None
+    if latest is None:
+        session = session or get_session(pool_size=PROBES_PER_ROUND, retries=PROBE_RETRY_TOTAL)
+        # 第一輪：最近幾天（通常就能命中）
+        near = list(range(min(PROBES_PER_ROUND, max_back_days + 1)))
+        found = _probe_offsets(today, near, session)
+        hits = [n for n in near if found[n]]
+        if hits:
+            latest = today - timedelta(days=min(hits))
+        else:
+            # 第二輪：倍增回溯，找出「缺 lo、有 hi」的區間
+            lo, far, n = near[-1], [], near[-1] * 2 if near[-1] else 1
+            while n < max_back_days:
+                far.append(n)
+                n *= 2
+            far.append(max_back_days)
+            far = [n for n in far if n > lo]
+            found = _probe_offsets(today, far, session) if far else {}
+            hi = next((n for n in sorted(found) if found[n]), None)
+            if hi is not None:
+                lo = max([n for n in found if n < hi and not found[n]] + [lo])
+                # 多點二分：每輪在 (lo, hi) 內同時探測數個點
+                while hi - lo > 1 and (today - timedelta(days=lo + 1)).year != (today - timedelta(days=hi)).year:
+                    step = max(1, (hi - lo) // (PROBES_PER_ROUND + 1))
+                    points = list(range(lo + step, hi, step))[:PROBES_PER_ROUND]
+                    found = _probe_offsets(today, points, session)
+                    new_hi = next((n for n in points if found[n]), hi)
+                    lo = max([n for n in points if n < new_hi and not found[n]] + [lo])
+                    hi = new_hi
+                latest = today - timedelta(days=hi)
+
+    year = latest.year if latest is not None else today.year
+    if latest is not None:
+        _latest_cache["year"] = (year, time.time())
+    return year
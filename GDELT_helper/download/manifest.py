@@ -0,0 +1,127 @@
+# 官方檔案清單（md5sums / filesizes）
+from __future__ import annotations
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+from GDELT_helper.download import core
+from GDELT_helper.download.session import get_session
+
+MANIFEST_FILES = ("md5sums", "filesizes")
+MANIFEST_CACHE_NAME = ".gdelt_manifest.json"
+MANIFEST_TTL = 6 * 3600
+
+_FILE_RE = re.compile(r'^(\d{4}|\d{6}|\d{8})(?:\.export\.CSV)?\.zip$')
+_MD5_RE = re.compile(r'^[0-9a-fA-F]{32}$')
+
+
+@dataclass
+class ManifestEntry:
+    filename: str
+    size: Optional[int] = None
+    md5: Optional[str] = None
+
+    @property
+    def base(self) -> str:
+        return self.filename.split(".", 1)[0]
+
+    @property
+    def year(self) -> int:
+        return int(self.base[:4])
+
+
+def parse_manifest(md5_text: str = "", sizes_text: str = "") -> Dict[str, ManifestEntry]:
+    """
+    解析官方 md5sums 與 filesizes（每行「值 檔名」，欄位順序不拘），合併成 {檔名: ManifestEntry}。
+    只保留事件資料壓縮檔（1979.zip、200601.zip、20130401.export.CSV.zip）。
+    """
+    entries: Dict[str, ManifestEntry] = {}
+
+    def entry_for(tokens):
+        name = next((t for t in tokens if _FILE_RE.match(os.path.basename(t))), None)
+        if name is None:
+            return None, []
+        name = os.path.basename(name)
+        rest = [t for t in tokens if os.path.basename(t) != name]
+        return entries.setdefault(name, ManifestEntry(name)), rest
+
+    for line in (md5_text or "").splitlines():
+        e, rest = entry_for(line.split())
+        if e is not None:
+            e.md5 = next((t.lower() for t in rest if _MD5_RE.match(t)), e.md5)
+    for line in (sizes_text or "").splitlines():
+        e, rest = entry_for(line.split())
+        if e is not None:
+            e.size = next((int(t) for t in rest if t.isdigit()), e.size)
+    return entries
+
+
+def fetch_manifest(session=None, timeout=core.REQUEST_TIMEOUT) -> Dict[str, ManifestEntry]:
+    session = session or get_session()
+    texts = []
+    for name in MANIFEST_FILES:
+        r = session.get(core.BASE_URL + name, timeout=timeout)
+        r.raise_for_status()
+        texts.append(r.text)
+    entries = parse_manifest(*texts)
+    if not entries:
+        raise ValueError("檔案清單為空或格式不符")
+    return entries
+
+
+def _read_cache(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = {e["filename"]: ManifestEntry(**e) for e in data.get("entries", [])}
+    return float(data.get("fetched_at", 0)), entries
+
+
+def load_manifest(cache_dir: str, max_age: float = MANIFEST_TTL, session=None, log=None) -> Optional[Dict[str, ManifestEntry]]:
+    """
+    取得檔案清單：快取未過期直接用；否則重新抓取並寫回 cache_dir。
+    抓取失敗時退回過期快取；完全沒有可用清單則回傳 None（呼叫端改用日曆推算）。
+    """
+    log = log or (lambda _msg: None)
+    path = os.path.join(cache_dir, MANIFEST_CACHE_NAME)
+    cached = None
+    try:
+        fetched_at, cached = _read_cache(path)
+        if time.time() - fetched_at <= max_age:
+            return cached
+    except (OSError, ValueError, KeyError, TypeError):
+        cached = None
+
+    try:
+        entries = fetch_manifest(session=session)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        if cached:
+            log(f"檔案清單更新失敗，沿用舊快取：{e}")
+            return cached
+        log(f"無法取得檔案清單：{e}")
+        return None
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": time.time(), "entries": [asdict(e) for e in entries.values()]}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        log(f"檔案清單快取寫入失敗：{e}")
+    log(f"已更新檔案清單：{len(entries)} 檔")
+    return entries
+
+
+def plan_targets(manifest: Dict[str, ManifestEntry], years: Iterable) -> List[ManifestEntry]:
+    """依清單列出所選年份的確切檔案（依檔名排序）。"""
+    wanted = {int(y) for y in years}
+    return sorted((e for e in manifest.values() if e.year in wanted), key=lambda e: e.filename)
+
+
+def total_bytes(entries: Iterable[ManifestEntry]) -> int:
+    return sum(e.size or 0 for e in entries)
@@ -0,0 +1,158 @@
+# 下載量測與執行報告
+from __future__ import annotations
+import bisect
+import csv
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+REPORT_DIR = ".gdelt_reports"  # 放在下載資料夾內；以 . 開頭，不會被當成資料檔
+# 延遲直方圖的上界（秒）；最後一格收集超過最大上界的值
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+@dataclass
+class FileMetric:
+    """單一目標的下載量測。bytes 為實際經網路收到的位元組（含重試，不含續傳前已有的部分）。"""
+    target: str
+    filename: str = ""
+    status: str = ""
+    bytes: int = 0
+    ttfb: Optional[float] = None      # 送出請求到收到回應標頭（秒），取最後一次嘗試
+    elapsed: float = 0.0              # 下載段耗時（秒），不含排隊、解壓與驗證
+    retries: int = 0                  # 含連線層自動重試
+    resumed_from: int = 0
+    started_at: float = field(default_factory=time.time)
+
+    @property
+    def throughput(self) -> float:
+        """bytes/s；沒有實際傳輸時為 0。"""
+        return self.bytes / self.elapsed if self.elapsed > 0 and self.bytes > 0 else 0.0
+
+    def as_row(self) -> Dict:
+        row = asdict(self)
+        row["throughput"] = round(self.throughput, 1)
+        row["elapsed"] = round(self.elapsed, 4)
+        if self.ttfb is not None:
+            row["ttfb"] = round(self.ttfb, 4)
+        row["started_at"] = datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds")
+        return row
+
+
+def _bucket_label(v: float, bounds: Sequence[float]) -> str:
+    i = bisect.bisect_left(bounds, v)
+    return f"<={bounds[i]:g}" if i < len(bounds) else f">{bounds[-1]:g}"
+
+
+def histogram(values: Sequence[float], bounds: Sequence[float] = LATENCY_BUCKETS) -> Dict[str, int]:
+    """依上界分桶計數：{"<=0.1": n, ..., ">60": n}。"""
+    out = {f"<={b:g}": 0 for b in bounds}
+    out[f">{bounds[-1]:g}"] = 0
+    for v in values:
+        out[_bucket_label(v, bounds)] += 1
+    return out
+
+
+def _percentiles(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    """values 須已排序。"""
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))], 4)
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "max": round(values[-1], 4)}
+
+
+class DownloadMetrics:
+    """
+    收集一次下載執行中每個目標的 FileMetric，可跨執行緒共用。
+    on_record(metric, summary)：每個目標結束時呼叫（在鎖內），summary 為當下的累計摘要。
+    摘要由逐筆更新的累計量組成（計數、分桶、已排序的延遲），每次產生的成本與已記錄筆數無關。
+    執行結束後以 write_report() 輸出 JSON（摘要＋逐檔）與 CSV（逐檔）。
+    """
+
+    def __init__(self, on_record: Optional[Callable[[FileMetric, Dict], None]] = None):
+        self.on_record = on_record
+        self._lock = threading.Lock()
+        self.records: List[FileMetric] = []
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._counts: Dict[str, int] = {}
+        self._bytes = 0
+        self._retries = 0
+        self._files_retried = 0
+        self._ttfbs: List[float] = []     # 已排序
+        self._elapsed: List[float] = []   # 已排序；只含實際有傳輸的目標
+        self._ttfb_hist = histogram(())
+        self._elapsed_hist = histogram(())
+
+    def begin(self, target) -> FileMetric:
+        return FileMetric(target=str(target))
+
+    def record(self, metric: FileMetric, status: str):
+        metric.status = status
+        with self._lock:
+            self.records.append(metric)
+            self._accumulate(metric)
+            if self.on_record:
+                self.on_record(metric, self._summary())
+
+    def _accumulate(self, m: FileMetric):
+        self._counts[m.status] = self._counts.get(m.status, 0) + 1
+        self._bytes += m.bytes
+        self._retries += m.retries
+        self._files_retried += 1 if m.retries else 0
+        if m.ttfb is not None:
+            bisect.insort(self._ttfbs, m.ttfb)
+            self._ttfb_hist[_bucket_label(m.ttfb, LATENCY_BUCKETS)] += 1
+        if m.bytes > 0:
+            bisect.insort(self._elapsed, m.elapsed)
+            self._elapsed_hist[_bucket_label(m.elapsed, LATENCY_BUCKETS)] += 1
+
+    def close(self):
+        self.finished_at = time.time()
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return self._summary()
+
+    def _summary(self) -> Dict:
+        end = self.finished_at or time.time()
+        duration = max(end - self.started_at, 1e-9)
+        return {
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+            "duration": round(duration, 3),
+            "files": len(self.records),
+            "status": dict(self._counts),
+            "bytes": self._bytes,
+            "throughput": round(self._bytes / duration, 1),
+            "retries": self._retries,
+            "files_retried": self._files_retried,
+            "ttfb": _percentiles(self._ttfbs),
+            "ttfb_histogram": dict(self._ttfb_hist),
+            "elapsed": _percentiles(self._elapsed),
+            "elapsed_histogram": dict(self._elapsed_hist),
+        }
+
+    def write_report(self, directory: str, stem: Optional[str] = None):
+        """寫出 <directory>/.gdelt_reports/<stem>.json 與 .csv；回傳 (json_path, csv_path)。"""
+        if self.finished_at is None:
+            self.close()
+        report_dir = os.path.join(directory, REPORT_DIR)
+        os.makedirs(report_dir, exist_ok=True)
+        stem = stem or "download-" + datetime.fromtimestamp(self.started_at).strftime("%Y%m%d-%H%M%S")
+        with self._lock:
+            summary = self._summary()
+            rows = [m.as_row() for m in self.records]
+        json_path = os.path.join(report_dir, stem + ".json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "files": rows}, f, ensure_ascii=False, indent=1)
+        csv_path = os.path.join(report_dir, stem + ".csv")
+        fields = list(FileMetric.__dataclass_fields__) + ["throughput"]
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=fields)
+            w.writeheader()
+            w.writerows(rows)
+        return json_path, csv_path
@@ -0,0 +1,321 @@
+# 分段下載管線：下載 → 解壓 → 驗證
+from __future__ import annotations
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, Optional, Union
+
+from GDELT_helper.inventory import LocalInventory
+from GDELT_helper.processing.columnar import convert_csv, COLUMNAR_FORMATS, HAS_PYARROW
+from GDELT_helper.download.session import get_session
+from GDELT_helper.download.manifest import ManifestEntry
+from GDELT_helper.download.throttle import RateLimiter, AdaptiveConcurrency
+from GDELT_helper.download.metrics import DownloadMetrics
+from GDELT_helper.download.core import (
+    fetch_one, unzip_and_cleanup, check_zip,
+    STATUS_DOWNLOADED, STATUS_SKIPPED, STATUS_MISSING, STATUS_FAILED, STATUS_STOPPED,
+)
+
+DEFAULT_WORKERS = 4
+MAX_WORKERS = 16
+DEFAULT_EXTRACT_WORKERS = 2
+DEFAULT_VERIFY_WORKERS = 1
+
+_DONE = object()  # 佇列結束標記
+
+
+def clamp_workers(workers, default=DEFAULT_WORKERS) -> int:
+    try:
+        n = int(workers)
+    except (TypeError, ValueError):
+        n = default
+    return max(1, min(n, MAX_WORKERS))
+
+
+class DownloadPipeline:
+    """
+    三段式管線，各段有獨立的執行緒數：
+      下載（fetch_workers）→ 有界佇列 → 解壓（extract_workers）→ 有界佇列 → 驗證（verify_workers）。
+    解壓跟不上時下載端會在佇列上等待，不會無限堆積壓縮檔。
+    perfile_cb(delta)：檔案通過驗證（或本來就已存在）時回報 1。
+    bytes_cb(delta)：下載位元組進度。
+    progress_cb(stats)：每個目標結束時回報累計統計，含 'backlog'（各段待處理數）。
+    以上回呼都在鎖內呼叫。
+    max_bytes_per_sec：全域頻寬上限（0 為不限速）。
+    adaptive：以 AIMD 依吞吐量與錯誤率調整同時下載數（fetch_workers 為起始值，上限 MAX_WORKERS）。
+    convert_to："parquet"/"feather" 時，驗證通過的 CSV 立即轉成型別化欄式檔；keep_raw=False 會刪除原始 CSV。
+    轉檔在驗證段執行，未指定 verify_workers 時其執行緒數跟解壓相同。
+    keep_zip：保留壓縮檔模式，解壓段只檢查壓縮檔、不解壓（資料處理直接讀 .zip）；此時不做落地轉檔。
+    metrics：metrics.DownloadMetrics；每個目標結束時記錄一筆（最終狀態、實收位元組、TTFB、重試）。
+    未提供時自建一個，可於 run() 後由 self.metrics 取得。
+    """
+
+    def __init__(
+        self,
+        out_dir: str,
+        log: Callable[[str], None],
+        stop_event: threading.Event,
+        fetch_workers: int = DEFAULT_WORKERS,
+        extract_workers: int = DEFAULT_EXTRACT_WORKERS,
+        verify_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        perfile_cb: Optional[Callable[[int], None]] = None,
+        progress_cb: Optional[Callable[[Dict], None]] = None,
+        bytes_cb: Optional[Callable[[int], None]] = None,
+        max_bytes_per_sec: float = 0,
+        adaptive: bool = False,
+        convert_to: Optional[str] = None,
+        keep_raw: bool = True,
+        metrics: Optional[DownloadMetrics] = None,
+        keep_zip: bool = False,
+    ):
+        self.out_dir = out_dir
+        self.log = log
+        self.stop_event = stop_event
+        self.fetch_workers = clamp_workers(fetch_workers)
+        self.extract_workers = clamp_workers(extract_workers, DEFAULT_EXTRACT_WORKERS)
+        if convert_to and convert_to not in COLUMNAR_FORMATS:
+            raise ValueError(f"不支援的轉檔格式：{convert_to}")
+        self.convert_to = convert_to or None
+        self.keep_raw = bool(keep_raw)
+        self.keep_zip = bool(keep_zip)
+        if verify_workers is None:
+            verify_workers = self.extract_workers if self.convert_to else DEFAULT_VERIFY_WORKERS
+        self.verify_workers = clamp_workers(verify_workers, DEFAULT_VERIFY_WORKERS)
+        size = queue_size or self.fetch_workers * 2
+        self._extract_q: queue.Queue = queue.Queue(maxsize=size)
+        self._verify_q: queue.Queue = queue.Queue(maxsize=size)
+        self.perfile_cb = perfile_cb
+        self.progress_cb = progress_cb
+        self.bytes_cb = bytes_cb
+        self.max_bytes_per_sec = max(0.0, float(max_bytes_per_sec or 0))
+        self.adaptive = bool(adaptive)
+        self.metrics = metrics if metrics is not None else DownloadMetrics()
+        self.limiter = None
+        self.controller = None
+        self._lock = threading.Lock()
+        self._fetching = 0
+        self.inventory = None
+        self.session = None
+        self.stats = {}
+
+    # ---------- 狀態 ----------
+    def backlog(self) -> Dict[str, int]:
+        return {
+            'fetch': self._fetching,
+            'extract': self._extract_q.qsize(),
+            'verify': self._verify_q.qsize(),
+        }
+
+    def _finish(self, status, counted=False, metric=None):
+        if metric is not None:
+            self.metrics.record(metric, status)
+        with self._lock:
+            if counted and self.perfile_cb:
+                self.perfile_cb(1)
+            self.stats['done'] += 1
+            self.stats[status] = self.stats.get(status, 0) + 1
+            snapshot = dict(self.stats, backlog=self.backlog())
+            if self.progress_cb:
+                self.progress_cb(snapshot)
+
+    def _bytes(self, delta):
+        if self.bytes_cb:
+            with self._lock:
+                self.bytes_cb(delta)
+
+    # ---------- 各段工作 ----------
+    def _fetch(self, target):
+        metric = self.metrics.begin(getattr(target, "base", target))
+        if self.stop_event.is_set():
+            return STATUS_STOPPED, None, metric
+        if isinstance(target, ManifestEntry):
+            base = target.base
+            extra = dict(filename=target.filename, expected_size=target.size, expected_md5=target.md5)
+        else:
+            base, extra = str(target), {}
+        ctl = self.controller
+        if ctl is not None and not ctl.acquire(self.stop_event):
+            return STATUS_STOPPED, None, metric
+        received = 0
+
+        def on_bytes(delta):
+            nonlocal received
+            received += delta
+            self._bytes(delta)
+
+        self.log(f"嘗試：{base}")
+        start = time.monotonic()
+        try:
+            status, zip_path = fetch_one(
+                base, self.out_dir, self.log, self.stop_event, session=self.session,
+                bytes_cb=on_bytes, inventory=self.inventory,
+                limiter=self.limiter, controller=ctl, metric=metric, keep_zip=self.keep_zip, **extra,
+            )
+            if ctl is not None and status == STATUS_DOWNLOADED:
+                ctl.on_success(received)
+            return status, zip_path, metric
+        except Exception as e:
+            self.log(f"下載錯誤（{base}）：{e!r}")
+            if ctl is not None:
+                ctl.on_error()
+            return STATUS_FAILED, None, metric
+        finally:
+            metric.elapsed = time.monotonic() - start
+            if ctl is not None:
+                ctl.release()
+
+    def _extract_loop(self):
+        while True:
+            item = self._extract_q.get()
+            if item is _DONE:
+                return
+            status, zip_path, metric = item
+            if self.stop_event.is_set():
+                # 壓縮檔已完整，保留給下次執行時解壓
+                self._finish(STATUS_STOPPED, metric=metric)
+                continue
+            try:
+                if self.keep_zip:
+                    infos = check_zip(zip_path, self.log, inventory=self.inventory)
+                else:
+                    infos = unzip_and_cleanup(zip_path, self.out_dir, self.log, inventory=self.inventory)
+            except Exception as e:
+                self.log(f"解壓錯誤（{os.path.basename(zip_path)}）：{e!r}")
+                infos = None
+            if not infos:
+                self._finish(STATUS_FAILED, metric=metric)
+                continue
+            if self.keep_zip:  # 沒有解壓出的檔案要驗證
+                self._finish(status, counted=True, metric=metric)
+                continue
+            self._verify_q.put((status, infos, metric))
+
+    def _verify_loop(self):
+        while True:
+            item = self._verify_q.get()
+            if item is _DONE:
+                return
+            status, infos, metric = item
+            ok = True
+            for info in infos:
+                if info.is_dir():
+                    continue
+                path = os.path.join(self.out_dir, info.filename)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    size = -1
+                if size != info.file_size:
+                    ok = False
+                    self.log(f"驗證失敗（{info.filename}）：{size:,} / {info.file_size:,} bytes，已刪除待重新下載")
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    if self.inventory is not None:
+                        self.inventory.discard(info.filename)
+            if ok and self.convert_to:
+                self._convert(infos)
+            self._finish(status if ok else STATUS_FAILED, counted=ok, metric=metric)
+
+    def _convert(self, infos):
+        for info in infos:
+            if info.is_dir() or not info.filename.lower().endswith(".csv"):
+                continue
+            csv_path = os.path.join(self.out_dir, info.filename)
+            try:
+                out = convert_csv(csv_path, self.convert_to, keep_raw=self.keep_raw, log=self.log)
+            except Exception as e:
+                # 轉檔失敗仍保留原始 CSV，不影響下載結果
+                self.log(f"轉檔失敗（{info.filename}）：{e!r}")
+                continue
+            if self.inventory is not None:
+                self.inventory.add(os.path.basename(out))
+                if not self.keep_raw:
+                    self.inventory.discard(info.filename)
+
+    # ---------- 主流程 ----------
+    def run(self, targets: Iterable[Union[str, ManifestEntry]]) -> Dict:
+        """
+        執行整條管線直到所有目標結束（或中止）。
+        回傳: {'total', 'done', 'downloaded', 'skipped', 'missing', 'failed', 'stopped'}
+        """
+        targets = list(targets)
+        self.stats = {
+            'total': len(targets), 'done': 0,
+            STATUS_DOWNLOADED: 0, STATUS_SKIPPED: 0, STATUS_MISSING: 0,
+            STATUS_FAILED: 0, STATUS_STOPPED: 0,
+        }
+        if not targets:
+            return dict(self.stats)
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        pool_size = MAX_WORKERS if self.adaptive else self.fetch_workers
+        self.session = get_session(pool_size=pool_size)
+        self.inventory = LocalInventory(self.out_dir)
+        self.limiter = RateLimiter(self.max_bytes_per_sec) if self.max_bytes_per_sec > 0 else None
+        self.controller = AdaptiveConcurrency(self.fetch_workers, max_limit=MAX_WORKERS, log=self.log) if self.adaptive else None
+        if self.controller is not None:
+            self.log(f"自適應並行：起始 {self.fetch_workers}，範圍 1–{MAX_WORKERS}；解壓：{self.extract_workers}，驗證：{self.verify_workers}")
+        else:
+            self.log(f"同時下載數：{self.fetch_workers}，解壓：{self.extract_workers}，驗證：{self.verify_workers}")
+        if self.limiter is not None:
+            self.log(f"頻寬上限：{self.max_bytes_per_sec / 1024 / 1024:.2f} MB/s")
+        else:
+            self.log("頻寬上限：不限速")
+        if self.keep_zip:
+            self.log("保留壓縮檔：不解壓，資料處理直接讀取 .zip。")
+            if self.convert_to:
+                self.log("保留壓縮檔模式不做落地轉檔。")
+                self.convert_to = None
+        if self.convert_to:
+            if not HAS_PYARROW:
+                self.log("未安裝 pyarrow，略過落地轉檔，保留原始 CSV。")
+                self.convert_to = None
+            else:
+                self.log(f"落地轉檔：{self.convert_to}（{'保留' if self.keep_raw else '刪除'}原始 CSV）")
+
+        extractors = [threading.Thread(target=self._extract_loop, name=f"gdelt-unzip-{i}", daemon=True)
+                      for i in range(self.extract_workers)]
+        verifiers = [threading.Thread(target=self._verify_loop, name=f"gdelt-verify-{i}", daemon=True)
+                     for i in range(self.verify_workers)]
+        for t in extractors + verifiers:
+            t.start()
+
+        it = iter(targets)
+        pending = set()
+        try:
+            # 有界送出：中止時不會留下上千個已排隊的任務
+            with ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="gdelt-dl") as pool:
+                while True:
+                    window = (self.controller.limit if self.controller is not None else self.fetch_workers) * 2
+                    while not self.stop_event.is_set() and len(pending) < window:
+                        target = next(it, None)
+                        if target is None:
+                            break
+                        pending.add(pool.submit(self._fetch, target))
+                    self._fetching = len(pending)
+                    if not pending:
+                        break
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._fetching = len(pending)
+                    for fut in finished:
+                        status, zip_path, metric = fut.result()
+                        if zip_path is not None:
+                            self._extract_q.put((status, zip_path, metric))
+                        else:
+                            self._finish(status, counted=status == STATUS_SKIPPED, metric=metric)
+        finally:
+            for _ in extractors:
+                self._extract_q.put(_DONE)
+            for t in extractors:
+                t.join()
+            for _ in verifiers:
+                self._verify_q.put(_DONE)
+            for t in verifiers:
+                t.join()
+            self.metrics.close()
+        return dict(self.stats)
@@ -0,0 +1,50 @@
+# 並行下載排程
+from __future__ import annotations
+import threading
+from typing import Callable, Dict, Iterable, Optional, Union
+
+from GDELT_helper.download.manifest import ManifestEntry
+from GDELT_helper.download.metrics import DownloadMetrics
+from GDELT_helper.download.pipeline import (
+    DownloadPipeline, clamp_workers,
+    DEFAULT_WORKERS, MAX_WORKERS, DEFAULT_EXTRACT_WORKERS,
+)
+
+
+def download_targets(
+    targets: Iterable[Union[str, ManifestEntry]],
+    out_dir: str,
+    log: Callable[[str], None],
+    stop_event: threading.Event,
+    perfile_cb: Optional[Callable[[int], None]] = None,
+    workers: int = DEFAULT_WORKERS,
+    progress_cb: Optional[Callable[[Dict[str, int]], None]] = None,
+    bytes_cb: Optional[Callable[[int], None]] = None,
+    extract_workers: int = DEFAULT_EXTRACT_WORKERS,
+    verify_workers: Optional[int] = None,
+    max_bytes_per_sec: float = 0,
+    adaptive: bool = False,
+    convert_to: Optional[str] = None,
+    keep_raw: bool = True,
+    metrics: Optional[DownloadMetrics] = None,
+    keep_zip: bool = False,
+) -> Dict[str, int]:
+    """
+    同時下載多個目標：下載、解壓、驗證分段並行（見 DownloadPipeline）。
+    targets：基底檔名（依日曆推算，需探測副檔名）或 ManifestEntry（確切檔名、大小與 MD5）。
+    perfile_cb(delta)、bytes_cb(delta)：與 download_one 相同語意，會在鎖內呼叫，呼叫端不必自行處理同步。
+    progress_cb(stats)：每完成一個目標回報一次累計統計（done/total/各狀態數/backlog）。
+    max_bytes_per_sec、adaptive：頻寬上限與 AIMD 自適應並行，見 DownloadPipeline。
+    convert_to、keep_raw：落地轉檔（parquet/feather）與是否保留原始 CSV，見 DownloadPipeline。
+    metrics：DownloadMetrics；逐檔量測會記錄在其中，呼叫端可在結束後 write_report()。
+    keep_zip：保留壓縮檔、不解壓（資料處理可直接讀 .zip），見 DownloadPipeline。
+    回傳: {'total', 'done', 'downloaded', 'skipped', 'missing', 'failed', 'stopped'}
+    """
+    pipeline = DownloadPipeline(
+        out_dir, log, stop_event,
+        fetch_workers=workers, extract_workers=extract_workers, verify_workers=verify_workers,
+        perfile_cb=perfile_cb, progress_cb=progress_cb, bytes_cb=bytes_cb,
+        max_bytes_per_sec=max_bytes_per_sec, adaptive=adaptive,
+        convert_to=convert_to, keep_raw=keep_raw, metrics=metrics, keep_zip=keep_zip,
+    )
+    return pipeline.run(targets)
@@ -0,0 +1,72 @@
+# 共用 HTTP 連線（keep-alive、重試與退避）
+from __future__ import annotations
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 4
+RETRY_TOTAL = 5
+PROBE_RETRY_TOTAL = 1
+BACKOFF_FACTOR = 0.5
+BACKOFF_MAX = 60
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+USER_AGENT = "GDELT_helper"
+
+_lock = threading.Lock()
+_sessions = {}  # {重試次數: (Session, 連線池大小)}
+
+
+def backoff_delay(attempt: int, factor: float = BACKOFF_FACTOR, cap: float = BACKOFF_MAX) -> float:
+    """第 attempt 次（從 0 起算）重試前的等待秒數：指數成長，取一半固定、一半隨機。"""
+    base = min(cap, factor * (2 ** attempt))
+    return base / 2 + random.uniform(0, base / 2)
+
+
+class JitteredRetry(Retry):
+    """urllib3 的 Retry 加上抖動，避免多條連線同時重試。"""
+
+    def get_backoff_time(self) -> float:
+        base = super().get_backoff_time()
+        if base <= 0:
+            return 0
+        return base / 2 + random.uniform(0, base / 2)
+
+
+def _build_session(pool_size: int, retries: int) -> requests.Session:
+    # 連線層只重試「連不上」（請求尚未送出，重試安全）；HTTP 狀態（RETRY_STATUSES）與傳輸中斷
+    # 由 download.core.fetch_one 的外層迴圈重試（可續傳、會通知並行控制），兩層都重試會讓次數相乘
+    retry = JitteredRetry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=BACKOFF_FACTOR,
+        allowed_methods=frozenset({"HEAD", "GET"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    s = requests.Session()
+    s.headers["User-Agent"] = USER_AGENT
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+def get_session(pool_size: int = None, retries: int = RETRY_TOTAL) -> requests.Session:
+    """
+    取得下載模組共用的 Session。
+    pool_size 大於目前連線池時會重建（請在開始下載前呼叫，例如排程器啟動時）。
+    retries：探測用途（如偵測最新年份）可傳 PROBE_RETRY_TOTAL，離線時不會卡在退避上。
+    """
+    with _lock:
+        want = max(int(pool_size or 0), DEFAULT_POOL_SIZE)
+        session, size = _sessions.get(retries, (None, 0))
+        if session is None or want > size:
+            if session is not None:
+                session.close()
+            session = _build_session(want, retries)
+            _sessions[retries] = (session, want)
+        return session
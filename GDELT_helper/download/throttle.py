@@ -0,0 +1,104 @@
+# 頻寬限制與自適應並行數
+from __future__ import annotations
+import threading
+import time
+from typing import Callable, Optional
+
+
+class RateLimiter:
+    """
+    全域位元組速率上限（token bucket），所有下載執行緒共用。
+    每寫入一塊就 consume(len(chunk))；超過速率時呼叫端會被延後。
+    """
+
+    def __init__(self, bytes_per_sec: float, burst: Optional[float] = None):
+        self.rate = float(bytes_per_sec)
+        self.burst = float(burst) if burst else self.rate  # 最多累積一秒額度
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n: int, stop_event: Optional[threading.Event] = None):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            if stop_event is not None:
+                stop_event.wait(wait)
+            else:
+                time.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD 調整同時進行的下載數：
+    - 每累積 limit 次成功為一個觀測窗，窗內吞吐量沒有明顯下降就 +1（加法增加）；
+    - 遇到錯誤、逾時或伺服器節流（429/5xx）就減半（乘法減少），冷卻期內只減一次。
+    acquire()/release() 包住每次下載。
+    """
+
+    ERROR_COOLDOWN = 2.0
+
+    def __init__(self, initial: int, min_limit: int = 1, max_limit: int = 16,
+                 log: Optional[Callable[[str], None]] = None):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = min(max(int(initial), self.min_limit), self.max_limit)
+        self.log = log or (lambda _msg: None)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_count = 0
+        self._last_rate = 0.0
+        self._last_cut = 0.0
+
+    def acquire(self, stop_event: Optional[threading.Event] = None) -> bool:
+        """取得一個名額；中止時回傳 False。"""
+        with self._cond:
+            while self._in_flight >= self.limit:
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                self._cond.wait(0.5)
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self, nbytes: int):
+        with self._cond:
+            self._window_bytes += nbytes
+            self._window_count += 1
+            if self._window_count < self.limit:
+                return
+            elapsed = max(time.monotonic() - self._window_start, 1e-6)
+            rate = self._window_bytes / elapsed
+            if rate >= self._last_rate * 0.9 and self.limit < self.max_limit:
+                self._set_limit(self.limit + 1, f"吞吐 {rate / 1024 / 1024:.2f} MB/s")
+            self._last_rate = rate
+            self._window_start = time.monotonic()
+            self._window_bytes = 0
+            self._window_count = 0
+
+    def on_error(self):
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_cut < self.ERROR_COOLDOWN:
+                return
+            self._last_cut = now
+            if self.limit > self.min_limit:
+                self._set_limit(max(self.min_limit, self.limit // 2), "發生錯誤或被節流")
+            self._window_start = now
+            self._window_bytes = 0
+            self._window_count = 0
+
+    def _set_limit(self, new, reason):
+        old, self.limit = self.limit, new
+        self.log(f"調整同時下載數：{old} → {new}（{reason}）")
+        self._cond.notify_all()
@@ -5,7 +5,7 @@ import queue
 from datetime import datetime, timezone
 
 from tkinter import (
-    Frame, Label, Button, Listbox, Scrollbar, Text, StringVar, BooleanVar,
+    Frame, Label, Button, Listbox, Scrollbar, Spinbox, Entry, Checkbutton, Text, StringVar, BooleanVar, IntVar,
     LEFT, RIGHT, BOTH, X, Y, END, EXTENDED, DISABLED, NORMAL, filedialog
 )
 from tkinter import ttk
@@ -15,11 +15,19 @@ from GDELT_helper.download.core import (
     enumerate_targets_for_year,
     count_total_targets,
     detect_latest_available_year,
-    download_one,
+    cached_latest_year,
 )
+from GDELT_helper.download.manifest import load_manifest, plan_targets, total_bytes
+from GDELT_helper.download.metrics import DownloadMetrics
+from GDELT_helper.download.scheduler import (
+    download_targets, clamp_workers, DEFAULT_WORKERS, MAX_WORKERS, DEFAULT_EXTRACT_WORKERS,
+)
+from GDELT_helper.processing.columnar import COLUMNAR_FORMATS
 from GDELT_helper.config import NotificationConfig
 from GDELT_helper.notify import Notifier
 
+CONVERT_NONE = "無"
+
 
 class GDELTDownloaderGUI:
     def __init__(self, parent, notify_cfg=None):
@@ -30,11 +38,19 @@ class GDELTDownloaderGUI:
         self.save_dir = StringVar(value="")
         self.downloading = BooleanVar(value=False)
         self.stop_event = threading.Event()
+        self.workers = IntVar(value=DEFAULT_WORKERS)
+        self.extract_workers = IntVar(value=DEFAULT_EXTRACT_WORKERS)
+        self.max_mbps = StringVar(value="0")
+        self.adaptive = BooleanVar(value=False)
+        self.convert_to = StringVar(value=CONVERT_NONE)
+        self.keep_raw = BooleanVar(value=True)
+        self.keep_zip = BooleanVar(value=False)
 
         self.year_min = 1979
         self.year_max = datetime.now(timezone.utc).year
 
         self._build_top_bar()
+        self._build_options()
         self._build_year_selector()
         self._build_progress()
         self._build_log()
@@ -42,9 +58,16 @@ class GDELTDownloaderGUI:
         self.notify_cfg = notify_cfg if notify_cfg is not None else NotificationConfig()
         self.notifier = Notifier(self.notify_cfg)
 
+        self._file_progress = (0, 0)
+        self._byte_progress = None
+
         self.msg_queue = queue.Queue()
         self._drain_queue()
 
+        latest = cached_latest_year()
+        if latest is not None:
+            self.msg_queue.put(("years", latest))
+
     def destroy(self):
         self.frame.destroy()
 
@@ -58,6 +81,24 @@ class GDELTDownloaderGUI:
         Button(box, text="選擇資料夾", command=self._choose_dir).pack(side=LEFT, padx=6)
         Button(box, text="偵測最新年份", command=self._detect_and_update_years).pack(side=LEFT, padx=6)
 
+    def _build_options(self):
+        box = new_section(self.frame, "下載設定")
+        Label(box, text="同時下載數：").pack(side=LEFT)
+        Spinbox(box, from_=1, to=MAX_WORKERS, width=4, textvariable=self.workers).pack(side=LEFT)
+        Label(box, text="解壓數：").pack(side=LEFT, padx=(10, 0))
+        Spinbox(box, from_=1, to=MAX_WORKERS, width=4, textvariable=self.extract_workers).pack(side=LEFT)
+        Label(box, text="頻寬上限（MB/s，0＝不限）：").pack(side=LEFT, padx=(10, 0))
+        Entry(box, textvariable=self.max_mbps, width=6).pack(side=LEFT)
+        Checkbutton(box, text="自適應調整同時下載數", variable=self.adaptive).pack(side=LEFT, padx=(10, 0))
+
+        box = new_section(self.frame, "落地轉檔")
+        Label(box, text="轉成：").pack(side=LEFT)
+        ttk.Combobox(box, textvariable=self.convert_to, state="readonly", width=8,
+                     values=[CONVERT_NONE] + list(COLUMNAR_FORMATS)).pack(side=LEFT)
+        Checkbutton(box, text="保留原始 CSV", variable=self.keep_raw).pack(side=LEFT, padx=(10, 0))
+        Checkbutton(box, text="保留壓縮檔（不解壓，資料處理直接讀 .zip）",
+                    variable=self.keep_zip).pack(side=LEFT, padx=(10, 0))
+
     def _build_year_selector(self):
         box = new_section(self.frame, "選擇年份（可複選）")
         left = Frame(box); left.pack(side=LEFT, fill=BOTH, expand=True)
@@ -82,6 +123,10 @@ class GDELTDownloaderGUI:
         self.progress.pack(fill=X, padx=2, pady=(0, 4))
         self.progress_text = StringVar(value="尚未開始")
         Label(box, textvariable=self.progress_text).pack(anchor="w")
+        self.stats_text = StringVar(value="")
+        Label(box, textvariable=self.stats_text).pack(anchor="w")
+        self.metrics_text = StringVar(value="")
+        Label(box, textvariable=self.metrics_text).pack(anchor="w")
 
     def _build_log(self):
         box= new_section(self.frame, "下載紀錄")
@@ -111,8 +156,13 @@ class GDELTDownloaderGUI:
     def _detect_and_update_years(self):
         self._log("偵測最新可用年份中…")
 
+        save_dir = self.save_dir.get()
+
         def run():
-            latest = detect_latest_available_year()
+            manifest = None
+            if save_dir and cached_latest_year() is None:
+                manifest = load_manifest(save_dir, log=self._queue_log)
+            latest = detect_latest_available_year(manifest=manifest)
             self.msg_queue.put(("log", f"偵測完成：{latest}"))
             self.msg_queue.put(("years", latest))
         threading.Thread(target=run, daemon=True).start()
@@ -129,6 +179,15 @@ class GDELTDownloaderGUI:
     def _queue_progress(self, completed, total):
         self.msg_queue.put(("progress", (completed, total)))
 
+    def _queue_stats(self, stats):
+        self.msg_queue.put(("stats", stats))
+
+    def _queue_bytes(self, done, total):
+        self.msg_queue.put(("bytes", (done, total)))
+
+    def _queue_metrics(self, _metric, summary):
+        self.msg_queue.put(("metrics", summary))
+
     def _drain_queue(self):
         try:
             while True:
@@ -136,10 +195,27 @@ class GDELTDownloaderGUI:
                 if typ == "log":
                     self._log(payload)
                 elif typ == "progress":
-                    comp, total = payload
-                    pct = (comp / total * 100) if total > 0 else 0
-                    self.progress["value"] = pct
-                    self.progress_text.set(f"{comp} / {total} 檔（{pct:.1f}%）")
+                    self._file_progress = payload
+                    self._render_progress()
+                elif typ == "bytes":
+                    self._byte_progress = payload
+                    self._render_progress()
+                elif typ == "stats":
+                    st = payload
+                    bl = st.get('backlog', {})
+                    self.stats_text.set(
+                        f"已處理 {st['done']} / {st['total']}（成功 {st['downloaded']}、跳過 {st['skipped']}、"
+                        f"未找到 {st['missing']}、失敗 {st['failed']}）"
+                        f"　佇列：下載 {bl.get('fetch', 0)}、解壓 {bl.get('extract', 0)}、驗證 {bl.get('verify', 0)}"
+                    )
+                elif typ == "metrics":
+                    sm = payload
+                    p50 = sm['ttfb']['p50']
+                    ttfb = "—" if p50 is None else f"{p50:.2f} 秒"
+                    self.metrics_text.set(
+                        f"平均速率 {sm['throughput'] / 1024 / 1024:,.2f} MB/s　已收 {sm['bytes'] / 1024 / 1024:,.1f} MB　"
+                        f"重試 {sm['retries']} 次　TTFB 中位數 {ttfb}"
+                    )
                 elif typ == "years":
                     latest = int(payload)
                     if latest > self.year_max:
@@ -151,6 +227,20 @@ class GDELTDownloaderGUI:
         finally:
             self.frame.after(120, self._drain_queue)
 
+    def _render_progress(self):
+        comp, total = self._file_progress
+        if self._byte_progress is not None:
+            done_b, total_b = self._byte_progress
+            pct = (done_b / total_b * 100) if total_b > 0 else 0
+            self.progress["value"] = pct
+            self.progress_text.set(
+                f"{comp} / {total} 檔，{done_b / 1024 / 1024:,.1f} / {total_b / 1024 / 1024:,.1f} MB（{pct:.1f}%）"
+            )
+        else:
+            pct = (comp / total * 100) if total > 0 else 0
+            self.progress["value"] = pct
+            self.progress_text.set(f"{comp} / {total} 檔（{pct:.1f}%）")
+
     # ---------------- download flow ----------------
 
     def _start_download(self):
@@ -178,10 +268,30 @@ class GDELTDownloaderGUI:
         self.progress["maximum"] = 100
         self.progress["value"] = 0
         self.progress_text.set("準備中…")
+        self.stats_text.set("")
+        self.metrics_text.set("")
+        self._file_progress = (0, total)
+        self._byte_progress = None
         self.downloading.set(True)
         self.stop_event.clear()
 
-        t = threading.Thread(target=self._worker_download, args=(sel, out_dir, total), daemon=True)
+        try:
+            workers = clamp_workers(self.workers.get())
+            extract_workers = clamp_workers(self.extract_workers.get(), DEFAULT_EXTRACT_WORKERS)
+        except Exception:
+            workers, extract_workers = DEFAULT_WORKERS, DEFAULT_EXTRACT_WORKERS
+        try:
+            max_bps = max(0.0, float(self.max_mbps.get() or 0)) * 1024 * 1024
+        except ValueError:
+            max_bps = 0
+            self._log("頻寬上限格式錯誤，改為不限速。")
+        convert_to = self.convert_to.get()
+        options = dict(workers=workers, extract_workers=extract_workers,
+                       max_bytes_per_sec=max_bps, adaptive=self.adaptive.get(),
+                       convert_to=convert_to if convert_to in COLUMNAR_FORMATS else None,
+                       keep_raw=self.keep_raw.get(), keep_zip=self.keep_zip.get())
+
+        t = threading.Thread(target=self._worker_download, args=(sel, out_dir, total, options), daemon=True)
         t.start()
 
     def _stop_download(self):
@@ -189,32 +299,51 @@ class GDELTDownloaderGUI:
             self.stop_event.set()
             self._log("正在中止下載…")
 
-    def _worker_download(self, years, out_dir, total):
+    def _worker_download(self, years, out_dir, total, options=None):
         completed = 0
+        done_bytes = 0
+        byte_total = 0
+        metrics = DownloadMetrics(on_record=self._queue_metrics)
 
         def perfile_cb(delta):
             nonlocal completed
             completed += delta
             self._queue_progress(completed, total)
 
+        def bytes_cb(delta):
+            nonlocal done_bytes
+            done_bytes += delta
+            self._queue_bytes(done_bytes, byte_total)
+
         self._queue_log(f"開始下載。儲存位置：{out_dir}")
         try:
-            for y in years:
-                if self.stop_event.is_set():
-                    break
-                self._queue_log(f"年份 {y}：搜尋檔案中")
-                targets = enumerate_targets_for_year(int(y))
-                if not targets:
-                    self._queue_log(f"年份 {y} 無目標，略過。")
-                    continue
-                for base in targets:
-                    if self.stop_event.is_set():
-                        break
-                    self._queue_log(f"嘗試：{base}")
-                    try:
-                        download_one(base, out_dir, self._queue_log, self.stop_event, perfile_cb=perfile_cb)
-                    except Exception as e:
-                        self._queue_log(f"下載錯誤（{base}）：{e!r}")
+            manifest = load_manifest(out_dir, log=self._queue_log)
+            if manifest:
+                targets = plan_targets(manifest, years)
+                total = len(targets)
+                byte_total = total_bytes(targets)
+                self._queue_log(f"依官方檔案清單：{total} 檔，共 {byte_total / 1024 / 1024 / 1024:,.2f} GB")
+                self._queue_progress(0, total)
+                self._queue_bytes(0, byte_total)
+            else:
+                self._queue_log("改以日曆推算檔名（逐一探測）。")
+                targets = []
+                for y in years:
+                    self._queue_log(f"年份 {y}：搜尋檔案中")
+                    year_targets = enumerate_targets_for_year(int(y))
+                    if not year_targets:
+                        self._queue_log(f"年份 {y} 無目標，略過。")
+                        continue
+                    targets.extend(year_targets)
+            stats = download_targets(
+                targets, out_dir, self._queue_log, self.stop_event,
+                perfile_cb=perfile_cb, progress_cb=self._queue_stats,
+                bytes_cb=bytes_cb if byte_total else None, metrics=metrics, **(options or {}),
+            )
+            self._queue_log(
+                f"下載摘要：成功 {stats['downloaded']}、跳過 {stats['skipped']}、"
+                f"未找到 {stats['missing']}、失敗 {stats['failed']}"
+            )
         except Exception as e:
             self._queue_log(f"致命錯誤：{e!r}")
             try:
@@ -226,6 +355,16 @@ class GDELTDownloaderGUI:
             except Exception as ne:
                 self._queue_log(f"通知失敗：{ne!r}")
         finally:
+            if metrics.records:
+                try:
+                    json_path, _ = metrics.write_report(out_dir)
+                    sm = metrics.summary()
+                    self._queue_log(
+                        f"執行報告：{json_path}（{sm['bytes'] / 1024 / 1024:,.1f} MB，"
+                        f"平均 {sm['throughput'] / 1024 / 1024:,.2f} MB/s，重試 {sm['retries']} 次）"
+                    )
+                except OSError as e:
+                    self._queue_log(f"寫入執行報告失敗：{e!r}")
             self.downloading.set(False)
             self.btn_download.config(state=NORMAL)
             self.btn_stop.config(state=DISABLED)
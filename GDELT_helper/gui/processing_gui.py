@@ -9,8 +9,9 @@ from GDELT_helper.gui.utils import  new_section, ScrollFrame
 # 資料處理
 from GDELT_helper.processing.core import (
     GDELT_HEADER_URLS, BUILTIN_COLUMNS, COMMON_ACTOR_TYPES, QUICK_ISO3,
-    get_headers_union, process_directory, ProcessorConfig, SideFilter
+    get_headers_union, process_directory, ProcessorConfig, SideFilter, DEFAULT_CHUNK_ROWS, ENGINES
 )
+from GDELT_helper.processing.aggregate import DEFAULT_MEASURES
 
 REQUEST_TIMEOUT = 30
 
@@ -29,6 +30,13 @@ class DataProcessorGUI:
         self.raw_dir = StringVar(value="")
         self.out_dir = StringVar(value="")
         self.out_name = StringVar(value="gdelt_filtered_data.csv")
+        self.workers = IntVar(value=1)
+        self.chunk_rows = StringVar(value=str(DEFAULT_CHUNK_ROWS))
+        self.engine = StringVar(value=ENGINES[0])
+        self.incremental = BooleanVar(value=False)
+        self.use_cache = BooleanVar(value=False)
+        self.aggregate_by = StringVar(value="")
+        self.aggregate_measures = StringVar(value=",".join(DEFAULT_MEASURES))
 
         # 欄位
         self.all_columns = []
@@ -85,6 +93,21 @@ class DataProcessorGUI:
         Button(box, text="選擇…", command=self._choose_out).grid(row=1, column=2)
         Label(box, text="輸出檔名：").grid(row=2, column=0, sticky="w")
         Entry(box, textvariable=self.out_name, width=40).grid(row=2, column=1, padx=6, sticky="w")
+        Label(box, text="平行程序數：").grid(row=3, column=0, sticky="w")
+        Spinbox(box, from_=1, to=os.cpu_count() or 1, width=4, textvariable=self.workers).grid(row=3, column=1, padx=6, sticky="w")
+        Label(box, text="每批列數（0＝整檔）：").grid(row=4, column=0, sticky="w")
+        Entry(box, textvariable=self.chunk_rows, width=12).grid(row=4, column=1, padx=6, sticky="w")
+        Label(box, text="處理引擎：").grid(row=5, column=0, sticky="w")
+        OptionMenu(box, self.engine, *ENGINES).grid(row=5, column=1, padx=6, sticky="w")
+        Checkbutton(box, text="增量處理（只處理新增或變更的檔案，沿用既有輸出）",
+                    variable=self.incremental).grid(row=6, column=0, columnspan=3, sticky="w")
+        Checkbutton(box, text="快取各檔篩選結果（國家／類型條件相同時，改年份或欄位也能直接沿用）",
+                    variable=self.use_cache).grid(row=7, column=0, columnspan=3, sticky="w")
+        Label(box, text="彙總分組（空白＝輸出原始列）：").grid(row=8, column=0, sticky="w")
+        Entry(box, textvariable=self.aggregate_by, width=40).grid(row=8, column=1, padx=6, sticky="w")
+        Label(box, text="例：dyad,root,month").grid(row=8, column=2, sticky="w")
+        Label(box, text="彙總量：").grid(row=9, column=0, sticky="w")
+        Entry(box, textvariable=self.aggregate_measures, width=60).grid(row=9, column=1, columnspan=2, padx=6, sticky="w")
 
     def _build_column_picker(self):
         box= new_section(self.frame, "欄位選擇")
@@ -293,6 +316,14 @@ class DataProcessorGUI:
             y_start = int(self.year_start.get()); y_end = int(self.year_end.get())
         except Exception:
             y_start, y_end = 2005, datetime.now(timezone.utc).year
+        try:
+            workers = max(1, int(self.workers.get()))
+        except Exception:
+            workers = 1
+        try:
+            chunk_rows = max(0, int(self.chunk_rows.get()))
+        except Exception:
+            chunk_rows = DEFAULT_CHUNK_ROWS
 
         return ProcessorConfig(
             selected_columns=list(self.selected_columns),
@@ -311,7 +342,14 @@ class DataProcessorGUI:
                 countries_csv=self.actor2_countries.get(),
                 type_mode=self.a2_type_mode.get(),
                 type_codes_csv=self.a2_type_codes.get()
-            )
+            ),
+            workers=workers,
+            chunk_rows=chunk_rows,
+            engine=self.engine.get(),
+            incremental=self.incremental.get(),
+            cache=self.use_cache.get(),
+            aggregate_by=[t.strip() for t in self.aggregate_by.get().split(",") if t.strip()],
+            aggregate_measures=[t.strip() for t in self.aggregate_measures.get().split(",") if t.strip()],
         )
 
     def _worker_process(self):
@@ -0,0 +1,87 @@
+# 本地檔案清冊（下載與資料處理共用）
+from __future__ import annotations
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 視為「已落地」的資料檔：原始 CSV 或落地轉檔後的欄式格式
+LANDED_SUFFIXES = (".csv", ".parquet", ".feather")
+# 保留壓縮檔模式下不解壓的原始壓縮檔；資料處理直接從其中的 CSV 讀取
+ARCHIVE_SUFFIXES = (".zip",)
+
+
+def base_of(name: str) -> str:
+    """GDELT 檔名的基底：20150101.export.CSV → 20150101、1979.zip → 1979。"""
+    return os.path.basename(name).split(".", 1)[0]
+
+
+class LocalInventory:
+    """
+    以一次 os.scandir 建立資料夾索引（檔名 → (大小, 修改時間)，並依基底檔名分組），
+    「是否已有此檔」的查詢為 O(1)。下載或解壓後以 add()/discard() 就地更新，不必重掃目錄。
+    可跨執行緒共用。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[int, float]] = {}
+        self._by_base: Dict[str, Set[str]] = {}
+        self.refresh()
+
+    def refresh(self):
+        files, by_base = {}, {}
+        try:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if entry.name.startswith(".") or not entry.is_file():
+                        continue
+                    st = entry.stat()
+                    files[entry.name] = (st.st_size, st.st_mtime)
+                    by_base.setdefault(base_of(entry.name), set()).add(entry.name)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._files, self._by_base = files, by_base
+
+    def add(self, name: str):
+        path = os.path.join(self.root, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            self._files[name] = (st.st_size, st.st_mtime)
+            self._by_base.setdefault(base_of(name), set()).add(name)
+
+    def discard(self, name: str):
+        with self._lock:
+            self._files.pop(name, None)
+            names = self._by_base.get(base_of(name))
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._by_base[base_of(name)]
+
+    def has(self, name: str) -> bool:
+        with self._lock:
+            return name in self._files
+
+    def has_extracted(self, base: str) -> bool:
+        """是否已有該基底檔名解壓後的資料（.csv，或轉檔後的 .parquet/.feather）。"""
+        with self._lock:
+            return any(n.lower().endswith(LANDED_SUFFIXES) for n in self._by_base.get(str(base), ()))
+
+    def stat(self, name: str) -> Optional[Tuple[int, float]]:
+        with self._lock:
+            return self._files.get(name)
+
+    def files(self, suffixes: Iterable[str] = (".csv",)) -> List[str]:
+        """依檔名排序列出符合副檔名（不分大小寫）的檔案。"""
+        suffixes = tuple(s.lower() for s in suffixes)
+        with self._lock:
+            return sorted(n for n in self._files if n.lower().endswith(suffixes))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._files)
@@ -0,0 +1,200 @@
+# 彙總模式：不輸出原始列，改為依分組欄位輸出筆數與數值欄的總和／平均
+# 每塊資料先算部分彙總（總和、非空筆數），再逐步合併；記憶體只跟分組數有關
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import pandas as pd
+
+from GDELT_helper.processing.schema import INT_COLUMNS, column_dtypes, union_columns, to_text
+from GDELT_helper.processing.writers import open_writer
+
+# 常用分組的簡寫
+GROUP_ALIASES = {
+    "dyad": ("Actor1CountryCode", "Actor2CountryCode"),
+    "root": ("EventRootCode",),   # CAMEO 根代碼
+    "month": ("MonthYear",),
+    "year": ("Year",),
+    "date": ("SQLDATE",),
+    "quad": ("QuadClass",),
+}
+MEASURE_COLUMNS = ("GoldsteinScale", "AvgTone", "NumMentions", "NumSources", "NumArticles")
+MEASURE_STATS = ("sum", "mean")
+COUNT = "count"  # 每組事件筆數
+DEFAULT_MEASURES = ("count", "GoldsteinScale_mean", "AvgTone_mean", "NumMentions_sum")
+ROWS = "_rows"
+MERGE_ROWS = 200_000  # 累積的部分彙總超過這麼多列就先合併一次
+MEASURE_DECIMALS = 6  # 浮點彙總量（平均、浮點欄的總和）輸出的小數位數，去掉逐筆相加的浮點誤差
+
+
+def _parse_measure(m: str) -> Tuple[Optional[str], str]:
+    """'count' → (None, 'count')；'AvgTone_mean' → ('AvgTone', 'mean')。"""
+    if m == COUNT:
+        return None, COUNT
+    col, _, stat = m.rpartition("_")
+    if col not in MEASURE_COLUMNS or stat not in MEASURE_STATS:
+        raise ValueError(f"彙總量無效：{m}（可用 count 或 <欄位>_sum／<欄位>_mean，欄位為 {'、'.join(MEASURE_COLUMNS)}）")
+    return col, stat
+
+
+@dataclass(frozen=True)
+class AggregatePlan:
+    """
+    由 ProcessorConfig 編譯的彙總設定；可 pickle，供平行處理的子程序在各檔先算部分彙總。
+    部分彙總的欄位：分組欄 + _rows（筆數）+ 每個數值欄的 <欄>_sum 與 <欄>_n（非空筆數），可直接相加合併。
+    """
+    keys: tuple
+    measures: tuple
+
+    @classmethod
+    def compile(cls, cfg) -> Optional["AggregatePlan"]:
+        """cfg.aggregate_by 為空時回傳 None（輸出原始列）。"""
+        if not cfg.aggregate_by:
+            return None
+        known = set(union_columns())
+        keys: List[str] = []
+        for k in cfg.aggregate_by:
+            for c in GROUP_ALIASES.get(k.strip().lower(), (k.strip(),)):
+                if c not in known:
+                    raise ValueError(f"彙總分組欄位無效：{k}")
+                keys.append(c)
+        measures = tuple(dict.fromkeys(m.strip() for m in (cfg.aggregate_measures or DEFAULT_MEASURES)))
+        for m in measures:
+            _parse_measure(m)
+        return cls(tuple(dict.fromkeys(keys)), measures)
+
+    @property
+    def value_columns(self) -> tuple:
+        return tuple(dict.fromkeys(c for c, _ in map(_parse_measure, self.measures) if c))
+
+    @property
+    def input_columns(self) -> tuple:
+        """需要讀入的欄位（分組欄 + 數值欄）。"""
+        return self.keys + tuple(c for c in self.value_columns if c not in self.keys)
+
+    @property
+    def output_columns(self) -> tuple:
+        return self.keys + self.measures
+
+    def output_dtypes(self) -> Dict[str, str]:
+        """輸出欄位 → pandas dtype（欄式輸出據此決定型別）。"""
+        out = column_dtypes(list(self.keys))
+        for m in self.measures:
+            col, stat = _parse_measure(m)
+            out[m] = "Int64" if stat == COUNT or (stat == "sum" and col in INT_COLUMNS) else "float64"
+        return out
+
+    def _keys_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        # 兩種引擎、各檔的代碼欄型別不一（category／字串），統一成可為空值的 string 才能跨塊合併；
+        # 不能用 astype(str)：pandas 2.x 會把缺值寫成字面上的 "None"／"nan"
+        out = {}
+        for k, dt in column_dtypes(list(self.keys)).items():
+            s = df[k] if k in df.columns else pd.Series(pd.NA, index=df.index)
+            if dt in ("category", "str"):
+                out[k] = s.astype("string")
+            else:
+                out[k] = pd.to_numeric(s, errors="coerce").astype(dt)
+        return pd.DataFrame(out, index=df.index)
+
+    def partial(self, df: pd.DataFrame) -> pd.DataFrame:
+        """單塊資料的部分彙總。"""
+        data = self._keys_frame(df)
+        data[ROWS] = 1
+        for c in self.value_columns:
+            v = pd.to_numeric(df[c], errors="coerce").astype("float64") if c in df.columns else pd.Series(float("nan"), index=df.index)
+            data[f"{c}_sum"] = v.fillna(0.0)
+            data[f"{c}_n"] = v.notna().astype("int64")
+        return data.groupby(list(self.keys), dropna=False, sort=False).sum().reset_index()
+
+    def merge(self, parts: Sequence[pd.DataFrame]) -> pd.DataFrame:
+        """合併多個部分彙總（結果仍是部分彙總）。"""
+        df = pd.concat(parts, ignore_index=True)
+        return df.groupby(list(self.keys), dropna=False, sort=False).sum().reset_index()
+
+    def finalize(self, state: pd.DataFrame) -> pd.DataFrame:
+        """
+        部分彙總 → 輸出：依分組欄排序，總和在沒有任何非空值時為空值，平均為總和／非空筆數。
+        浮點的平均與總和四捨五入到小數 MEASURE_DECIMALS（6）位，文字與欄式輸出的值一致
+        （文字輸出再經 to_text 去掉多餘的 0，如 2.333333、1.5）；整數欄的總和維持整數。
+        """
+        state = state.sort_values(list(self.keys), na_position="last", ignore_index=True)
+        out = state[list(self.keys)].copy()
+        dtypes = self.output_dtypes()
+        for m in self.measures:
+            col, stat = _parse_measure(m)
+            if stat == COUNT:
+                out[m] = state[ROWS]
+            else:
+                n = state[f"{col}_n"]
+                total = state[f"{col}_sum"].where(n > 0)
+                out[m] = total if stat == "sum" else total / n.where(n > 0)
+            out[m] = out[m].astype(dtypes[m])
+            if dtypes[m] == "float64":
+                out[m] = out[m].round(MEASURE_DECIMALS)
+        return out
+
+
+class AggregateWriter:
+    """
+    取代串流寫出器：接收各塊的部分彙總並逐步合併，close() 時才算出結果寫出。
+    輸出在建立時就以 open_writer 開好（寫到暫存檔），不支援的格式或缺少的套件在掃描前就會報錯。
+    rows 為已彙總的事件筆數，groups 為輸出的組數。
+    """
+    wants_text = False
+
+    def __init__(self, path: str, agg: AggregatePlan, sep: str = "\t"):
+        self.path = path
+        self.agg = agg
+        self.rows = 0
+        self.groups = 0
+        self._state: Optional[pd.DataFrame] = None
+        self._pending: List[pd.DataFrame] = []
+        self._pending_rows = 0
+        self._merges = 0
+        self._writer = open_writer(path, agg.output_columns, dtypes=agg.output_dtypes(), sep=sep)
+
+    def write(self, part: pd.DataFrame):
+        if part.empty:
+            return
+        self._pending.append(part)
+        self._pending_rows += len(part)
+        self.rows += int(part[ROWS].sum())
+        if self._pending_rows >= MERGE_ROWS:
+            self._merge()
+
+    def _merge(self):
+        if self._pending:
+            parts = ([self._state] if self._state is not None else []) + self._pending
+            self._state = self.agg.merge(parts)
+            self._pending, self._pending_rows = [], 0
+            self._merges += 1
+
+    def mark(self) -> Tuple[int, int, int, int]:
+        return self._merges, len(self._pending), self._pending_rows, self.rows
+
+    def rollback(self, mark: Tuple[int, int, int, int]) -> bool:
+        """撤回 mark 之後收到的部分彙總；之後已合併過時無法分離，回傳 False。"""
+        merges, pending, pending_rows, rows = mark
+        if merges != self._merges:
+            return False
+        del self._pending[pending:]
+        self._pending_rows, self.rows = pending_rows, rows
+        return True
+
+    def close(self):
+        """寫出彙總結果；沒有任何資料時不留下輸出檔。"""
+        self._merge()
+        if self._state is None:
+            self._writer.close()
+            return
+        final = self.agg.finalize(self._state)
+        try:
+            self._writer.write(to_text(final) if self._writer.wants_text else final)
+        except Exception:
+            self._writer.abort()
+            raise
+        self._writer.close()
+        self.groups = len(final)
+
+    def abort(self):
+        self._state, self._pending = None, []
+        self._writer.abort()
@@ -0,0 +1,28 @@
+# 直接讀取 GDELT 的 .zip 壓縮檔（保留壓縮檔模式）：成員以串流解壓交給解析器，不落地暫存檔
+from __future__ import annotations
+import zipfile
+from typing import BinaryIO, List
+
+from GDELT_helper.inventory import ARCHIVE_SUFFIXES
+
+
+def is_archive(path: str) -> bool:
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def archive_members(path: str) -> List[str]:
+    """壓縮檔內的 CSV 成員（依壓縮檔內順序）；GDELT 每個壓縮檔只有一個。"""
+    with zipfile.ZipFile(path) as zf:
+        members = [i.filename for i in zf.infolist() if not i.is_dir() and i.filename.lower().endswith(".csv")]
+    if not members:
+        raise ValueError("壓縮檔內沒有 CSV。")
+    return members
+
+
+def open_member(path: str, member: str) -> BinaryIO:
+    """以唯讀串流開啟成員；關閉回傳的檔案物件時一併釋放壓縮檔。讀完時會檢查 CRC。"""
+    zf = zipfile.ZipFile(path)
+    try:
+        return zf.open(member)
+    finally:
+        zf.close()  # 已開啟的成員仍可讀取，壓縮檔在成員關閉時才真正關閉
@@ -0,0 +1,182 @@
+# 以 pyarrow 掃描與篩選（選用引擎）；未安裝 pyarrow 時由 processing.core 改用 pandas
+from __future__ import annotations
+import os
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import pandas as pd
+
+from GDELT_helper.processing.archive import is_archive, archive_members, open_member
+from GDELT_helper.processing.columnar import HAS_PYARROW, is_columnar, columnar_columns
+from GDELT_helper.processing.schema import sniff_columns, column_dtypes
+from GDELT_helper.processing.catalog import STAT_COLUMNS, StatsBuilder
+
+if HAS_PYARROW:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as ds
+
+BLOCK_SIZE = 8 << 20  # CSV 每個解析區塊的位元組數；區塊由多執行緒並行解析
+DEFAULT_BATCH_ROWS = 250_000
+
+
+def _arrow_types(columns: Iterable[str], dtypes: Optional[Dict[str, str]] = None):
+    mapping = {"Int64": pa.int64(), "float64": pa.float64()}
+    types = column_dtypes(list(columns))
+    types.update(dtypes or {})
+    return {c: mapping.get(dt, pa.string()) for c, dt in types.items()}
+
+
+def arrow_schema(columns: Iterable[str], dtypes: Optional[Dict[str, str]] = None) -> "pa.Schema":
+    """
+    內建欄位對應的 Arrow schema（整數 int64、浮點 float64，其餘為字串），欄序同 columns。
+    dtypes：非內建欄位（如彙總結果）的 pandas dtype，覆蓋預設的字串。
+    """
+    return pa.schema(list(_arrow_types(columns, dtypes).items()))
+
+
+def frame_to_arrow(df: pd.DataFrame, schema: "pa.Schema") -> Tuple["pa.Table", List[str]]:
+    """
+    依 schema 把資料框轉成 Arrow：缺的欄位補空值、多的欄位捨棄。讀檔時因髒值整欄保留成字串的數值欄
+    改為數值，無法解析的值存成空值；回傳 (table, 有這種情形的欄名)。
+    """
+    df = df.reindex(columns=schema.names)
+    coerced: List[str] = []
+    for f in schema:
+        is_int = pa.types.is_integer(f.type)
+        if (is_int or pa.types.is_floating(f.type)) and not pd.api.types.is_numeric_dtype(df[f.name]):
+            s = pd.to_numeric(df[f.name], errors="coerce")
+            df[f.name] = s.where(s == s.round()) if is_int else s
+            coerced.append(f.name)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False), coerced
+
+
+def _csv_options(names: List[str]) -> dict:
+    """
+    原始 CSV 的解析設定：依第一行欄數套用內建欄位與型別。
+    欄數不符的列不略過：Arrow 直接拋出 ArrowInvalid，由 processing.core 改用 pandas 讀整個檔案
+    （pandas 會補齊欄數不足的列），兩種引擎因此產生相同的列。
+    """
+    return dict(
+        read_options=pacsv.ReadOptions(column_names=names, block_size=BLOCK_SIZE),
+        parse_options=pacsv.ParseOptions(delimiter="\t"),
+        convert_options=pacsv.ConvertOptions(column_types=_arrow_types(names), strings_can_be_null=True),
+    )
+
+
+def _dataset(path: str):
+    """回傳 (dataset, 欄名)。"""
+    if is_columnar(path):
+        fmt = "parquet" if path.lower().endswith(".parquet") else "ipc"
+        return ds.dataset(path, format=fmt), columnar_columns(path)
+    names = sniff_columns(path)
+    return ds.dataset(path, format=ds.CsvFileFormat(**_csv_options(names))), names
+
+
+def _sources(path: str) -> Iterator[Tuple[Callable[..., "ds.Scanner"], List[str]]]:
+    """
+    產生 (建立 scanner 的函式, 欄名)。一般檔案為 dataset；.zip 為每個 CSV 成員的串流讀取器
+    （邊解壓邊解析，不落地），以 Scanner.from_batches 套用同樣的投影與篩選。
+    """
+    if not is_archive(path):
+        dataset, names = _dataset(path)
+        yield dataset.scanner, names
+        return
+    for member in archive_members(path):
+        names = sniff_columns(path, member)
+        with open_member(path, member) as f:
+            reader = pacsv.open_csv(f, **_csv_options(names))
+            yield lambda **kw: ds.Scanner.from_batches(reader, **kw), names
+
+
+def plan_expression(plan, fname: str, names: Iterable[str], log: Callable[[str], None]):
+    """把 FilterPlan 轉成 Arrow 運算式（語意同 FilterPlan.mask）；沒有任何條件時回傳 None。"""
+    names = set(names)
+    f = ds.field
+    terms = []
+    present = lambda c: f(c).is_valid() & (f(c) != "")
+
+    if plan.year_range and not plan.in_year_range(fname):
+        start, end = plan.year_range
+        if "Year" in names:
+            terms.append((f("Year") >= start) & (f("Year") <= end))
+        elif "SQLDATE" in names:
+            terms.append((f("SQLDATE") >= start * 10000) & (f("SQLDATE") < (end + 1) * 10000))
+        else:
+            log(f"ℹ️ {fname} 無 Year/SQLDATE，無法做年份篩選。")
+
+    for label, sp in (("1", plan.a1), ("2", plan.a2)):
+        c = f"Actor{label}CountryCode"
+        if c not in names:
+            log(f"{fname} 缺 {c}，略過 A{label} 國家過濾。")
+        elif sp.country_rule == "codes":
+            terms.append(f(c).isin(sorted(sp.countries)))
+        elif sp.country_rule == "present":
+            terms.append(present(c))
+    if plan.cross_country and {"Actor1CountryCode", "Actor2CountryCode"} <= names:
+        terms.append(present("Actor1CountryCode") & present("Actor2CountryCode")
+                     & (f("Actor1CountryCode") != f("Actor2CountryCode")))
+
+    for label, sp in (("1", plan.a1), ("2", plan.a2)):
+        if sp.type_rule == "any":
+            continue
+        c = f"Actor{label}Type1Code"
+        if c not in names:
+            log(f"{fname} 缺 {c} 欄，略過 A{label} 類型過濾。")
+        elif sp.type_rule == "codes":
+            terms.append(f(c).isin(sorted(sp.types)))
+        else:
+            terms.append(present(c))
+
+    expr = None
+    for t in terms:
+        expr = t if expr is None else expr & t
+    return expr
+
+
+def scan_batches(path: str, plan, batch_rows: Optional[int], log: Callable[[str], None],
+                 stats: Optional[StatsBuilder] = None) -> Iterator[pd.DataFrame]:
+    """
+    以 Arrow dataset 掃描單一檔案：欄位投影（plan.read_columns）與篩選都在 Arrow 內完成（多執行緒），
+    只有通過篩選的列才轉成 pandas；產生型別化、尚未整理欄位的結果。
+    stats：要順便統計時，改為整批讀入統計欄位、在 Arrow 內逐批篩選（不再下推到掃描）。
+    path 為 .zip 時依序串流讀取其中的 CSV 成員。
+    """
+    for make_scanner, names in _sources(path):
+        yield from _scan(make_scanner, names, path, plan, batch_rows, log, stats)
+    if stats is not None:
+        stats.complete = True
+
+
+def _scan(make_scanner, names: List[str], path: str, plan, batch_rows: Optional[int],
+          log: Callable[[str], None], stats: Optional[StatsBuilder]) -> Iterator[pd.DataFrame]:
+    fname = os.path.basename(path)
+    columns: List[str] = [c for c in plan.read_columns if c in names] if plan.read_columns else list(names)
+    expr = plan_expression(plan, fname, names, log)
+    int_mapper = {pa.int64(): pd.Int64Dtype()}.get
+    batch_size = batch_rows or DEFAULT_BATCH_ROWS
+    if stats is None:
+        scanner = make_scanner(columns=columns, filter=expr, batch_size=batch_size, use_threads=True)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas(types_mapper=int_mapper)
+        return
+    stat_columns = [c for c in STAT_COLUMNS if c in names]
+    scanner = make_scanner(columns=list(dict.fromkeys(columns + stat_columns)), batch_size=batch_size,
+                           use_threads=True)
+    for batch in scanner.to_batches():
+        stats.update(batch.select(stat_columns).to_pandas(types_mapper=int_mapper))
+        table = pa.Table.from_batches([batch])
+        if expr is not None:
+            table = table.filter(expr)
+        if table.num_rows:
+            yield table.select(columns).to_pandas(types_mapper=int_mapper)
+
+
+def scan_file(path: str, plan, batch_rows: Optional[int], log: Callable[[str], None],
+              stats: Optional[StatsBuilder] = None) -> Iterator[pd.DataFrame]:
+    """scan_batches 再整理欄位（FilterPlan.project）；產生型別化的輸出結果。"""
+    fname = os.path.basename(path)
+    for df in scan_batches(path, plan, batch_rows, log, stats):
+        df = plan.project(df, fname, log)
+        if df is None:
+            return
+        yield df
@@ -0,0 +1,115 @@
+# 逐檔篩選結果的磁碟快取（有容量上限，依最近使用時間淘汰）
+from __future__ import annotations
+import hashlib
+import os
+import tempfile
+from typing import Optional, Tuple
+import pandas as pd
+
+from GDELT_helper.processing.columnar import HAS_PYARROW
+from GDELT_helper.processing.incremental import file_signature
+
+CACHE_DIR = ".gdelt_cache"  # 預設放在原始資料夾內；以 . 開頭，不會被當成資料檔
+DEFAULT_CACHE_MB = 2048
+# 有 pyarrow 時存成 Parquet（型別完整、讀取快），否則用 pandas pickle
+CACHE_SUFFIX = ".parquet" if HAS_PYARROW else ".pkl"
+
+
+class ResultCache:
+    """
+    以「輸入檔（相對於 root 的路徑、大小、修改時間）＋列篩選規則」為鍵，存放單一檔案通過篩選的列（全部欄位、型別化）。
+    分區資料集在不同目錄下常有同名檔案，因此以相對路徑而非檔名區分；root 為 None 時以檔名為準。
+    年份範圍與輸出欄位不在鍵內：命中後再套用完整的 FilterPlan，因此只改這兩項的查詢仍可命中。
+    每次命中會更新檔案的修改時間；evict() 依修改時間由舊到新刪除，直到總量不超過 max_bytes。
+    只存路徑與上限，可 pickle，供平行處理的子程序使用。
+    快取只用來加速：寫入失敗（資料夾唯讀、磁碟已滿等）時略過，不影響篩選結果。
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_MB << 20, root: Optional[str] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.root = root
+        self.read_only = False
+
+    def check_writable(self) -> bool:
+        """確認快取資料夾可寫入；不行時改為唯讀（只讀取既有項目、不再寫入），回傳是否可寫入。"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, probe = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            os.close(fd)
+            os.remove(probe)
+        except OSError:
+            self.read_only = True
+        return not self.read_only
+
+    def key(self, path: str, rule_fingerprint: str) -> str:
+        size, mtime_ns = file_signature(path)
+        name = os.path.relpath(path, self.root).replace(os.sep, "/") if self.root else os.path.basename(path)
+        raw = f"{name}\0{size}\0{mtime_ns}\0{rule_fingerprint}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        path = self._path(key)
+        try:
+            df = pd.read_parquet(path) if HAS_PYARROW else pd.read_pickle(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # 寫到一半或損壞的項目：刪掉重算
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> Optional[str]:
+        """寫入一個項目；失敗時清掉暫存檔並回傳錯誤訊息（唯讀時直接略過），成功回傳 None。"""
+        if self.read_only:
+            return None
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            df = df.reset_index(drop=True)
+            if HAS_PYARROW:
+                df.to_parquet(tmp, index=False, compression="zstd")
+            else:
+                df.to_pickle(tmp)
+            os.replace(tmp, path)
+        except Exception as e:  # 寫不進快取不能讓已篩出的結果跟著失敗
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return str(e) or type(e).__name__
+        return None
+
+    def evict(self) -> Tuple[int, int]:
+        """淘汰最久未用的項目直到不超過上限；回傳 (刪除數, 釋放位元組)。"""
+        try:
+            with os.scandir(self.directory) as it:
+                items = [(e.stat().st_mtime_ns, e.stat().st_size, e.path) for e in it
+                         if e.is_file() and e.name.endswith(CACHE_SUFFIX)]
+        except OSError:
+            return 0, 0
+        total = sum(size for _, size, _ in items)
+        removed = freed = 0
+        for _, size, path in sorted(items):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
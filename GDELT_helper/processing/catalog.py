@@ -0,0 +1,151 @@
+# 檔案層級統計目錄：每個資料檔的列數、SQLDATE／年份範圍與各代碼欄出現過的代碼，
+# 處理時用來在開檔前略過不可能有符合資料的檔案
+from __future__ import annotations
+import json
+import os
+from dataclasses import dataclass, asdict, field
+from typing import Dict, List, Optional, Set, Tuple
+import pandas as pd
+
+CATALOG_FILE = ".gdelt_catalog.json"  # 放在原始資料夾內
+CATALOG_VERSION = 1
+CODE_COLUMNS = ("Actor1CountryCode", "Actor2CountryCode", "Actor1Type1Code", "Actor2Type1Code")
+STAT_COLUMNS = ("SQLDATE", "Year") + CODE_COLUMNS
+
+
+@dataclass
+class FileStats:
+    name: str       # 相對於原始資料夾的檔名
+    size: int
+    mtime_ns: int
+    rows: int = 0
+    min_date: Optional[int] = None
+    max_date: Optional[int] = None
+    years: Optional[List[int]] = None  # [最小, 最大]（依 Year，缺欄時依 SQLDATE）；[] 為沒有有效年份；None 為兩欄都缺
+    codes: Dict[str, Optional[List[str]]] = field(default_factory=dict)  # 欄名 → 出現過的非空代碼；None 為缺此欄
+
+
+def _bounds(values: pd.Series, prev: List[Optional[int]]):
+    values = values.dropna()
+    if values.empty:
+        return
+    lo, hi = int(values.min()), int(values.max())
+    prev[0] = lo if prev[0] is None else min(prev[0], lo)
+    prev[1] = hi if prev[1] is None else max(prev[1], hi)
+
+
+class StatsBuilder:
+    """邊讀邊累計單一檔案的統計（update 要在篩選前呼叫）；整檔讀完時設 complete=True 才會寫入目錄。"""
+
+    def __init__(self):
+        self.rows = 0
+        self.complete = False
+        self._columns: Optional[Set[str]] = None
+        self._dates: List[Optional[int]] = [None, None]
+        self._years: List[Optional[int]] = [None, None]
+        self._codes: Dict[str, Set[str]] = {}
+
+    def update(self, df: pd.DataFrame):
+        if self._columns is None:
+            self._columns = set(df.columns)
+        self.rows += len(df)
+        # 年份的取法與 FilterPlan.mask 相同，略過的判斷才會一致
+        if "SQLDATE" in df.columns:
+            _bounds(pd.to_numeric(df["SQLDATE"], errors="coerce"), self._dates)
+        if "Year" in df.columns:
+            _bounds(pd.to_numeric(df["Year"], errors="coerce"), self._years)
+        elif "SQLDATE" in df.columns:
+            _bounds(pd.to_numeric(df["SQLDATE"].astype(str).str[:4], errors="coerce"), self._years)
+        for c in CODE_COLUMNS:
+            if c in df.columns:
+                found = self._codes.setdefault(c, set())
+                found.update(v for v in df[c].dropna().unique() if v != "")
+
+    def result(self, name: str, signature: Tuple[int, int]) -> FileStats:
+        cols = self._columns or set()
+        has_year = bool(cols & {"Year", "SQLDATE"})
+        return FileStats(
+            name, *signature, rows=self.rows,
+            min_date=self._dates[0], max_date=self._dates[1],
+            years=([] if self._years[0] is None else list(self._years)) if has_year else None,
+            codes={c: (sorted(self._codes[c]) if c in cols else None) for c in CODE_COLUMNS},
+        )
+
+
+def may_match(plan, st: FileStats, fname: str) -> bool:
+    """依統計判斷檔案是否可能有符合 plan 的列；無法判斷時一律回傳 True。"""
+    if st.rows == 0:
+        return False
+    if plan.year_range and not plan.in_year_range(fname) and st.years is not None:
+        start, end = plan.year_range
+        if not st.years or st.years[1] < start or st.years[0] > end:
+            return False
+    codes = st.codes
+    for label, sp in (("1", plan.a1), ("2", plan.a2)):
+        countries = codes.get(f"Actor{label}CountryCode")
+        if countries is not None:
+            if sp.country_rule == "codes" and sp.countries.isdisjoint(countries):
+                return False
+            if sp.country_rule == "present" and not countries:
+                return False
+        types = codes.get(f"Actor{label}Type1Code")
+        if types is not None:
+            if sp.type_rule == "codes" and sp.types.isdisjoint(types):
+                return False
+            if sp.type_rule == "labeled" and not types:
+                return False
+    if plan.cross_country:
+        c1, c2 = codes.get("Actor1CountryCode"), codes.get("Actor2CountryCode")
+        if c1 is not None and c2 is not None and (not c1 or not c2 or (len(c1) == 1 and c1 == c2)):
+            return False
+    return True
+
+
+class Catalog:
+    """原始資料夾的統計目錄（<原始資料夾>/.gdelt_catalog.json）；檔案大小或修改時間變了，舊統計就不再使用。"""
+
+    def __init__(self, root: str, files: Optional[Dict[str, FileStats]] = None):
+        self.root = root
+        self.files: Dict[str, FileStats] = files or {}
+        self.dirty = False
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.root, CATALOG_FILE)
+
+    @classmethod
+    def load(cls, root: str) -> "Catalog":
+        """讀取目錄；不存在或損壞時回傳空目錄。"""
+        cat = cls(root)
+        try:
+            with open(cat.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CATALOG_VERSION:
+                cat.files = {e["name"]: FileStats(**e) for e in data["files"]}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return cat
+
+    def lookup(self, name: str, signature: Tuple[int, int]) -> Optional[FileStats]:
+        st = self.files.get(name)
+        if st is None or (st.size, st.mtime_ns) != tuple(signature):
+            return None
+        return st
+
+    def add(self, st: FileStats):
+        self.files[st.name] = st
+        self.dirty = True
+
+    def save(self):
+        """寫回目錄並移除已不存在的檔案；資料夾無法寫入時略過（下次再統計）。"""
+        if not self.dirty:
+            return
+        files = [st for name, st in sorted(self.files.items()) if os.path.exists(os.path.join(self.root, name))]
+        data = {"version": CATALOG_VERSION, "files": [asdict(st) for st in files]}
+        try:
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(self.path + ".tmp", self.path)
+            self.dirty = False
+        except OSError:
+            pass
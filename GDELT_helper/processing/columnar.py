@@ -0,0 +1,95 @@
+# 欄式格式（Parquet / Feather）轉檔與讀取；需要 pyarrow
+from __future__ import annotations
+import os
+from typing import Callable, Iterable, Iterator, List, Optional
+import pandas as pd
+
+from GDELT_helper.processing.schema import read_typed_csv
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+COLUMNAR_FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+COLUMNAR_SUFFIXES = tuple(COLUMNAR_FORMATS.values())
+
+
+def is_columnar(path: str) -> bool:
+    return path.lower().endswith(COLUMNAR_SUFFIXES)
+
+
+def columnar_path(csv_path: str, fmt: str) -> str:
+    """20150101.export.CSV → 20150101.export.parquet"""
+    return os.path.splitext(csv_path)[0] + COLUMNAR_FORMATS[fmt]
+
+
+def convert_csv(csv_path: str, fmt: str = "parquet", keep_raw: bool = True,
+                log: Optional[Callable[[str], None]] = None) -> str:
+    """把一個原始檔轉成欄式格式（型別化欄位、zstd 壓縮），回傳輸出路徑；keep_raw=False 時刪除原始 CSV。"""
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"不支援的格式：{fmt}")
+    if not HAS_PYARROW:
+        raise ImportError("需要安裝 pyarrow 才能轉成 Parquet/Feather。")
+    df = read_typed_csv(csv_path)
+    out = columnar_path(csv_path, fmt)
+    tmp = out + ".tmp"
+    if fmt == "parquet":
+        df.to_parquet(tmp, index=False, compression="zstd")
+    else:
+        df.reset_index(drop=True).to_feather(tmp, compression="zstd")
+    os.replace(tmp, out)
+    if not keep_raw:
+        os.remove(csv_path)
+    if log:
+        out_mb = os.path.getsize(out) / 1024 / 1024
+        log(f"已轉為 {fmt}：{os.path.basename(out)}（{out_mb:.2f} MB{'' if keep_raw else '，已刪除原始 CSV'}）")
+    return out
+
+
+def columnar_columns(path: str) -> List[str]:
+    """只讀檔案中繼資料取得欄名，不載入資料。"""
+    if path.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(path).names)
+    import pyarrow.ipc as ipc
+    with ipc.open_file(path) as reader:
+        return list(reader.schema.names)
+
+
+def iter_columnar(path: str, columns: Optional[Iterable[str]] = None,
+                  chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """逐批讀取欄式檔；Parquet 依 chunksize 分批，Feather 依檔案內的 record batch 分批。"""
+    if not chunksize:
+        yield read_columnar(path, columns)
+        return
+    import pyarrow as pa
+    cols: Optional[List[str]] = None
+    if columns is not None:
+        present = set(columnar_columns(path))
+        cols = [c for c in columns if c in present]
+    if path.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=cols):
+            yield pa.Table.from_batches([batch]).to_pandas()
+        return
+    import pyarrow.ipc as ipc
+    with ipc.open_file(path) as reader:
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if cols is not None:
+                batch = batch.select(cols)
+            yield pa.Table.from_batches([batch]).to_pandas()
+
+
+def read_columnar(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """columns：只讀這些欄位（檔案中沒有的欄位自動略過）；None 為全部。"""
+    cols: Optional[List[str]] = None
+    if columns is not None:
+        present = set(columnar_columns(path))
+        cols = [c for c in columns if c in present]
+    if path.lower().endswith(".parquet"):
+        return pd.read_parquet(path, columns=cols)
+    return pd.read_feather(path, columns=cols)
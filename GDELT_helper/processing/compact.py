@@ -0,0 +1,145 @@
+# 把原始資料夾壓實成依 SQLDATE 年/月分區的 Parquet 資料集（year=YYYY/month=M）；需要 pyarrow
+# 命令列：python -m GDELT_helper.processing.compact <原始資料夾> <資料集資料夾> [--chunk-rows N] [--overwrite]
+from __future__ import annotations
+import argparse
+import os
+import shutil
+import sys
+from typing import Callable, Dict, Iterator, List, Optional
+import pandas as pd
+
+from GDELT_helper.inventory import LocalInventory, base_of
+from GDELT_helper.processing.columnar import HAS_PYARROW
+from GDELT_helper.processing.core import DEFAULT_CHUNK_ROWS, list_data_files, read_chunks
+from GDELT_helper.processing.dataset import part_source, partition_files
+from GDELT_helper.processing.schema import union_columns
+
+if HAS_PYARROW:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from GDELT_helper.processing.arrow_engine import arrow_schema, frame_to_arrow
+
+STAGING_DIR = ".staging"  # 單一來源檔先寫到這裡，完整寫完才搬進資料集
+
+
+class _Stopped(Exception):
+    pass
+
+
+def _partition_schema() -> "pa.Schema":
+    return pa.schema([("year", pa.int16()), ("month", pa.int8())])
+
+
+def _batches(path: str, schema: "pa.Schema", chunk_rows: Optional[int], counter: List[int],
+             log: Callable[[str], None], stop_flag: Optional[Callable[[], bool]]) -> Iterator["pa.RecordBatch"]:
+    """逐塊讀取來源檔，補齊為內建欄位、加上 year/month 分區欄後轉成 Arrow。"""
+    fname = os.path.basename(path)
+    warned = set()
+    for df in read_chunks(path, None, chunk_rows):
+        if stop_flag and stop_flag():
+            raise _Stopped()
+        date = pd.to_numeric(df["SQLDATE"], errors="coerce") if "SQLDATE" in df.columns else pd.Series(pd.NA, index=df.index)
+        df = df.assign(year=date // 10000, month=date // 100 % 100)
+        # 資料集為固定型別：數值欄的髒值存成空值
+        table, coerced = frame_to_arrow(df, schema)
+        for c in coerced:
+            if c not in warned:
+                warned.add(c)
+                log(f"{fname} 的 {c} 欄有無法轉成數值的內容，已存為空值。")
+        counter[0] += table.num_rows
+        yield from table.to_batches()
+
+
+def compact_directory(
+    raw_dir: str,
+    out_dir: str,
+    log: Callable[[str], None] = print,
+    stop_flag: Optional[Callable[[], bool]] = None,
+    chunk_rows: Optional[int] = DEFAULT_CHUNK_ROWS,
+    overwrite: bool = False,
+) -> Dict[str, int]:
+    """
+    把 raw_dir 的資料檔（原始 CSV 或落地轉檔的 Parquet/Feather）逐檔寫入 out_dir 的分區資料集。
+    每個來源檔在各分區中產生 <基底檔名>-<n>.parquet；已在資料集中的來源檔預設略過，
+    overwrite=True 時重新壓實並取代舊的分區檔。所有檔案欄位一致（內建欄位聯集，缺欄為空值）。
+    回傳: {'files_total', 'compacted', 'skipped', 'errors', 'rows'}
+    """
+    if not HAS_PYARROW:
+        raise ImportError("需要安裝 pyarrow 才能建立分區資料集。")
+    if not raw_dir or not os.path.isdir(raw_dir):
+        raise FileNotFoundError("無此資料夾或路徑（原始資料夾）。")
+    os.makedirs(out_dir, exist_ok=True)
+
+    files = list_data_files(LocalInventory(raw_dir))
+    existing: Dict[str, List[str]] = {}
+    for rel in partition_files(out_dir):
+        existing.setdefault(part_source(rel), []).append(rel)
+
+    schema = arrow_schema(union_columns()).append(pa.field("year", pa.int16())).append(pa.field("month", pa.int8()))
+    partitioning = ds.partitioning(_partition_schema(), flavor="hive")
+    write_options = ds.ParquetFileFormat().make_write_options(compression="zstd")
+    staging_root = os.path.join(out_dir, STAGING_DIR)
+    stats = {'files_total': len(files), 'compacted': 0, 'skipped': 0, 'errors': 0, 'rows': 0}
+
+    try:
+        for idx, fname in enumerate(files, start=1):
+            if stop_flag and stop_flag():
+                log("壓實已中止。")
+                break
+            base = base_of(fname)
+            if base in existing and not overwrite:
+                stats['skipped'] += 1
+                continue
+            staging = os.path.join(staging_root, base)
+            shutil.rmtree(staging, ignore_errors=True)
+            counter = [0]
+            try:
+                ds.write_dataset(
+                    _batches(os.path.join(raw_dir, fname), schema, chunk_rows, counter, log, stop_flag),
+                    staging, schema=schema, format="parquet", partitioning=partitioning,
+                    basename_template=base + "-{i}.parquet", file_options=write_options,
+                )
+            except _Stopped:
+                shutil.rmtree(staging, ignore_errors=True)
+                log("壓實已中止。")
+                break
+            except Exception as e:
+                shutil.rmtree(staging, ignore_errors=True)
+                stats['errors'] += 1
+                log(f"錯誤 {fname}：{e}")
+                continue
+            for rel in existing.get(base, []):
+                os.remove(os.path.join(out_dir, rel))
+            for rel in partition_files(staging):
+                dest = os.path.join(out_dir, rel)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(os.path.join(staging, rel), dest)
+            shutil.rmtree(staging, ignore_errors=True)
+            stats['compacted'] += 1
+            stats['rows'] += counter[0]
+            log(f"{fname} 已壓實 {counter[0]:,} 筆（{idx}/{len(files)}）")
+    finally:
+        shutil.rmtree(staging_root, ignore_errors=True)
+
+    if stats['skipped']:
+        log(f"略過 {stats['skipped']} 個已在資料集中的檔案。")
+    log(f"完成！共壓實 {stats['compacted']} 檔、{stats['rows']:,} 筆至：{out_dir}")
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m GDELT_helper.processing.compact",
+        description="把 GDELT 原始資料夾壓實成依年/月分區（year=/month=）的 Parquet 資料集。",
+    )
+    ap.add_argument("raw_dir", help="原始資料夾（.csv 或落地轉檔的 .parquet/.feather）")
+    ap.add_argument("out_dir", help="分區資料集資料夾；可直接作為資料處理的原始資料夾")
+    ap.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="每批讀入列數（0＝整檔）")
+    ap.add_argument("--overwrite", action="store_true", help="重新壓實已在資料集中的檔案")
+    args = ap.parse_args(argv)
+    stats = compact_directory(args.raw_dir, args.out_dir, chunk_rows=args.chunk_rows, overwrite=args.overwrite)
+    return 1 if stats['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,36 @@
 # processing.py
 from __future__ import annotations
-import os, re, requests
-from dataclasses import dataclass, field
+import hashlib, json, os, re, shutil, tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timezone
-from typing import Callable, Iterable, Optional, List, Dict, Any
+from typing import Callable, Iterable, Iterator, Optional, List, Dict, Any
 import pandas as pd
 
+from GDELT_helper.inventory import LocalInventory, LANDED_SUFFIXES, ARCHIVE_SUFFIXES, base_of
+from GDELT_helper.processing.columnar import HAS_PYARROW, is_columnar, read_columnar, iter_columnar
+from GDELT_helper.processing import arrow_engine
+from GDELT_helper.processing.dataset import is_partitioned, partition_files
+from GDELT_helper.processing.incremental import FileEntry, OutputManifest, file_signature
+from GDELT_helper.processing.cache import CACHE_DIR, DEFAULT_CACHE_MB, ResultCache
+from GDELT_helper.processing.catalog import STAT_COLUMNS, Catalog, StatsBuilder, may_match
+from GDELT_helper.processing.schema import SCHEMA_VERSION, SCHEMAS, union_columns, read_typed_csv, iter_typed_csv, as_text, to_text
+from GDELT_helper.processing.writers import open_writer, supports_incremental
+from GDELT_helper.processing.aggregate import DEFAULT_MEASURES, AggregatePlan, AggregateWriter
+
+if HAS_PYARROW:
+    from pyarrow import ArrowInvalid
+else:
+    class ArrowInvalid(Exception):
+        pass
+
 REQUEST_TIMEOUT = 30
 
+# 官方標頭檔（僅供參考；欄位已內建於 processing.schema，讀檔不需連線）
 GDELT_HEADER_URLS = {
-    "Historical (1979–2013)": "https://www.gdeltproject.org/data/lookups/CSV.header.historical.txt",
-    "DailyUpdates (2013+)": "https://www.gdeltproject.org/data/lookups/CSV.header.dailyupdates.txt",
+    "Historical (1979–2013)": SCHEMAS["historical"].source,
+    "DailyUpdates (2013+)": SCHEMAS["daily"].source,
 }
 
 BUILTIN_COLUMNS = [
@@ -22,6 +42,12 @@ BUILTIN_COLUMNS = [
     "QuadClass", "GoldsteinScale", "AvgTone"
 ]
 
+ENGINES = ("pandas", "arrow")
+
+# 分塊讀取的預設列數：大型年度檔也只需這麼多列的記憶體
+DEFAULT_CHUNK_ROWS = 250_000
+SPILL_PREFIX = ".gdelt_spill-"  # 平行處理時子程序暫存結果的資料夾（建在輸出資料夾內，結束即刪除）
+
 COMMON_ACTOR_TYPES = ["GOV", "MIL", "COP", "JUD", "SPY", "OPP", "REB", "BUS", "EDU", "HLH", "MED", "ELI", "CVL", "REF", "JRN", "NGO"]
 QUICK_ISO3 = ["USA", "CHN", "RUS", "GBR", "FRA", "DEU", "JPN"]
 
@@ -44,46 +70,57 @@ def filename_year_in_range(fname: str, start: int, end: int) -> bool:
     return (y is not None) and (start <= y <= end)
 
 def get_headers_union(timeout: int = REQUEST_TIMEOUT) -> List[str]:
-    def fetch(url):
-        r = requests.get(url, timeout=timeout)
-        r.raise_for_status()
-        return r.text.strip().split("\t")
-    cols_daily = fetch(GDELT_HEADER_URLS["DailyUpdates (2013+)"])
-    cols_hist = fetch(GDELT_HEADER_URLS["Historical (1979–2013)"])
-    union, seen = [], set()
-    for name in cols_daily + cols_hist:
-        if name not in seen:
-            union.append(name); seen.add(name)
-    return union
-
-def safe_read(path: str, timeout: int = REQUEST_TIMEOUT) -> pd.DataFrame:
-    """能自動偵測兩種 header；回傳全字串型別以保安全。"""
-    def read_with(columns):
-        return pd.read_csv(
-            path, sep="\t", header=None, names=columns, dtype=str,
-            on_bad_lines="skip", low_memory=False, engine="c"
-        )
-    try:
-        cols = requests.get(GDELT_HEADER_URLS["DailyUpdates (2013+)"], timeout=timeout).text.strip().split("\t")
-        return read_with(cols)
-    except Exception:
-        cols = requests.get(GDELT_HEADER_URLS["Historical (1979–2013)"], timeout=timeout).text.strip().split("\t")
-        return read_with(cols)
+    """兩種標頭的欄位聯集；取自內建欄位表，timeout 僅為相容舊呼叫而保留。"""
+    return union_columns()
+
+def _source_rank(name: str) -> int:
+    """同一基底檔名有多種形式時的優先順序：欄式檔 > 原始 CSV > 壓縮檔。"""
+    if is_columnar(name):
+        return 2
+    return 0 if name.lower().endswith(ARCHIVE_SUFFIXES) else 1
+
+def list_data_files(inventory: LocalInventory) -> List[str]:
+    """
+    列出可處理的資料檔（.csv、落地轉檔後的 .parquet/.feather，以及保留壓縮檔模式的 .zip），依檔名排序。
+    同一基底檔名有多種形式時只取一個（欄式檔優先，其次原始 CSV），避免重複計算。
+    """
+    chosen: Dict[str, str] = {}
+    for name in inventory.files(LANDED_SUFFIXES + ARCHIVE_SUFFIXES):
+        prev = chosen.get(base_of(name))
+        if prev is None or _source_rank(name) > _source_rank(prev):
+            chosen[base_of(name)] = name
+    return sorted(chosen.values())
+
+def safe_read(path: str, timeout: int = REQUEST_TIMEOUT, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    依第一行欄數選用歷史檔（57 欄）或每日檔（58 欄）標頭，不需連線。
+    欄位依 processing.schema 型別化：數值為 Int64/float64、代碼欄為 category、其餘為字串；
+    匯出前以 to_text 轉回原始寫法。Parquet/Feather 直接讀取（已含欄名與型別）。
+    columns：只解析這些欄位（檔案沒有的欄位略過）；None 為全部欄位。
+    timeout 僅為相容舊呼叫而保留。
+    """
+    if is_columnar(path):
+        return read_columnar(path, columns)
+    return read_typed_csv(path, columns)
+
+PRIORITY_COLUMNS = [
+    "Year", "MonthYear", "SQLDATE",
+    "Actor1CountryCode", "Actor1Type1Code",
+    "Actor2CountryCode", "Actor2Type1Code",
+    "EventCode", "EventBaseCode", "EventRootCode",
+    "QuadClass", "GoldsteinScale"
+]
+
+def priority_order(columns: Iterable[str]) -> List[str]:
+    base = list(columns)
+    return [c for c in PRIORITY_COLUMNS if c in base] + [c for c in base if c not in PRIORITY_COLUMNS]
 
 def reorder_columns_priority(df: pd.DataFrame, user_subset: Optional[Iterable[str]] = None) -> pd.DataFrame:
-    priority = [
-        "Year", "MonthYear", "SQLDATE",
-        "Actor1CountryCode", "Actor1Type1Code",
-        "Actor2CountryCode", "Actor2Type1Code",
-        "EventCode", "EventBaseCode", "EventRootCode",
-        "QuadClass", "GoldsteinScale"
-    ]
     if user_subset is None:
         base = list(df.columns)
     else:
         base = [c for c in user_subset if c in df.columns]
-    ordered = [c for c in priority if c in base] + [c for c in base if c not in priority]
-    return df[ordered]
+    return df[priority_order(base)]
 
 def _parse_token_list(txt: str) -> set[str]:
     s = (txt or "").strip()
@@ -109,7 +146,422 @@ class ProcessorConfig:
     only_cross_country: bool = False
     a1: SideFilter = field(default_factory=SideFilter)
     a2: SideFilter = field(default_factory=SideFilter)
+    workers: int = 1  # >1 時以多個程序平行讀取與篩選
+    chunk_rows: int = DEFAULT_CHUNK_ROWS  # 每次讀入的列數；0 為整檔讀入
+    engine: str = "pandas"  # "pandas" 或 "arrow"（pyarrow 多執行緒讀檔＋Arrow 運算式篩選）
+    incremental: bool = False  # 只處理新增或變更的檔案，其餘沿用既有輸出（見 processing.incremental）
+    cache: bool = False  # 快取各檔篩選結果（見 processing.cache）
+    cache_dir: Optional[str] = None  # None 為 <原始資料夾>/.gdelt_cache
+    cache_max_mb: int = DEFAULT_CACHE_MB
+    use_catalog: bool = True  # 依統計目錄略過不可能符合的檔案，並在讀檔時順便補齊統計（見 processing.catalog）
+    aggregate_by: List[str] = field(default_factory=list)  # 彙總分組欄位或簡寫（dyad、root、month…）；空為輸出原始列
+    aggregate_measures: List[str] = field(default_factory=lambda: list(DEFAULT_MEASURES))  # 見 processing.aggregate
+    text_sep: str = "\t"  # 文字輸出的分隔字元；預設 tab（.csv 也是，與舊版相同），要逗號分隔時設為 ","
+
+
+# ---------- 篩選計畫 ----------
+_CODE_RE = re.compile(r"^[A-Z0-9]{3}$")
+
+@dataclass(frozen=True)
+class SidePlan:
+    """
+    單一行為者的篩選規則。
+    country_rule："present"（國家碼非空）、"codes"（屬於 countries）、"any"（不篩）。
+    type_rule："any"（不篩）、"labeled"（類型碼非空）、"codes"（屬於 types）。
+    """
+    country_rule: str = "present"
+    countries: frozenset = frozenset()
+    type_rule: str = "any"
+    types: frozenset = frozenset()
+
+@dataclass(frozen=True)
+class FilterPlan:
+    """
+    由 ProcessorConfig 編譯一次的篩選計畫：代碼清單已正規化成集合，需要讀入與輸出的欄位已決定，
+    設定上的提醒（warnings）整次執行只回報一次。可 pickle，供平行處理的子程序使用。
+    """
+    year_range: Optional[tuple] = None
+    a1: SidePlan = SidePlan()
+    a2: SidePlan = SidePlan()
+    cross_country: bool = False
+    select: Optional[tuple] = None          # 使用者選的輸出欄位；None 為全部
+    read_columns: Optional[tuple] = None    # 需要讀入的欄位（輸出 ∪ 篩選用）；None 為全部
+    output_columns: tuple = ()              # 輸出檔的固定欄位順序
+    warnings: tuple = ()
+
+    @classmethod
+    def compile(cls, cfg: "ProcessorConfig") -> "FilterPlan":
+        warnings: List[str] = []
+
+        def side(label: str, sf: SideFilter) -> SidePlan:
+            if sf.country_mode not in ("all", "custom"):
+                raise ValueError(f"{label} 國家模式無效：{sf.country_mode}")
+            if sf.type_mode not in ("all", "labeled", "custom"):
+                raise ValueError(f"{label} 類型模式無效：{sf.type_mode}")
+            country_rule, countries = "present", frozenset()
+            if sf.country_mode == "custom":
+                countries = frozenset(_parse_token_list(sf.countries_csv))
+                country_rule = "codes" if countries else "any"
+                if not countries:
+                    warnings.append(f"{label} 自訂義國家為空，未套用 {label} 國家過濾。")
+            type_rule, types = ("labeled" if sf.type_mode == "labeled" else "any"), frozenset()
+            if sf.type_mode == "custom":
+                types = frozenset(_parse_token_list(sf.type_codes_csv))
+                type_rule = "codes" if types else "any"
+                if not types:
+                    warnings.append(f"{label} 自訂義類型為空，未套用 {label} 類型過濾。")
+            odd = sorted(t for t in countries | types if not _CODE_RE.match(t))
+            if odd:
+                warnings.append(f"{label} 代碼格式可疑（應為 3 碼）：{', '.join(odd)}")
+            return SidePlan(country_rule, countries, type_rule, types)
+
+        year_range = None
+        if cfg.enable_year_filter:
+            start, end = int(cfg.year_start), int(cfg.year_end)
+            if start > end:
+                raise ValueError(f"年份區間無效：{start} > {end}")
+            year_range = (start, end)
+        a1, a2 = side("A1", cfg.a1), side("A2", cfg.a2)
+
+        known = union_columns()
+        select = read = None
+        if cfg.selected_columns:
+            select = tuple(dict.fromkeys(cfg.selected_columns))
+            need = list(select) + ["Actor1CountryCode", "Actor2CountryCode"]  # 國家欄位一律參與篩選
+            if a1.type_rule != "any":
+                need.append("Actor1Type1Code")
+            if a2.type_rule != "any":
+                need.append("Actor2Type1Code")
+            if year_range:
+                need += ["Year", "SQLDATE"]
+            read = tuple(dict.fromkeys(need))
+            known_set = set(known)
+            output = priority_order(c for c in select if c in known_set)
+        else:
+            output = priority_order(known)
+        return cls(year_range, a1, a2, bool(cfg.only_cross_country), select, read, tuple(output), tuple(warnings))
+
+    def fingerprint(self) -> str:
+        """決定輸出內容的規則之穩定雜湊（代碼順序、大小寫不影響）；不含提醒與讀入欄位。"""
+        side = lambda sp: [sp.country_rule, sorted(sp.countries), sp.type_rule, sorted(sp.types)]
+        key = {
+            "schema": SCHEMA_VERSION, "year_range": self.year_range, "a1": side(self.a1), "a2": side(self.a2),
+            "cross_country": self.cross_country, "select": self.select, "output": self.output_columns,
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def row_filter(self) -> "FilterPlan":
+        """只含國家、類型與跨國條件的計畫（不篩年份、讀入並輸出全部欄位），供結果快取使用。"""
+        return replace(self, year_range=None, select=None, read_columns=None,
+                       output_columns=tuple(priority_order(union_columns())), warnings=())
+
+    def in_year_range(self, fname: str) -> bool:
+        return self.year_range is None or filename_year_in_range(fname, *self.year_range)
+
+    def mask(self, df: pd.DataFrame, fname: str, log: Callable[[str], None]) -> pd.Series:
+        """整個計畫合成一個布林遮罩；欄位缺漏時略過對應條件並回報。"""
+        mask = pd.Series(True, index=df.index)
+        if self.year_range and not self.in_year_range(fname):
+            # 年份兜底（檔名無法判斷年份時，依內容篩選）
+            start, end = self.year_range
+            if 'Year' in df.columns:
+                yr = pd.to_numeric(df['Year'], errors='coerce')
+            elif 'SQLDATE' in df.columns:
+                yr = pd.to_numeric(df['SQLDATE'].astype(str).str[:4], errors='coerce')
+            else:
+                yr = None
+                log(f"ℹ️ {fname} 無 Year/SQLDATE，無法做年份篩選。")
+            if yr is not None:
+                mask &= (yr >= start) & (yr <= end)
+
+        present = lambda s: s.notna() & s.ne('')
+        cols = {}
+        for label, sp in (("1", self.a1), ("2", self.a2)):
+            c = df.get(f'Actor{label}CountryCode')
+            cols[label] = c
+            if c is None:
+                log(f"{fname} 缺 Actor{label}CountryCode，略過 A{label} 國家過濾。")
+            elif sp.country_rule == "codes":
+                mask &= c.isin(sp.countries)
+            elif sp.country_rule == "present":
+                mask &= present(c)
+        a1, a2 = cols["1"], cols["2"]
+        if self.cross_country and (a1 is not None) and (a2 is not None):
+            mask &= present(a1) & present(a2) & as_text(a1).ne(as_text(a2))
+
+        for label, sp in (("1", self.a1), ("2", self.a2)):
+            if sp.type_rule == "any":
+                continue
+            t = df.get(f'Actor{label}Type1Code')
+            if t is None:
+                log(f"{fname} 缺 Actor{label}Type1Code 欄，略過 A{label} 類型過濾。")
+            elif sp.type_rule == "codes":
+                mask &= t.isin(sp.types)
+            else:
+                mask &= present(t)
+        return mask
+
+    def apply(self, df: pd.DataFrame, fname: str, log: Callable[[str], None]) -> Optional[pd.DataFrame]:
+        """套用篩選並整理欄位；沒有任何所選欄位時回傳 None。"""
+        return self.project(df[self.mask(df, fname, log)], fname, log)
+
+    def project(self, df: pd.DataFrame, fname: str, log: Callable[[str], None]) -> Optional[pd.DataFrame]:
+        """只保留所選欄位並依優先順序排列；沒有任何所選欄位時回傳 None。"""
+        if self.select:
+            use_cols = [c for c in self.select if c in df.columns]
+            if not use_cols:
+                log(f"{fname} 無符合所選欄位，略過。")
+                return None
+            return reorder_columns_priority(df, user_subset=use_cols)
+        return reorder_columns_priority(df, user_subset=None)
+
+
+# ---------- 單檔處理 ----------
+def read_chunks(path: str, columns: Optional[Iterable[str]] = None,
+                chunk_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """safe_read 的分塊版本：每次產生至多 chunk_rows 列（None 或 0 為整檔一次）。"""
+    if is_columnar(path):
+        return iter_columnar(path, columns, chunk_rows or None)
+    return iter_typed_csv(path, columns, chunk_rows or None)
+
+def _with_stat_columns(columns: Optional[tuple], stats: Optional[StatsBuilder]) -> Optional[tuple]:
+    if stats is None or columns is None:
+        return columns
+    return tuple(dict.fromkeys(columns + STAT_COLUMNS))
+
+def _filter_parts(path: str, plan: FilterPlan, chunk_rows: Optional[int],
+                  log: Callable[[str], None], engine: str = "pandas",
+                  cache: Optional[ResultCache] = None,
+                  stats: Optional[StatsBuilder] = None, text: bool = True,
+                  agg: Optional[AggregatePlan] = None) -> Iterator[pd.DataFrame]:
+    """
+    逐塊讀取並篩選單一檔案，產生可直接寫出的結果：text=True 時已轉回原始文字寫法（文字輸出），
+    否則保留型別（欄式輸出）；有 agg 時改為每塊的部分彙總。
+    stats：順便累計檔案統計（多讀幾個小欄位）；整檔讀完時 stats.complete 為 True。
+    """
+    for df in _typed_parts(path, plan, chunk_rows, log, engine, cache, stats):
+        if agg is not None:
+            yield agg.partial(df)
+        else:
+            yield to_text(df) if text else df
+
+def _typed_parts(path: str, plan: FilterPlan, chunk_rows: Optional[int],
+                 log: Callable[[str], None], engine: str = "pandas",
+                 cache: Optional[ResultCache] = None,
+                 stats: Optional[StatsBuilder] = None) -> Iterator[pd.DataFrame]:
+    """_filter_parts 的型別化版本：依快取、引擎分派。"""
+    if cache is not None:
+        yield from _filter_parts_cached(path, plan, chunk_rows, log, engine, cache, stats)
+        return
+    if engine == "arrow":
+        yield from _filter_parts_arrow(path, plan, chunk_rows, log, stats)
+        return
+    fname = os.path.basename(path)
+    for chunk in read_chunks(path, _with_stat_columns(plan.read_columns, stats), chunk_rows):
+        if stats is not None:
+            stats.update(chunk)
+        df = plan.apply(chunk, fname, log)
+        if df is None:
+            return
+        if not df.empty:
+            yield df
+    if stats is not None:
+        stats.complete = True
+
+def _filter_parts_arrow(path: str, plan: FilterPlan, chunk_rows: Optional[int],
+                        log: Callable[[str], None], stats: Optional[StatsBuilder] = None) -> Iterator[pd.DataFrame]:
+    """
+    Arrow 引擎；檔案有無法轉型的髒值或欄數不符的列時改用 pandas 讀法（逐欄容錯），
+    並略過 Arrow 已交出的列，避免重複（此時不記錄統計）。
+    依筆數略過成立的前提：Arrow 不會略過任何列（見 arrow_engine._csv_options），
+    失敗前交出的必定就是 pandas 讀法篩出的前幾列。
+    """
+    done = 0
+    try:
+        for df in arrow_engine.scan_file(path, plan, chunk_rows, log, stats):
+            done += len(df)
+            yield df
+        return
+    except ArrowInvalid as e:
+        _arrow_failed(path, e, log)
+    seen = 0
+    for df in _typed_parts(path, plan, chunk_rows, log):
+        n = len(df)
+        if seen + n > done:
+            yield df.iloc[max(0, done - seen):]
+        seen += n
+
+def _arrow_failed(path: str, e: Exception, log: Callable[[str], None]):
+    reason = str(e).splitlines()[0].rsplit("Invalid: ", 1)[-1]
+    if len(reason) > 120:  # 解析錯誤會附上整列內容
+        reason = reason[:120].rstrip() + "…"
+    log(f"{os.path.basename(path)} Arrow 無法解析（{reason}），改用 pandas。")
+
+def _matching_rows(path: str, plan: FilterPlan, chunk_rows: Optional[int],
+                   log: Callable[[str], None], engine: str,
+                   stats: Optional[StatsBuilder] = None) -> Iterator[pd.DataFrame]:
+    """逐塊產生通過 plan 的列（型別化、尚未整理欄位）；Arrow 失敗時的處理同 _filter_parts_arrow。"""
+    done = 0
+    if engine == "arrow":
+        try:
+            for df in arrow_engine.scan_batches(path, plan, chunk_rows, log, stats):
+                done += len(df)
+                yield df
+            return
+        except ArrowInvalid as e:
+            _arrow_failed(path, e, log)
+            stats = None
+    fname = os.path.basename(path)
+    seen = 0
+    for chunk in read_chunks(path, _with_stat_columns(plan.read_columns, stats), chunk_rows):
+        if stats is not None:
+            stats.update(chunk)
+        df = chunk[plan.mask(chunk, fname, log)]
+        n = len(df)
+        if seen + n > done:
+            yield df.iloc[max(0, done - seen):]
+        seen += n
+    if stats is not None:
+        stats.complete = True
+
+def _filter_parts_cached(path: str, plan: FilterPlan, chunk_rows: Optional[int],
+                         log: Callable[[str], None], engine: str, cache: ResultCache,
+                         stats: Optional[StatsBuilder] = None) -> Iterator[pd.DataFrame]:
+    """
+    有快取時直接對快取的列套用完整計畫（補上年份篩選與欄位整理）；
+    沒有時讀入全部欄位、以列篩選規則篩選，邊輸出邊收集，整檔完成後才寫入快取。
+    """
+    fname = os.path.basename(path)
+    rows = plan.row_filter()
+    key = cache.key(path, rows.fingerprint())
+    cached = cache.get(key)
+    if cached is not None:
+        log(f"{fname} 使用快取結果。")
+        if cached.columns.empty:  # 整檔沒有符合的列
+            return
+        df = plan.apply(cached, fname, log)
+        if df is not None and not df.empty:
+            yield df
+        return
+    kept: List[pd.DataFrame] = []
+    projecting = True
+    for part in _matching_rows(path, rows, chunk_rows, log, engine, stats):
+        kept.append(part)
+        if not projecting:
+            continue
+        df = plan.apply(part, fname, log)
+        if df is None:
+            projecting = False
+        elif not df.empty:
+            yield df
+    err = cache.put(key, pd.concat(kept, ignore_index=True) if kept else pd.DataFrame())
+    if err:
+        log(f"{fname} 無法寫入快取（{err}），結果不受影響。")
+
+def _filter_file(path: str, plan: FilterPlan, chunk_rows: Optional[int], engine: str = "pandas",
+                 cache: Optional[ResultCache] = None, collect_stats: bool = False, text: bool = True,
+                 agg: Optional[AggregatePlan] = None, spill_dir: Optional[str] = None):
+    """
+    子程序用：讀完整個檔案後一次交回；回傳 (通過篩選的各塊結果, 日誌訊息, 錯誤訊息或 None, 檔案統計或 None)。
+    只保留通過篩選的列（彙總時為整檔合併後的部分彙總），原始資料仍是逐塊讀取。
+    spill_dir：各塊結果一篩完就寫成此資料夾下的暫存檔，改為回傳檔案路徑；子程序同時只持有一塊。
+    """
+    msgs: List[str] = []
+    stats = StatsBuilder() if collect_stats else None
+    spilled: List[str] = []
+    try:
+        parts = _filter_parts(path, plan, chunk_rows, msgs.append, engine, cache, stats, text, agg)
+        if agg is not None:
+            parts = list(parts)
+            if len(parts) > 1:
+                parts = [agg.merge(parts)]
+        if spill_dir is None:
+            return list(parts), msgs, None, stats
+        for part in parts:
+            fd, spill = tempfile.mkstemp(suffix=".pkl", dir=spill_dir)
+            spilled.append(spill)
+            with os.fdopen(fd, "wb") as f:
+                part.to_pickle(f)
+        return spilled, msgs, None, stats
+    except Exception as e:
+        for spill in spilled:
+            _remove_quietly(spill)
+        return [], msgs, str(e), None
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
+def _load_spilled(paths: List[str]) -> Iterator[pd.DataFrame]:
+    """依序讀回 _filter_file 寫出的暫存檔，讀完即刪除。"""
+    for spill in paths:
+        df = pd.read_pickle(spill)
+        _remove_quietly(spill)
+        yield df
+
+
+def _iter_results(raw_dir, files, plan, chunk_rows, engine, cache, need_stats, text, agg, workers, stop_flag,
+                  spill_root: Optional[str] = None):
+    """
+    依檔名順序逐一產生 (序號, 檔名, (各塊結果, 日誌訊息, 錯誤訊息或 None, StatsBuilder 或 None))。
+    need_stats 中的檔案順便累計統計；text、agg 見 _filter_parts。
+    單一程序時各塊結果是產生器，邊讀邊交回，讀取錯誤會在迭代時拋出，統計在迭代完才完整；
+    workers > 1 時以程序池執行（_filter_file），最多同時排入 workers*2 個檔案，結果仍依原順序交回。
+    子程序把各塊結果寫到 spill_root 下的暫存資料夾（None 為系統暫存區），交回時逐塊讀入，
+    記憶體上限約為 (workers + 1) 塊，與檔案大小、排入的檔案數無關；暫存檔最多是排入檔案的篩選結果。
+    stop_flag() 為 True 時取消尚未開始的檔案並立即結束，不等待執行中的檔案。
+    """
+    stopped = lambda: bool(stop_flag and stop_flag())
+    if workers <= 1:
+        for idx, fname in enumerate(files, 1):
+            if stopped():
+                return
+            msgs: List[str] = []
+            stats = StatsBuilder() if fname in need_stats else None
+            parts = _filter_parts(os.path.join(raw_dir, fname), plan, chunk_rows, msgs.append, engine, cache, stats,
+                                  text, agg)
+            yield idx, fname, (parts, msgs, None, stats)
+        return
+
+    pending = deque()
+    it = iter(enumerate(files, 1))
+    spill_dir = tempfile.mkdtemp(prefix=SPILL_PREFIX, dir=spill_root)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    finished = False
+    try:
+        while True:
+            while not stopped() and len(pending) < workers * 2:
+                nxt = next(it, None)
+                if nxt is None:
+                    break
+                idx, fname = nxt
+                fut = pool.submit(_filter_file, os.path.join(raw_dir, fname), plan, chunk_rows, engine, cache,
+                                  fname in need_stats, text, agg, spill_dir)
+                pending.append((idx, fname, fut))
+            if not pending:
+                finished = True
+                return
+            if stopped():
+                return
+            idx, fname, fut = pending.popleft()
+            while True:
+                try:
+                    result = fut.result(timeout=0.2)
+                    break
+                except FutureTimeout:
+                    if stopped():
+                        return
+                except Exception as e:  # 子程序異常結束等
+                    result = ([], [], repr(e), None)
+                    break
+            spilled, msgs, err, stats = result
+            yield idx, fname, (_load_spilled(spilled), msgs, err, stats)
+    finally:
+        # 中止或提前結束時不等待執行中的子程序（結果直接丟棄），尚未開始的檔案一併取消
+        pool.shutdown(wait=finished, cancel_futures=True)
+        shutil.rmtree(spill_dir, ignore_errors=True)
 
 # ---------- 主流程 ----------
 def process_directory(
@@ -120,7 +572,19 @@ def process_directory(
     progress_cb: Optional[Callable[[str], None]] = None,
 ) -> Dict[str, Any]:
     """
-    讀取 raw_dir 下所有 .csv（tab 分隔、無標頭），依 cfg 篩選後合併輸出到 out_path。
+    讀取 raw_dir 下所有 .csv（tab 分隔、無標頭）、落地轉檔的 .parquet/.feather 及未解壓的 .zip，
+    依 cfg 篩選後合併輸出到 out_path。
+    每檔依 cfg.chunk_rows 分塊讀取，每塊篩選完立即附加寫出（標頭一次、欄位順序固定），
+    記憶體用量與檔案大小無關；中止時保留已寫出的部分。讀到一半失敗的檔案，其已寫出的列會撤回
+    （壓縮文字檔與已寫出資料區塊的欄式檔無法撤回，會記錄在日誌中）。
+    輸出格式依 out_path 副檔名決定（.csv、.tsv、.parquet、.feather、.sav，文字格式可加 .gz／.zst；見 processing.writers）。
+    cfg.workers > 1 時以程序池平行讀取與篩選，結果仍依檔名順序寫出；子程序的結果先逐塊暫存於輸出資料夾（見 _iter_results）。
+    cfg.engine == "arrow" 時以 pyarrow 讀檔並以 Arrow 運算式篩選；未安裝 pyarrow 時改用 pandas。
+    cfg.cache 時各檔的篩選結果存入快取，同樣的國家／類型條件再跑時直接取用。
+    cfg.use_catalog 時依原始資料夾的統計目錄略過不可能符合的檔案（見 processing.catalog）。
+    cfg.incremental 時只處理新增或變更的檔案，其餘從既有輸出複製（清單見 processing.incremental）。
+    cfg.aggregate_by 非空時不輸出原始列，改為各組的筆數與總和／平均（見 processing.aggregate）；此時 rows_out 為組數。
+    raw_dir 也可以是分區資料集（見 processing.compact）：年份範圍外的 year= 分區依目錄名稱直接略過。
     stop_flag(): 回傳 True 代表要求中止。
     progress_cb(msg): 用來回報日誌。
     回傳: {'files_total':int, 'files_used':int, 'rows_out':int, 'errors':int}
@@ -134,10 +598,26 @@ def process_directory(
     out_dir = os.path.dirname(out_path) or "."
     if not os.path.isdir(out_dir):
         raise FileNotFoundError("無此資料夾或路徑（輸出資料夾）。")
-
+    if len(cfg.text_sep) != 1:
+        raise ValueError("文字輸出的分隔字元必須是單一字元。")
+
+    # 設定只編譯、檢查一次；設定上的提醒也只回報一次
+    agg = AggregatePlan.compile(cfg)
+    plan = FilterPlan.compile(replace(cfg, selected_columns=list(agg.input_columns)) if agg else cfg)
+    for w in plan.warnings:
+        log(w)
+    incremental = cfg.incremental
+    if incremental and agg:
+        log("彙總模式不支援增量處理，本次完整處理。")
+        incremental = False
+    elif incremental and not supports_incremental(out_path):
+        log("增量處理只支援未壓縮的文字輸出（.csv/.tsv/.dat/.txt），本次完整處理。")
+        incremental = False
+
+    partitioned = is_partitioned(raw_dir)
     try:
-        files = [f for f in sorted(os.listdir(raw_dir)) if f.lower().endswith(".csv")]
-    except FileNotFoundError:
+        files = partition_files(raw_dir) if partitioned else list_data_files(LocalInventory(raw_dir))
+    except OSError:
         raise FileNotFoundError("讀取目錄失敗：無此資料夾或權限不足。")
 
     if not files:
@@ -146,133 +626,168 @@ def process_directory(
 
     files_total = len(files)
     errors = 0
-    used = 0
-    all_dfs: List[pd.DataFrame] = []
 
-    # 年份快篩（依檔名）
-    if cfg.enable_year_filter:
-        files_prefiltered = [f for f in files if filename_year_in_range(f, cfg.year_start, cfg.year_end)]
+    # 年份快篩（分區資料集依 year= 目錄，其餘依檔名）
+    if plan.year_range:
+        if partitioned:
+            files_prefiltered = partition_files(raw_dir, plan.year_range)
+        else:
+            files_prefiltered = [f for f in files if plan.in_year_range(f)]
         skipped = len(files) - len(files_prefiltered)
         files = files_prefiltered
-        log(f"年份篩選：保留 {len(files)} 檔，略過 {skipped} 檔。")
+        log(f"{'分區裁剪' if partitioned else '年份篩選'}：保留 {len(files)} 檔，略過 {skipped} 檔。")
         if not files:
             log("篩選後沒有符合年份的檔案。")
             return {'files_total': files_total, 'files_used': 0, 'rows_out': 0, 'errors': 0}
 
-    want_cols = list(cfg.selected_columns) if cfg.selected_columns else None
-
-    for idx, fname in enumerate(files, 1):
-        if stop_flag and stop_flag():
-            log("處理已中止。")
-            break
+    signatures = {}
+    if cfg.use_catalog or incremental:
+        signatures = {f: file_signature(os.path.join(raw_dir, f)) for f in files}
+
+    # 統計目錄：開檔前略過依統計不可能有符合資料的檔案；還沒有統計的檔案在這次讀檔時順便補上
+    catalog: Optional[Catalog] = None
+    need_stats = frozenset()
+    if cfg.use_catalog:
+        catalog = Catalog.load(raw_dir)
+        kept, missing = [], []
+        for f in files:
+            st = catalog.lookup(f, signatures[f])
+            if st is None:
+                missing.append(f)
+            if st is None or may_match(plan, st, f):
+                kept.append(f)
+        if len(kept) < len(files):
+            log(f"統計目錄：略過 {len(files) - len(kept)} 檔（不可能有符合資料）。")
+        files, need_stats = kept, frozenset(missing)
+        if not files:
+            log("沒有可能符合條件的檔案。")
+            return {'files_total': files_total, 'files_used': 0, 'rows_out': 0, 'errors': 0}
 
-        path = os.path.join(raw_dir, fname)
-        try:
-            df = safe_read(path)
-
-            # 年份兜底（讀入後再濾）
-            if cfg.enable_year_filter and not filename_year_in_range(fname, cfg.year_start, cfg.year_end):
-                if 'Year' in df.columns:
-                    yr = pd.to_numeric(df['Year'], errors='coerce')
-                    df = df[(yr >= cfg.year_start) & (yr <= cfg.year_end)]
-                elif 'SQLDATE' in df.columns:
-                    yr = pd.to_numeric(df['SQLDATE'].astype(str).str[:4], errors='coerce')
-                    df = df[(yr >= cfg.year_start) & (yr <= cfg.year_end)]
-                else:
-                    log(f"ℹ️ {fname} 無 Year/SQLDATE，無法做年份篩選。")
-
-            # 國家過濾
-            a1 = df.get('Actor1CountryCode')
-            a2 = df.get('Actor2CountryCode')
-            mask_country = pd.Series(True, index=df.index)
-
-            if a1 is not None:
-                if cfg.a1.country_mode == "custom":
-                    a1_set = _parse_token_list(cfg.a1.countries_csv)
-                    if a1_set:
-                        mask_country &= a1.isin(a1_set)
-                    else:
-                        log(f"{fname} A1 自訂義國家為空，未套用 A1 國家過濾。")
-                else:
-                    mask_country &= a1.notna() & a1.ne('')
+    # 增量處理：未變更的檔案沿用既有輸出中的位元組範圍；新檔都排在最後時直接附加
+    # 分隔字元不同時既有位元組不能沿用；預設 tab 時鍵與舊清單相同
+    output_key = plan.fingerprint() if cfg.text_sep == "\t" else f"{plan.fingerprint()}|sep={cfg.text_sep!r}"
+    reuse: Dict[str, FileEntry] = {}
+    append = False
+    manifest: Optional[OutputManifest] = None
+    todo = files
+    if incremental:
+        previous = OutputManifest.load(out_path)
+        reuse = previous.reusable(output_key, signatures) if previous else {}
+        todo = [f for f in files if f not in reuse]
+        unchanged = bool(reuse) and len(reuse) == len(previous.entries)
+        if unchanged and not todo:
+            rows = sum(e.rows for e in reuse.values())
+            log(f"增量處理：{len(files)} 檔皆未變更，輸出已是最新（{rows:,} 筆）。")
+            return {'files_total': files_total, 'files_used': sum(1 for e in reuse.values() if e.rows),
+                    'rows_out': rows, 'errors': 0}
+        append = unchanged and set(files[:len(reuse)]) == set(reuse)
+        manifest = OutputManifest(out_path, output_key, dict(reuse) if append else {})
+        log(f"增量處理：沿用 {len(reuse)} 檔，處理 {len(todo)} 檔" + ("，附加至既有輸出。" if append else "。"))
+
+    workers = max(1, min(int(cfg.workers or 1), max(len(todo), 1), os.cpu_count() or 1))
+    engine = cfg.engine if cfg.engine in ENGINES else "pandas"
+    if engine == "arrow" and not HAS_PYARROW:
+        log("未安裝 pyarrow，改用 pandas 引擎。")
+        engine = "pandas"
+    if engine == "arrow":
+        log("處理引擎：Arrow")
+    cache = None
+    if cfg.cache:
+        cache = ResultCache(cfg.cache_dir or os.path.join(raw_dir, CACHE_DIR), max(0, int(cfg.cache_max_mb)) << 20,
+                            root=raw_dir)
+        if not cache.check_writable():
+            log(f"快取資料夾無法寫入（{cache.directory}），本次只使用既有的快取結果。")
+    if agg:
+        log(f"彙總模式：依 {'、'.join(agg.keys)} 分組，輸出 {'、'.join(agg.measures)}")
+        writer = AggregateWriter(out_path, agg, sep=cfg.text_sep)
+    else:
+        writer = open_writer(out_path, plan.output_columns, append=append, sep=cfg.text_sep)
+    previous_out = open(out_path, "rb") if reuse and not append else None
+    order = {f: i for i, f in enumerate(files)}
+    pending = deque(f for f in files if f in reuse) if previous_out else deque()
+    used = sum(1 for e in reuse.values() if e.rows) if append else 0
+    if append:
+        writer.rows = sum(e.rows for e in reuse.values())
+
+    def copy_reused(before: Optional[str]):
+        """依檔名順序，把排在 before 之前（None 為全部）的沿用結果從既有輸出複製過來。"""
+        nonlocal used
+        while pending and (before is None or order[pending[0]] < order[before]):
+            e = reuse[pending.popleft()]
+            offset = writer.mark()[0]
+            writer.copy_from(previous_out, e.offset, e.length, e.rows)
+            manifest.entries[e.name] = FileEntry(e.name, e.size, e.mtime_ns, e.rows, offset, e.length)
+            used += bool(e.rows)
+
+    if workers > 1:
+        log(f"平行處理：{workers} 個程序")
+    stopped = False
+    try:
+        for idx, fname, (parts, msgs, err, stats) in _iter_results(raw_dir, todo, plan, cfg.chunk_rows, engine, cache,
+                                                                   need_stats, writer.wants_text, agg, workers, stop_flag,
+                                                                   out_dir):
+            copy_reused(fname)
+            start, start_rows = writer.mark(), writer.rows
+            if err is None:  # 子程序已回報錯誤時沒有可寫的結果
+                try:
+                    for part in parts:
+                        writer.write(part)
+                        if stop_flag and stop_flag():
+                            stopped = True
+                            break
+                except Exception as e:
+                    err = str(e)
+            rows = writer.rows - start_rows
+            for m in dict.fromkeys(msgs):  # 分塊處理時同一訊息只記一次
+                log(m)
+            # 讀到一半失敗的檔案不留部分結果；增量處理時中止的檔案也撤回（清單只記錄完整處理的檔案）
+            if (err is not None or (stopped and manifest is not None)) and rows and not writer.rollback(start):
+                log(f"{fname} 已寫出的 {rows:,} 筆無法撤回（已寫入壓縮檔或欄式檔的資料區塊），保留在輸出中。")
+            if err is not None:
+                errors += 1
+                log(f"錯誤 {fname}：{err}")
+            elif stopped:
+                break
             else:
-                log(f"{fname} 缺 Actor1CountryCode，略過 A1 國家過濾。")
-
-            if a2 is not None:
-                if cfg.a2.country_mode == "custom":
-                    a2_set = _parse_token_list(cfg.a2.countries_csv)
-                    if a2_set:
-                        mask_country &= a2.isin(a2_set)
-                    else:
-                        log(f"{fname} A2 自訂義國家為空，未套用 A2 國家過濾。")
+                if stats is not None and stats.complete:
+                    catalog.add(stats.result(fname, signatures[fname]))
+                if manifest is not None:
+                    end = writer.mark()[0]
+                    manifest.entries[fname] = FileEntry(fname, *signatures[fname], rows, start[0], end - start[0])
+                if rows:
+                    used += 1
+                    log(f"{fname} 合併 {rows:,} 筆（{idx}/{len(todo)}）")
                 else:
-                    mask_country &= a2.notna() & a2.ne('')
-            else:
-                log(f"{fname} 缺 Actor2CountryCode，略過 A2 國家過濾。")
-
-            if cfg.only_cross_country and (a1 is not None) and (a2 is not None):
-                mask_country &= a1.notna() & a1.ne('') & a2.notna() & a2.ne('') & a1.ne(a2)
-
-            df = df[mask_country]
-
-            # 行為者類型過濾
-            a1t = df.get('Actor1Type1Code')
-            a2t = df.get('Actor2Type1Code')
-            mask_types = pd.Series(True, index=df.index)
-
-            if a1t is not None:
-                if cfg.a1.type_mode == "labeled":
-                    mask_types &= a1t.notna() & a1t.ne('')
-                elif cfg.a1.type_mode == "custom":
-                    codes = _parse_token_list(cfg.a1.type_codes_csv)
-                    if codes:
-                        mask_types &= a1t.isin(codes)
-                    else:
-                        log(f"{fname} A1 自訂義類型為空，未套用 A1 類型過濾。")
-            else:
-                log(f"{fname} 缺 Actor1Type1Code 欄，略過 A1 類型過濾。")
-
-            if a2t is not None:
-                if cfg.a2.type_mode == "labeled":
-                    mask_types &= a2t.notna() & a2t.ne('')
-                elif cfg.a2.type_mode == "custom":
-                    codes = _parse_token_list(cfg.a2.type_codes_csv)
-                    if codes:
-                        mask_types &= a2t.isin(codes)
-                    else:
-                        log(f"{fname} A2 自訂義類型為空，未套用 A2 類型過濾。")
-            else:
-                log(f"{fname} 缺 Actor2Type1Code 欄，略過 A2 類型過濾。")
-
-            df = df[mask_types]
-
-            # 欄位子集 + 排序
-            if want_cols:
-                use_cols = [c for c in want_cols if c in df.columns]
-                if not use_cols:
-                    log(f"{fname} 無符合所選欄位，略過。")
-                    continue
-                df = reorder_columns_priority(df, user_subset=use_cols)
-            else:
-                df = reorder_columns_priority(df, user_subset=None)
-
-            if not df.empty:
-                all_dfs.append(df)
-                used += 1
-                log(f"{fname} 合併 {len(df):,} 筆（{idx}/{len(files)}）")
-            else:
-                log(f"{fname} 無符合資料。")
-
-        except Exception as e:
-            errors += 1
-            log(f"錯誤 {fname}：{e}")
-
-    if not all_dfs:
+                    log(f"{fname} 無符合資料。")
+        stopped = stopped or bool(stop_flag and stop_flag())
+        if not stopped:
+            copy_reused(None)
+    finally:
+        if previous_out:
+            previous_out.close()
+        if catalog is not None:
+            catalog.save()
+        if cache is not None:
+            removed, freed = cache.evict()
+            if removed:
+                log(f"快取超過上限，已移除 {removed} 個最久未用的項目（{freed / 1024 / 1024:.1f} MB）。")
+    if stopped:
+        log("處理已中止。")
+        if previous_out:  # 重組中途中止：保留原本的輸出與清單
+            writer.abort()
+            return {'files_total': files_total, 'files_used': used, 'rows_out': 0, 'errors': errors}
+
+    writer.close()
+    if getattr(writer, "coerced", None):
+        log(f"{'、'.join(writer.coerced)} 欄有無法轉成數值的內容，已存為空值。")
+    if not writer.rows:
         log("沒有符合條件的資料可匯出。")
         return {'files_total': files_total, 'files_used': used, 'rows_out': 0, 'errors': errors}
-
-    out = pd.concat(all_dfs, ignore_index=True)
-    out.to_csv(out_path, index=False, sep='\t')
-    log(f"完成！共匯出 {len(out):,} 筆至：{out_path}")
-
-    return {'files_total': files_total, 'files_used': used, 'rows_out': int(len(out)), 'errors': errors}
+    if manifest is not None:
+        manifest.save()
+
+    if agg:
+        log(f"完成！共彙總 {writer.rows:,} 筆為 {writer.groups:,} 組至：{out_path}")
+        return {'files_total': files_total, 'files_used': used, 'rows_out': int(writer.groups), 'errors': errors}
+    log(f"完成！共匯出 {writer.rows:,} 筆至：{out_path}")
+    return {'files_total': files_total, 'files_used': used, 'rows_out': int(writer.rows), 'errors': errors}
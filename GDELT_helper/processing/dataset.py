@@ -0,0 +1,58 @@
+# Hive 風格分區資料集（<根目錄>/year=YYYY/month=M/*.parquet）的目錄解析與分區裁剪
+from __future__ import annotations
+import os
+from typing import Dict, List, Optional, Tuple
+
+PARTITION_KEYS = ("year", "month")
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"  # SQLDATE 為空的列放在這個分區
+
+
+def is_partitioned(directory: str) -> bool:
+    """資料夾底下有 year=... 子資料夾即視為分區資料集。"""
+    try:
+        with os.scandir(directory) as it:
+            return any(e.is_dir() and e.name.startswith("year=") for e in it)
+    except OSError:
+        return False
+
+
+def partition_value(dirname: str) -> Tuple[str, Optional[int]]:
+    """'year=2015' → ('year', 2015)；空值分區 → ('year', None)。"""
+    key, _, value = dirname.partition("=")
+    if value == NULL_PARTITION or not value.lstrip("-").isdigit():
+        return key, None
+    return key, int(value)
+
+
+def part_source(path: str) -> str:
+    """分區檔對應的來源基底檔名：year=2015/month=1/20150101-0.parquet → 20150101。"""
+    return os.path.basename(path).rsplit("-", 1)[0]
+
+
+def partition_files(root: str, year_range: Optional[Tuple[int, int]] = None) -> List[str]:
+    """
+    列出分區資料集中的 Parquet 檔（相對於 root 的路徑），依 (年, 月, 檔名) 排序。
+    year_range 只依目錄名稱裁剪：範圍外的 year= 目錄連列目錄都不做，更不會讀到任何資料。
+    年份為空值的分區無法判斷，一律保留，交由逐列篩選處理。
+    """
+    found: List[Tuple[Tuple, str]] = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        keep = []
+        for d in dirnames:
+            key, value = partition_value(d)
+            if key not in PARTITION_KEYS:
+                continue
+            if key == "year" and year_range and value is not None \
+                    and not (year_range[0] <= value <= year_range[1]):
+                continue
+            keep.append(d)
+        dirnames[:] = keep
+        rel = os.path.relpath(dirpath, root)
+        if rel == ".":
+            continue
+        parts: Dict[str, Optional[int]] = dict(partition_value(d) for d in rel.split(os.sep))
+        order = tuple(-1 if parts.get(k) is None else parts[k] for k in PARTITION_KEYS)
+        for f in filenames:
+            if f.lower().endswith(".parquet"):
+                found.append((order + (f,), os.path.join(rel, f)))
+    return [path for _, path in sorted(found)]
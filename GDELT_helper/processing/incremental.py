@@ -0,0 +1,86 @@
+# 增量處理的輸出清單：記錄每個輸入檔的大小、修改時間與它在輸出檔中的位元組範圍
+from __future__ import annotations
+import json
+import os
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional, Tuple
+
+MANIFEST_SUFFIX = ".manifest.json"  # 放在輸出檔旁：<輸出>.manifest.json
+MANIFEST_VERSION = 1
+
+
+def file_signature(path: str) -> Tuple[int, int]:
+    """(大小, 修改時間 ns)；兩者都沒變就視為同一個檔案。"""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+@dataclass
+class FileEntry:
+    name: str       # 相對於原始資料夾的檔名
+    size: int
+    mtime_ns: int
+    rows: int
+    offset: int     # 此檔結果在輸出檔中的起點（位元組）
+    length: int     # 位元組數；沒有符合資料時為 0
+
+
+class OutputManifest:
+    """
+    一個輸出檔的增量處理清單。fingerprint 為 FilterPlan.fingerprint()，設定不同時整份作廢；
+    另記錄輸出檔本身的大小與修改時間，輸出檔被其他執行（非增量）覆寫過時也會作廢。
+    """
+
+    def __init__(self, out_path: str, fingerprint: str, entries: Optional[Dict[str, FileEntry]] = None,
+                 out_size: int = -1, out_mtime_ns: int = -1):
+        self.out_path = out_path
+        self.fingerprint = fingerprint
+        self.entries: Dict[str, FileEntry] = entries or {}
+        self.out_size = out_size
+        self.out_mtime_ns = out_mtime_ns
+
+    @staticmethod
+    def path_for(out_path: str) -> str:
+        return out_path + MANIFEST_SUFFIX
+
+    @classmethod
+    def load(cls, out_path: str) -> Optional["OutputManifest"]:
+        """讀取清單；不存在、版本不符或內容損壞時回傳 None。"""
+        try:
+            with open(cls.path_for(out_path), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                return None
+            entries = {e["name"]: FileEntry(**e) for e in data["files"]}
+            return cls(out_path, data["fingerprint"], entries, data["out_size"], data["out_mtime_ns"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def reusable(self, fingerprint: str, signatures: Dict[str, Tuple[int, int]]) -> Dict[str, FileEntry]:
+        """
+        可沿用的項目：設定相同、輸出檔未被改動，且輸入檔的大小與修改時間都沒變。
+        signatures：{檔名: file_signature()}，為本次要處理的檔案。
+        """
+        if fingerprint != self.fingerprint:
+            return {}
+        try:
+            if file_signature(self.out_path) != (self.out_size, self.out_mtime_ns):
+                return {}
+        except OSError:
+            return {}
+        return {n: e for n, e in self.entries.items() if signatures.get(n) == (e.size, e.mtime_ns)}
+
+    def save(self):
+        """以輸出檔目前的大小與修改時間寫出清單（先寫暫存檔再改名）。"""
+        self.out_size, self.out_mtime_ns = file_signature(self.out_path)
+        data = {
+            "version": MANIFEST_VERSION,
+            "fingerprint": self.fingerprint,
+            "out_size": self.out_size,
+            "out_mtime_ns": self.out_mtime_ns,
+            "files": [asdict(e) for e in sorted(self.entries.values(), key=lambda e: e.offset)],
+        }
+        path = self.path_for(self.out_path)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(path + ".tmp", path)
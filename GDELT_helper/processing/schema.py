@@ -0,0 +1,244 @@
+# GDELT 1.0 事件資料欄位與型別（內建、離線可用的欄位登錄表）
+from __future__ import annotations
+import io
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from GDELT_helper.processing.archive import is_archive, archive_members, open_member
+
+# 欄位定義有變動時遞增；快取、統計等衍生資料可用來判斷是否需要重建
+SCHEMA_VERSION = 1
+
+HISTORICAL_COLUMNS = [
+    "GLOBALEVENTID", "SQLDATE", "MonthYear", "Year", "FractionDate",
+    "Actor1Code", "Actor1Name", "Actor1CountryCode", "Actor1KnownGroupCode", "Actor1EthnicCode",
+    "Actor1Religion1Code", "Actor1Religion2Code", "Actor1Type1Code", "Actor1Type2Code", "Actor1Type3Code",
+    "Actor2Code", "Actor2Name", "Actor2CountryCode", "Actor2KnownGroupCode", "Actor2EthnicCode",
+    "Actor2Religion1Code", "Actor2Religion2Code", "Actor2Type1Code", "Actor2Type2Code", "Actor2Type3Code",
+    "IsRootEvent", "EventCode", "EventBaseCode", "EventRootCode", "QuadClass",
+    "GoldsteinScale", "NumMentions", "NumSources", "NumArticles", "AvgTone",
+    "Actor1Geo_Type", "Actor1Geo_FullName", "Actor1Geo_CountryCode", "Actor1Geo_ADM1Code",
+    "Actor1Geo_Lat", "Actor1Geo_Long", "Actor1Geo_FeatureID",
+    "Actor2Geo_Type", "Actor2Geo_FullName", "Actor2Geo_CountryCode", "Actor2Geo_ADM1Code",
+    "Actor2Geo_Lat", "Actor2Geo_Long", "Actor2Geo_FeatureID",
+    "ActionGeo_Type", "ActionGeo_FullName", "ActionGeo_CountryCode", "ActionGeo_ADM1Code",
+    "ActionGeo_Lat", "ActionGeo_Long", "ActionGeo_FeatureID",
+    "DATEADDED",
+]
+DAILY_COLUMNS = HISTORICAL_COLUMNS + ["SOURCEURL"]
+
+
+@dataclass(frozen=True)
+class EventSchema:
+    name: str
+    columns: Tuple[str, ...]
+    source: str  # 官方標頭檔網址，僅供對照，執行時不會連線
+
+    @property
+    def width(self) -> int:
+        return len(self.columns)
+
+
+SCHEMAS: Dict[str, EventSchema] = {
+    "historical": EventSchema(
+        "historical", tuple(HISTORICAL_COLUMNS),
+        "https://www.gdeltproject.org/data/lookups/CSV.header.historical.txt",
+    ),
+    "daily": EventSchema(
+        "daily", tuple(DAILY_COLUMNS),
+        "https://www.gdeltproject.org/data/lookups/CSV.header.dailyupdates.txt",
+    ),
+}
+DEFAULT_SCHEMA = SCHEMAS["daily"]
+_BY_WIDTH = {sch.width: sch for sch in SCHEMAS.values()}
+
+INT_COLUMNS = [
+    "GLOBALEVENTID", "SQLDATE", "MonthYear", "Year", "IsRootEvent", "QuadClass",
+    "NumMentions", "NumSources", "NumArticles",
+    "Actor1Geo_Type", "Actor2Geo_Type", "ActionGeo_Type", "DATEADDED",
+]
+FLOAT_COLUMNS = [
+    "FractionDate", "GoldsteinScale", "AvgTone",
+    "Actor1Geo_Lat", "Actor1Geo_Long", "Actor2Geo_Lat", "Actor2Geo_Long", "ActionGeo_Lat", "ActionGeo_Long",
+]
+# 原始檔固定小數位數的浮點欄位（FractionDate 為 YYYY.FFFF）；其餘浮點欄位以最短寫法輸出
+FLOAT_DECIMALS = {"FractionDate": 4}
+# 低基數代碼：以 category 儲存
+CATEGORY_COLUMNS = [
+    "Actor1CountryCode", "Actor1KnownGroupCode", "Actor1EthnicCode", "Actor1Religion1Code", "Actor1Religion2Code",
+    "Actor1Type1Code", "Actor1Type2Code", "Actor1Type3Code",
+    "Actor2CountryCode", "Actor2KnownGroupCode", "Actor2EthnicCode", "Actor2Religion1Code", "Actor2Religion2Code",
+    "Actor2Type1Code", "Actor2Type2Code", "Actor2Type3Code",
+    "EventCode", "EventBaseCode", "EventRootCode",
+    "Actor1Geo_CountryCode", "Actor2Geo_CountryCode", "ActionGeo_CountryCode",
+]
+
+
+def column_dtypes(columns: List[str]) -> Dict[str, str]:
+    """欄位 → pandas dtype；未列出的欄位維持字串。"""
+    out = {}
+    for c in columns:
+        if c in INT_COLUMNS:
+            out[c] = "Int64"
+        elif c in FLOAT_COLUMNS:
+            out[c] = "float64"
+        elif c in CATEGORY_COLUMNS:
+            out[c] = "category"
+        else:
+            out[c] = "str"
+    return out
+
+
+def schema_for_count(n: int) -> Optional[EventSchema]:
+    return _BY_WIDTH.get(n)
+
+
+def columns_for_count(n: int) -> Optional[List[str]]:
+    sch = schema_for_count(n)
+    return list(sch.columns) if sch is not None else None
+
+
+def union_columns() -> List[str]:
+    """所有已登錄欄位的聯集（依每日檔、歷史檔順序）。"""
+    union, seen = [], set()
+    for name in DEFAULT_SCHEMA.columns + SCHEMAS["historical"].columns:
+        if name not in seen:
+            union.append(name); seen.add(name)
+    return union
+
+
+def sniff_columns(path: str, member: Optional[str] = None) -> List[str]:
+    """
+    讀第一行判斷欄數（57＝歷史檔、58＝每日檔）。
+    欄數不符時採每日檔欄位；多出的欄位以 Column<N> 命名，避免 pandas 把前幾欄當成索引。
+    member：path 為 .zip 時要讀的成員。
+    """
+    raw = open(path, "rb") if member is None else open_member(path, member)
+    with io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline="") as f:
+        first = f.readline().rstrip("\r\n")
+    n = len(first.split("\t")) if first else 0
+    cols = columns_for_count(n)
+    if cols is not None:
+        return cols
+    cols = list(DEFAULT_SCHEMA.columns)
+    return cols + [f"Column{i + 1}" for i in range(len(cols), n)]
+
+
+def coerce_types(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    把全字串的 DataFrame 轉成 column_dtypes 指定的型別。
+    有任何值無法轉換的數值欄位保留為字串，確保輸出與原始文字一致。
+    """
+    for c, dt in column_dtypes(list(df.columns)).items():
+        if dt in ("Int64", "float64"):
+            num = pd.to_numeric(df[c], errors="coerce")
+            if num.notna().sum() != df[c].notna().sum():
+                continue
+            if dt == "Int64":
+                if (num.dropna() % 1 != 0).any():
+                    continue
+                num = num.astype("Int64")
+            df[c] = num
+        elif dt == "category":
+            df[c] = df[c].astype("category")
+    return df
+
+
+def iter_typed_csv(path: str, columns: Optional[Iterable[str]] = None,
+                   chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    讀原始 tab 分隔檔並套用欄位型別（整數、浮點、代碼欄為 category，其餘字串），
+    每次產生至多 chunksize 列（None 為整檔一次）。columns：只解析這些欄位。
+    依序嘗試三種讀法：整數欄先以 int64 讀再轉 Int64（最快，C 解析器處理 nullable Int64 很慢）→
+    直接以 Int64 讀（允許缺值）→ 以字串讀再逐欄轉型（有髒值時）。
+    換讀法時會略過已產生的列，因此中途失敗也不會重複或遺漏。
+    path 為 .zip 時依序讀取其中的 CSV 成員（串流解壓，不落地）。
+    """
+    if is_archive(path):
+        for member in archive_members(path):
+            yield from _iter_typed_source(path, member, columns, chunksize)
+        return
+    yield from _iter_typed_source(path, None, columns, chunksize)
+
+
+def _iter_typed_source(path: str, member: Optional[str], columns: Optional[Iterable[str]],
+                       chunksize: Optional[int]) -> Iterator[pd.DataFrame]:
+    names = sniff_columns(path, member)
+    usecols = None
+    if columns is not None:
+        wanted = set(columns)
+        usecols = [c for c in names if c in wanted]
+    opts = dict(sep="\t", header=None, names=names, usecols=usecols,
+                on_bad_lines="skip", low_memory=False, engine="c")
+    dtypes = column_dtypes(usecols if usecols is not None else names)
+    ints = dict.fromkeys((c for c, dt in dtypes.items() if dt == "Int64"), "Int64")
+    attempts = [
+        ({**dtypes, **dict.fromkeys(ints, "int64")}, lambda df: df.astype(ints) if ints else df),
+        (dtypes, None),
+        (str, coerce_types),
+    ]
+    done = 0
+    for dtype, post in attempts:
+        seen = 0
+        src = path if member is None else open_member(path, member)
+        try:
+            frames = pd.read_csv(src, dtype=dtype, chunksize=chunksize, **opts)
+            for df in ([frames] if chunksize is None else frames):
+                n = len(df)
+                if seen + n <= done:
+                    seen += n
+                    continue
+                if seen < done:
+                    df = df.iloc[done - seen:]
+                seen += n
+                if post is not None:
+                    df = post(df)
+                done += len(df)
+                yield df
+            return
+        except (ValueError, TypeError):
+            if dtype is str:
+                raise
+            continue
+        finally:
+            if member is not None:
+                src.close()
+
+
+def read_typed_csv(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """整檔讀入的 iter_typed_csv。"""
+    return next(iter_typed_csv(path, columns))
+
+
+def as_text(s: pd.Series) -> pd.Series:
+    """category 欄位轉回一般字串，方便跨欄比較（兩個 category 欄的類別集合不同時無法直接比較）。"""
+    return s.astype("string") if isinstance(s.dtype, pd.CategoricalDtype) else s
+
+
+def _float_text(s: pd.Series, decimals: Optional[int]) -> pd.Series:
+    if decimals is not None:
+        return s.map(f"{{:.{decimals}f}}".format)
+    txt = s.astype(str)
+    # 極小或極大的值 str 會寫成 1e-05，改回原始檔的小數寫法
+    sci = txt.str.contains("e", regex=False)
+    if sci.any():
+        txt[sci] = [np.format_float_positional(v, trim="-") for v in s[sci]]
+    return txt.str.removesuffix(".0")
+
+
+def to_text(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    匯出文字檔前把浮點欄位轉回原始寫法（10.0 → 10、1e-05 → 0.00001、FractionDate 固定四位小數、
+    缺值 → 空字串），讓輸出與原始 CSV 的文字一致。
+    """
+    float_cols = [c for c in df.columns if pd.api.types.is_float_dtype(df[c])]
+    if not float_cols:
+        return df
+    df = df.copy()
+    for c in float_cols:
+        s = df[c]
+        txt = _float_text(s.fillna(0.0), FLOAT_DECIMALS.get(c))
+        df[c] = txt.where(s.notna(), "")
+    return df
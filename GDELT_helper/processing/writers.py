@@ -0,0 +1,290 @@
+# 逐檔串流寫出處理結果；輸出格式依副檔名決定（見 open_writer）
+from __future__ import annotations
+import gzip
+import io
+import os
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple
+import pandas as pd
+
+from GDELT_helper.processing.columnar import HAS_PYARROW
+from GDELT_helper.processing.schema import INT_COLUMNS
+
+if HAS_PYARROW:
+    import pyarrow as pa
+    from GDELT_helper.processing.arrow_engine import arrow_schema, frame_to_arrow
+
+PART_SUFFIX = ".part"
+COMPRESSIONS = {".gz": "gzip", ".zst": "zstd"}  # 文字格式可再加壓縮副檔名，如 .csv.gz
+ROW_GROUP_ROWS = 250_000  # 欄式格式累積到這麼多列才寫出一個 row group／record batch
+
+
+def split_compression(path: str) -> Tuple[str, Optional[str]]:
+    """'out.csv.gz' → ('out.csv', 'gzip')；沒有壓縮副檔名時第二項為 None。"""
+    stem, ext = os.path.splitext(path)
+    comp = COMPRESSIONS.get(ext.lower())
+    return (stem, comp) if comp else (path, None)
+
+
+def output_format(path: str) -> str:
+    """依副檔名判斷輸出格式："text"、"parquet"、"feather" 或 "sav"。"""
+    base, _ = split_compression(path)
+    ext = os.path.splitext(base)[1].lower()
+    return {".parquet": "parquet", ".feather": "feather", ".sav": "sav"}.get(ext, "text")
+
+
+def supports_incremental(path: str) -> bool:
+    """增量處理需要就地附加與位元組複製，只支援未壓縮的文字輸出。"""
+    return output_format(path) == "text" and split_compression(path)[1] is None
+
+
+def open_writer(path: str, columns: Sequence[str], append: bool = False,
+                dtypes: Optional[Dict[str, str]] = None, sep: str = "\t"):
+    """
+    依副檔名建立串流寫出器：文字格式（.csv、.tsv、.dat 等，可再加 .gz／.zst 壓縮）；
+    .parquet、.feather（需要 pyarrow）；.sav（需要 pyreadstat）。
+    sep：文字格式的分隔字元。預設 tab，.csv 也一樣（與舊版輸出相同），要逗號分隔時明確傳入 ","。
+    寫出器都有 write(df)、close()、abort() 與 rows；wants_text 為 True 者接收 to_text 後的資料，其餘接收型別化資料。
+    mark() 記下目前位置，rollback(mark) 撤回之後寫入的列；已落地而無法撤回時回傳 False（例如壓縮輸出）。
+    dtypes：非內建欄位的 pandas dtype（見 arrow_schema），只影響欄式輸出。
+    """
+    fmt = output_format(path)
+    base, comp = split_compression(path)
+    if comp and fmt != "text":
+        raise ValueError(f"{os.path.basename(base)} 的格式不支援再加 {os.path.splitext(path)[1]} 壓縮。")
+    if append and not supports_incremental(path):
+        raise ValueError("只有未壓縮的文字輸出可以附加寫入。")
+    if fmt == "parquet":
+        return ParquetStreamWriter(path, columns, dtypes)
+    if fmt == "feather":
+        return FeatherStreamWriter(path, columns, dtypes)
+    if fmt == "sav":
+        return SavWriter(path, columns)
+    return StreamingTextWriter(path, columns, sep=sep, append=append, compression=comp)
+
+
+def _finish(tmp: str, path: str, rows: int):
+    """暫存檔改名成正式檔名；沒有任何資料列時不留下輸出檔。"""
+    if rows:
+        os.replace(tmp, path)
+    else:
+        os.remove(tmp)
+
+
+def _discard(tmp: str):
+    try:
+        os.remove(tmp)
+    except OSError:
+        pass
+
+
+class StreamingTextWriter:
+    """
+    把各檔篩選結果依序附加到同一個分隔文字檔：標頭只寫一次，欄位順序固定為 columns。
+    缺少的欄位寫成空值、多出的欄位捨棄，記憶體用量只跟單一批次有關。
+    內容先寫到 <輸出>.part，close() 時才改名成正式檔名；abort() 則刪除暫存檔。
+    append=True 時直接附加到既有輸出檔（不寫標頭、不經暫存檔），供增量處理使用。
+    compression："gzip" 或 "zstd"（需要 pyarrow）；壓縮輸出不能附加，也不能 rollback。
+    """
+    wants_text = True
+
+    def __init__(self, path: str, columns: Sequence[str], sep: str = "\t", append: bool = False,
+                 compression: Optional[str] = None):
+        self.path = path
+        self.columns: List[str] = list(columns)
+        self.sep = sep
+        self.rows = 0
+        self.append = append
+        self.compression = compression
+        self._tmp = path if append else path + PART_SUFFIX
+        if compression == "gzip":
+            self._f = gzip.open(self._tmp, "wt", compresslevel=6, encoding="utf-8", newline="")
+        elif compression == "zstd":
+            if not HAS_PYARROW:
+                raise ImportError("需要安裝 pyarrow 才能輸出 .zst。")
+            self._f = io.TextIOWrapper(pa.CompressedOutputStream(self._tmp, "zstd"), encoding="utf-8", newline="")
+        else:
+            self._f = open(self._tmp, "a" if append else "w", encoding="utf-8", newline="")
+        if not append:
+            pd.DataFrame(columns=self.columns).to_csv(self._f, index=False, sep=self.sep)
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        if list(df.columns) != self.columns:
+            df = df.reindex(columns=self.columns)
+        df.to_csv(self._f, index=False, header=False, sep=self.sep)
+        self.rows += len(df)
+
+    def mark(self) -> Tuple[Optional[int], int]:
+        """目前的 (位元組位置, 列數)；可交給 rollback() 退回到這個位置。壓縮輸出的位置為 None。"""
+        return (None if self.compression else self._f.tell()), self.rows
+
+    def rollback(self, mark: Tuple[Optional[int], int]) -> bool:
+        offset, rows = mark
+        if offset is None:
+            return False
+        self.rows = rows
+        self._f.seek(offset)
+        self._f.truncate()
+        return True
+
+    def copy_from(self, src: BinaryIO, offset: int, length: int, rows: int):
+        """把另一個輸出檔 [offset, offset + length) 的位元組原樣附加（沿用未變更檔案的結果）。"""
+        self._f.flush()
+        src.seek(offset)
+        while length > 0:
+            buf = src.read(min(length, 1 << 20))
+            if not buf:
+                raise EOFError("既有輸出檔比紀錄的短。")
+            self._f.buffer.write(buf)
+            length -= len(buf)
+        self._f.buffer.flush()
+        self.rows += rows
+
+    def close(self):
+        """完成寫出；沒有任何資料列時不留下輸出檔。"""
+        self._f.close()
+        if not self.append:
+            _finish(self._tmp, self.path, self.rows)
+
+    def abort(self):
+        self._f.close()
+        if not self.append:
+            _discard(self._tmp)
+
+
+class _ArrowStreamWriter(ABC):
+    """
+    欄式寫出器的共同部分：型別依內建欄位固定（整數、浮點、字串），數值欄的髒值存成空值（欄名記在 coerced）。
+    批次先累積到 ROW_GROUP_ROWS 列再寫出，避免產生大量小 row group。
+    子類別以 _open(tmp) 建立實際的 Arrow 寫出器（需有 write_table 與 close）。
+    """
+    wants_text = False
+
+    def __init__(self, path: str, columns: Sequence[str], dtypes: Optional[Dict[str, str]] = None):
+        if not HAS_PYARROW:
+            raise ImportError(f"需要安裝 pyarrow 才能輸出 {os.path.splitext(path)[1]}。")
+        self.path = path
+        self.columns: List[str] = list(columns)
+        self.schema = arrow_schema(self.columns, dtypes)
+        self.rows = 0
+        self.coerced: List[str] = []
+        self._tmp = path + PART_SUFFIX
+        self._pending: List["pa.Table"] = []
+        self._pending_rows = 0
+        self._flushes = 0
+        self._writer = self._open(self._tmp)
+
+    @abstractmethod
+    def _open(self, tmp: str):
+        """開啟 tmp 並回傳 Arrow 寫出器。"""
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        table, coerced = frame_to_arrow(df, self.schema)
+        self.coerced.extend(c for c in coerced if c not in self.coerced)
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        self.rows += table.num_rows
+        if self._pending_rows >= ROW_GROUP_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._writer.write_table(pa.concat_tables(self._pending).combine_chunks())
+            self._pending, self._pending_rows = [], 0
+            self._flushes += 1
+
+    def mark(self) -> Tuple[int, int, int, int]:
+        return self._flushes, len(self._pending), self._pending_rows, self.rows
+
+    def rollback(self, mark: Tuple[int, int, int, int]) -> bool:
+        """只能撤回仍在緩衝區的列；mark 之後已寫出 row group 時回傳 False。"""
+        flushes, pending, pending_rows, rows = mark
+        if flushes != self._flushes:
+            return False
+        del self._pending[pending:]
+        self._pending_rows, self.rows = pending_rows, rows
+        return True
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+        _finish(self._tmp, self.path, self.rows)
+
+    def abort(self):
+        self._pending = []
+        self._writer.close()
+        _discard(self._tmp)
+
+
+class ParquetStreamWriter(_ArrowStreamWriter):
+    def _open(self, tmp: str):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(tmp, self.schema, compression="zstd")
+
+
+class FeatherStreamWriter(_ArrowStreamWriter):
+    """Feather v2（Arrow IPC 檔），record batch 以 zstd 壓縮。"""
+
+    def _open(self, tmp: str):
+        import pyarrow.ipc as ipc
+        return ipc.new_file(tmp, self.schema, options=ipc.IpcWriteOptions(compression="zstd"))
+
+
+class SavWriter:
+    """
+    SPSS .sav（pyreadstat）。pyreadstat 只能一次寫入整個資料框，結果會先累積在記憶體中，
+    close() 時才寫出；資料量大時建議改用 .csv 或 .parquet。
+    """
+    wants_text = False
+
+    def __init__(self, path: str, columns: Sequence[str]):
+        try:
+            import pyreadstat  # noqa: F401
+        except ImportError:
+            raise ImportError("需要安裝 pyreadstat 才能輸出 .sav。")
+        self.path = path
+        self.columns: List[str] = list(columns)
+        self.rows = 0
+        self._parts: List[pd.DataFrame] = []
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        self._parts.append(df.reindex(columns=self.columns))
+        self.rows += len(df)
+
+    def mark(self) -> Tuple[int, int]:
+        return len(self._parts), self.rows
+
+    def rollback(self, mark: Tuple[int, int]) -> bool:
+        parts, self.rows = mark
+        del self._parts[parts:]
+        return True
+
+    def close(self):
+        if not self.rows:
+            return
+        import pyreadstat
+        df = pd.concat(self._parts, ignore_index=True)
+        self._parts = []
+        for c in df.columns:
+            s = df[c]
+            if c in INT_COLUMNS or pd.api.types.is_numeric_dtype(s):
+                # SPSS 的數值一律是 double；整數欄的髒值存成缺值
+                df[c] = pd.to_numeric(s, errors="coerce").astype("float64")
+            else:
+                df[c] = s.astype(object).where(s.notna(), None)
+        tmp = self.path + PART_SUFFIX
+        try:
+            pyreadstat.write_sav(df, tmp)
+        except Exception:
+            _discard(tmp)
+            raise
+        os.replace(tmp, self.path)
+
+    def abort(self):
+        self._parts = []
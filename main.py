@@ -1,3 +1,4 @@
+from multiprocessing import freeze_support
 from tkinter import Tk
 from GDELT_helper.gui.main_menu import Menu
 
@@ -7,4 +8,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 打包成 exe 時，平行處理的子程序需要這行才不會重新開啟主視窗
+    freeze_support()
+    main()
@@ -0,0 +1,122 @@
+# 測試共用的原始資料產生器與本機 HTTP 替身伺服器
+import functools
+import http.server
+import os
+import re
+import threading
+import time
+
+import pytest
+
+from GDELT_helper.download import core
+
+from GDELT_helper.processing.schema import DAILY_COLUMNS
+
+# 每列預設值：通過預設篩選（兩方國家碼都有）的 2015-08-20 事件
+DEFAULT_ROW = {"SQLDATE": "20150820", "MonthYear": "201508", "Year": "2015",
+               "Actor1CountryCode": "USA", "Actor2CountryCode": "CHN"}
+
+
+def daily_line(**values) -> str:
+    """一行每日檔（58 欄、tab 分隔、無標頭）；未指定的欄位為空。"""
+    row = dict.fromkeys(DAILY_COLUMNS, "")
+    row.update(DEFAULT_ROW)
+    row.update({k: str(v) for k, v in values.items()})
+    return "\t".join(row[c] for c in DAILY_COLUMNS)
+
+
+@pytest.fixture
+def make_daily_file(tmp_path):
+    """
+    make_daily_file(rows, name="20150820.export.CSV", folder="raw") → 檔案路徑。
+    rows 為筆數（全用預設值）或每列欄位值字典的串列；檔案寫在 tmp_path/folder 底下。
+    """
+    def make(rows, name="20150820.export.CSV", folder="raw"):
+        directory = tmp_path / folder
+        directory.mkdir(parents=True, exist_ok=True)
+        if isinstance(rows, int):
+            rows = [{}] * rows
+        path = directory / name
+        path.write_text("".join(daily_line(**r) + "\n" for r in rows), encoding="utf-8")
+        return path
+    return make
+
+
+class _Handler(http.server.SimpleHTTPRequestHandler):
+    delay = 0.0
+    unavailable = frozenset()  # 一律回 503 的檔名
+    ranges = True  # 是否支援 Range（False 時模擬不支援續傳的伺服器，一律回 200）
+    hits = None
+    range_hits = None  # 每個 Range 請求的 (檔名, Range 標頭)
+    head_hits = None
+
+    def do_HEAD(self):
+        self.head_hits.append(self.path)
+        super().do_HEAD()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.hits.append(self.path)
+        if self.delay:
+            time.sleep(self.delay)
+        name = self.path.lstrip("/")
+        if name in self.unavailable:
+            self._send_empty(503)
+            return
+        range_header = self.headers.get("Range")
+        path = os.path.join(self.directory, name)
+        if range_header and self.ranges and os.path.isfile(path):
+            self.range_hits.append((name, range_header))
+            self._send_range(path, range_header)
+            return
+        super().do_GET()
+
+    def _send_empty(self, status, headers=()):
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send_range(self, path, range_header):
+        with open(path, "rb") as f:
+            data = f.read()
+        m = re.fullmatch(r"bytes=(\d+)-", range_header)
+        start = int(m.group(1)) if m else 0
+        if start >= len(data):
+            self._send_empty(416, [("Content-Range", f"bytes */{len(data)}")])
+            return
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+
+@pytest.fixture
+def http_server(tmp_path, monkeypatch):
+    """
+    http_server(files) → Handler 類別；files 為 {檔名: bytes}，寫在 tmp_path/srv 並由本機伺服器提供，
+    core.BASE_URL 指向該伺服器。可調整 Handler 的 delay、unavailable、ranges，並由 hits 檢查請求。
+    """
+    root = tmp_path / "srv"
+    servers = []
+
+    def serve(files):
+        root.mkdir(exist_ok=True)
+        for name, data in files.items():
+            (root / name).write_bytes(data)
+        handler = type("Handler", (_Handler,), {"hits": [], "range_hits": [], "head_hits": []})
+        httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=str(root)))
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        monkeypatch.setattr(core, "BASE_URL", f"http://127.0.0.1:{httpd.server_address[1]}/")
+        handler.root = root
+        return handler
+
+    yield serve
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
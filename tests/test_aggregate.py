@@ -0,0 +1,63 @@
+# 彙總模式
+import pandas as pd
+import pytest
+
+from GDELT_helper.processing.aggregate import AggregatePlan
+from GDELT_helper.processing.core import ProcessorConfig, process_directory
+
+
+def _plan(**kw):
+    return AggregatePlan.compile(ProcessorConfig(aggregate_by=["dyad"], aggregate_measures=["count"], **kw))
+
+
+def test_missing_keys_stay_missing():
+    agg = _plan()
+    df = pd.DataFrame({
+        "Actor1CountryCode": pd.Series(["USA", None, "USA"], dtype=object),
+        "Actor2CountryCode": pd.Series(["CHN", "CHN", None], dtype="category"),
+    })
+    out = agg.finalize(agg.merge([agg.partial(df), agg.partial(df)]))
+    assert out["Actor1CountryCode"].isna().sum() == 1 and out["Actor2CountryCode"].isna().sum() == 1
+    for col in ("Actor1CountryCode", "Actor2CountryCode"):
+        assert not out[col].isin(["None", "nan", "<NA>"]).any()
+    assert out["count"].tolist() == [2, 2, 2]
+
+
+def test_missing_keys_written_empty(tmp_path, make_daily_file):
+    raw = make_daily_file([{"EventRootCode": root} for root in ("01", "", "01")]).parent
+    out = tmp_path / "out.tsv"
+    process_directory(str(raw), str(out), ProcessorConfig(aggregate_by=["root"], aggregate_measures=["count"]))
+    assert out.read_text(encoding="utf-8").splitlines() == ["EventRootCode\tcount", "01\t2", "\t1"]
+
+
+def _sav_error():
+    try:
+        import pyreadstat  # noqa: F401
+    except ImportError:
+        return ImportError
+    return None
+
+
+@pytest.mark.parametrize("name, error", [("out.parquet.gz", ValueError), ("out.feather.zst", ValueError),
+                                         ("out.sav", _sav_error())])
+def test_unsupported_target_fails_before_scan(tmp_path, make_daily_file, name, error):
+    if error is None:
+        pytest.skip("pyreadstat 已安裝，.sav 可以輸出")
+    raw = make_daily_file(1).parent
+    logs = []
+    with pytest.raises(error):
+        process_directory(str(raw), str(tmp_path / name), ProcessorConfig(aggregate_by=["dyad"]),
+                          progress_cb=logs.append)
+    assert not any("20150820" in m for m in logs)
+    assert not list(tmp_path.glob("out*"))
+
+
+def test_float_measures_rounded_consistently(tmp_path, make_daily_file):
+    raw = make_daily_file([{"AvgTone": t, "GoldsteinScale": g}
+                           for t, g in (("1", "0.1"), ("2", "0.2"), ("4", "0"))]).parent
+    cfg = dict(aggregate_by=["dyad"], aggregate_measures=["AvgTone_mean", "GoldsteinScale_sum"])
+    process_directory(str(raw), str(tmp_path / "out.tsv"), ProcessorConfig(**cfg))
+    process_directory(str(raw), str(tmp_path / "out.parquet"), ProcessorConfig(**cfg))
+    assert (tmp_path / "out.tsv").read_text().splitlines()[1] == "USA\tCHN\t2.333333\t0.3"
+    back = pd.read_parquet(tmp_path / "out.parquet")
+    assert back["AvgTone_mean"].tolist() == [2.333333] and back["GoldsteinScale_sum"].tolist() == [0.3]
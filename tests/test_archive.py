@@ -0,0 +1,90 @@
+# 保留壓縮檔模式：直接從 .zip 成員讀取原始資料的測試
+import os
+import threading
+import zipfile
+
+import pytest
+
+from GDELT_helper.download.scheduler import download_targets
+from GDELT_helper.inventory import LocalInventory
+from GDELT_helper.processing.archive import archive_members, open_member
+from GDELT_helper.processing.core import ProcessorConfig, list_data_files, process_directory
+from GDELT_helper.processing.schema import DAILY_COLUMNS
+
+DAYS = ("20150820", "20150821")
+
+
+def _raw_and_zipped(tmp_path, make_daily_file):
+    """同樣的資料：raw/ 為解壓後的 CSV，zipped/ 為原始壓縮檔。"""
+    zipped = tmp_path / "zipped"
+    zipped.mkdir()
+    for n, day in enumerate(DAYS):
+        csv = make_daily_file([dict(GLOBALEVENTID=f"{day}{i}", SQLDATE=day, AvgTone="-1.25") for i in range(5 + n)],
+                              name=f"{day}.export.CSV")
+        with zipfile.ZipFile(zipped / f"{csv.name}.zip", "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.write(csv, csv.name)
+    return tmp_path / "raw", zipped
+
+
+def test_members_streamed_without_extracting(tmp_path, make_daily_file):
+    raw, zipped = _raw_and_zipped(tmp_path, make_daily_file)
+    path = str(zipped / f"{DAYS[0]}.export.CSV.zip")
+    assert archive_members(path) == [f"{DAYS[0]}.export.CSV"]
+    with open_member(path, archive_members(path)[0]) as f:
+        assert f.read() == (raw / f"{DAYS[0]}.export.CSV").read_bytes()
+    assert sorted(os.listdir(zipped)) == [f"{d}.export.CSV.zip" for d in DAYS]
+
+    empty = tmp_path / "empty.zip"
+    with zipfile.ZipFile(empty, "w") as zf:
+        zf.writestr("README.txt", "no data")
+    with pytest.raises(ValueError):
+        archive_members(str(empty))
+
+
+@pytest.mark.parametrize("engine", ["pandas", "arrow"])
+@pytest.mark.parametrize("chunk_rows", [0, 3])
+def test_zip_folder_processes_like_extracted(tmp_path, make_daily_file, engine, chunk_rows):
+    raw, zipped = _raw_and_zipped(tmp_path, make_daily_file)
+    cfg = ProcessorConfig(selected_columns=list(DAILY_COLUMNS), engine=engine, chunk_rows=chunk_rows)
+    process_directory(str(raw), str(tmp_path / "raw.tsv"), cfg)
+    result = process_directory(str(zipped), str(tmp_path / "zip.tsv"), cfg)
+    assert result["rows_out"] == 11 and result["errors"] == 0
+    assert (tmp_path / "zip.tsv").read_bytes() == (tmp_path / "raw.tsv").read_bytes()
+
+
+def test_zip_and_extracted_csv_counted_once(tmp_path, make_daily_file):
+    raw, zipped = _raw_and_zipped(tmp_path, make_daily_file)
+    (zipped / f"{DAYS[0]}.export.CSV").write_bytes((raw / f"{DAYS[0]}.export.CSV").read_bytes())
+    assert list_data_files(LocalInventory(str(zipped))) == [f"{DAYS[0]}.export.CSV", f"{DAYS[1]}.export.CSV.zip"]
+
+
+def test_corrupt_member_fails_and_rolls_back(tmp_path, make_daily_file):
+    _, zipped = _raw_and_zipped(tmp_path, make_daily_file)
+    path = zipped / f"{DAYS[0]}.export.CSV.zip"
+    data = bytearray(path.read_bytes())
+    with zipfile.ZipFile(path) as zf:
+        info = zf.infolist()[0]
+    data[info.header_offset + 30 + len(info.filename) + 10] ^= 0xFF  # 破壞壓縮內容，讀取時 CRC 或解壓失敗
+    path.write_bytes(bytes(data))
+
+    logs = []
+    result = process_directory(str(zipped), str(tmp_path / "out.tsv"),
+                               ProcessorConfig(selected_columns=["GLOBALEVENTID"], chunk_rows=2, use_catalog=False),
+                               progress_cb=logs.append)
+    assert result["errors"] == 1 and result["rows_out"] == 6  # 只剩完好的那一檔
+    assert any(m.startswith(f"錯誤 {path.name}") for m in logs)
+
+
+def test_keep_zip_download_then_process(http_server, tmp_path, make_daily_file):
+    _, zipped = _raw_and_zipped(tmp_path, make_daily_file)
+    http_server({p.name: p.read_bytes() for p in zipped.iterdir()})
+    out = tmp_path / "out"
+    stats = download_targets(list(DAYS), str(out), lambda _m: None, threading.Event(), keep_zip=True)
+    assert stats["downloaded"] == 2
+    assert sorted(os.listdir(out)) == [f"{d}.export.CSV.zip" for d in DAYS]
+
+    stats = download_targets(list(DAYS), str(out), lambda _m: None, threading.Event(), keep_zip=True)
+    assert stats["skipped"] == 2 and stats["downloaded"] == 0  # 已有壓縮檔即視為已有此檔
+
+    result = process_directory(str(out), str(tmp_path / "out.tsv"), ProcessorConfig(selected_columns=["GLOBALEVENTID"]))
+    assert result["rows_out"] == 11
@@ -0,0 +1,87 @@
+# 篩選結果快取的鍵
+import os
+
+import pandas as pd
+import pytest
+
+from GDELT_helper.processing import core
+from GDELT_helper.processing.cache import ResultCache
+from GDELT_helper.processing.core import ProcessorConfig, process_directory
+from GDELT_helper.processing.schema import DAILY_COLUMNS
+
+
+def _same_signature(*paths):
+    for p in paths:
+        os.utime(p, ns=(1_600_000_000_000_000_000, 1_600_000_000_000_000_000))
+
+
+def test_same_name_in_different_partitions_gets_distinct_keys(tmp_path):
+    a = tmp_path / "year=1985" / "month=1" / "1985-0.parquet"
+    b = tmp_path / "year=1985" / "month=2" / "1985-0.parquet"
+    for p, body in ((a, b"USA"), (b, b"CHN")):
+        p.parent.mkdir(parents=True)
+        p.write_bytes(body)
+    _same_signature(a, b)
+    cache = ResultCache(str(tmp_path / ".gdelt_cache"), root=str(tmp_path))
+    assert cache.key(str(a), "rules") != cache.key(str(b), "rules")
+    # 鍵只跟相對路徑有關：整棵樹搬到別處仍命中
+    moved = tmp_path / "copy" / "year=1985" / "month=1" / "1985-0.parquet"
+    moved.parent.mkdir(parents=True)
+    moved.write_bytes(a.read_bytes())
+    _same_signature(moved)
+    assert ResultCache("elsewhere", root=str(tmp_path / "copy")).key(str(moved), "rules") == cache.key(str(a), "rules")
+
+def _partition(root, month, country):
+    row = {c: None for c in DAILY_COLUMNS}
+    row.update(GLOBALEVENTID=month, SQLDATE=19850100 + month, Year=1985, MonthYear=198500 + month,
+               Actor1CountryCode=country, Actor2CountryCode="FRA")
+    path = root / "year=1985" / f"month={month}" / "1985-0.parquet"
+    path.parent.mkdir(parents=True)
+    pd.DataFrame([row] * 3).to_parquet(path, index=False)
+    return path
+
+
+def test_partitioned_rerun_with_cache(tmp_path):
+    raw = tmp_path / "raw"
+    paths = [_partition(raw, 1, "USA"), _partition(raw, 2, "CHN")]
+    _same_signature(*paths)
+    cfg = ProcessorConfig(cache=True, use_catalog=False, selected_columns=["SQLDATE", "Actor1CountryCode"])
+    first, second = tmp_path / "first.tsv", tmp_path / "second.tsv"
+    process_directory(str(raw), str(first), cfg)
+    logs = []
+    process_directory(str(raw), str(second), cfg, progress_cb=logs.append)
+    assert sum("使用快取結果" in m for m in logs) == 2
+    assert second.read_bytes() == first.read_bytes()
+    assert pd.read_csv(second, sep="\t")["Actor1CountryCode"].tolist() == ["USA"] * 3 + ["CHN"] * 3
+
+
+@pytest.fixture
+def unwritable_cache(tmp_path):
+    """放在一般檔案底下的快取路徑：任何寫入都會失敗（以 root 執行時 chmod 擋不住）。"""
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    return str(blocker / ".gdelt_cache")
+
+
+def test_put_failure_is_reported_not_raised(tmp_path, unwritable_cache):
+    cache = ResultCache(unwritable_cache)
+    assert cache.put("k", pd.DataFrame({"a": [1]}))
+    assert not cache.check_writable() and cache.read_only
+    assert cache.put("k", pd.DataFrame({"a": [1]})) is None  # 唯讀後不再嘗試
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+@pytest.mark.parametrize("probe", [True, False])
+def test_unwritable_cache_keeps_results(tmp_path, make_daily_file, unwritable_cache, monkeypatch, workers, probe):
+    monkeypatch.setattr(core.os, "cpu_count", lambda: 4)
+    if not probe:  # 略過開始前的檢查，模擬執行中才寫入失敗（例如磁碟已滿）
+        monkeypatch.setattr(ResultCache, "check_writable", lambda self: True)
+    for day in ("20150820", "20150821", "20150822"):
+        raw = make_daily_file(100, f"{day}.export.CSV").parent
+    logs = []
+    r = process_directory(str(raw), str(tmp_path / "out.tsv"),
+                          ProcessorConfig(cache=True, cache_dir=unwritable_cache, workers=workers, use_catalog=False),
+                          progress_cb=logs.append)
+    assert (r["files_used"], r["rows_out"], r["errors"]) == (3, 300, 0)
+    failures = [m for m in logs if "快取" in m and "無法寫入" in m]
+    assert len(failures) == (1 if probe else 3)
@@ -0,0 +1,105 @@
+# 檔案層級統計目錄與 may_match 略檔的測試
+import os
+
+import pandas as pd
+import pytest
+
+from GDELT_helper.processing import core
+from GDELT_helper.processing.catalog import CATALOG_FILE, Catalog, FileStats, StatsBuilder, may_match
+from GDELT_helper.processing.core import FilterPlan, ProcessorConfig, SideFilter, process_directory
+
+NAME = "20150820.export.CSV"
+
+
+def _stats(**kwargs):
+    codes = {"Actor1CountryCode": ["USA"], "Actor2CountryCode": ["CHN", "USA"],
+             "Actor1Type1Code": [], "Actor2Type1Code": ["GOV"]}
+    codes.update(kwargs.pop("codes", {}))
+    return FileStats(NAME, 1, 1, rows=kwargs.pop("rows", 5), years=kwargs.pop("years", [2015, 2015]),
+                     codes=codes, **kwargs)
+
+
+def _plan(**kwargs):
+    return FilterPlan.compile(ProcessorConfig(**kwargs))
+
+
+def test_stats_builder_accumulates_chunks():
+    sb = StatsBuilder()
+    sb.update(pd.DataFrame({"SQLDATE": [20150820, 20150101], "Year": [2015, 2015],
+                            "Actor1CountryCode": ["USA", ""], "Actor2CountryCode": ["CHN", None]}))
+    sb.update(pd.DataFrame({"SQLDATE": [20141231], "Year": [2014],
+                            "Actor1CountryCode": ["FRA"], "Actor2CountryCode": ["CHN"]}))
+    st = sb.result(NAME, (10, 20))
+    assert (st.rows, st.min_date, st.max_date, st.years) == (3, 20141231, 20150820, [2014, 2015])
+    assert st.codes["Actor1CountryCode"] == ["FRA", "USA"] and st.codes["Actor2CountryCode"] == ["CHN"]
+    assert st.codes["Actor1Type1Code"] is None  # 沒讀到此欄：無法判斷
+
+
+@pytest.mark.parametrize("stats, kwargs, expected", [
+    (_stats(rows=0), {}, False),
+    (_stats(), dict(a1=SideFilter(country_mode="custom", countries_csv="FRA")), False),
+    (_stats(), dict(a1=SideFilter(country_mode="custom", countries_csv="FRA,USA")), True),
+    (_stats(codes={"Actor1CountryCode": []}), {}, False),  # 預設要求國家碼非空
+    (_stats(codes={"Actor1CountryCode": None}), dict(a1=SideFilter(country_mode="custom", countries_csv="FRA")), True),
+    (_stats(), dict(a1=SideFilter(type_mode="labeled")), False),
+    (_stats(), dict(a2=SideFilter(type_mode="custom", type_codes_csv="MIL")), False),
+    (_stats(), dict(a2=SideFilter(type_mode="custom", type_codes_csv="GOV")), True),
+    (_stats(codes={"Actor2CountryCode": ["USA"]}), dict(only_cross_country=True), False),
+    (_stats(), dict(only_cross_country=True), True),
+])
+def test_may_match_rules(stats, kwargs, expected):
+    assert may_match(_plan(**kwargs), stats, NAME) is expected
+
+
+def test_year_bounds_only_used_when_filename_cannot_decide():
+    years = dict(enable_year_filter=True, year_start=2010, year_end=2012)
+    assert may_match(_plan(**years), _stats(), "events.csv") is False
+    assert may_match(_plan(**years), _stats(years=[2011, 2015]), "events.csv") is True
+    assert may_match(_plan(**years), _stats(years=None), "events.csv") is True
+    # 檔名已可判斷年份的檔案由年份快篩處理，這裡不重複判斷
+    assert may_match(_plan(**years), _stats(), "2011.csv") is True
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    names = []
+    real = core.iter_typed_csv
+
+    def spy(path, columns=None, chunksize=None):
+        names.append(os.path.basename(path))
+        return real(path, columns, chunksize)
+
+    monkeypatch.setattr(core, "iter_typed_csv", spy)
+    return names
+
+
+def test_second_run_skips_files_that_cannot_match(tmp_path, make_daily_file, reads):
+    make_daily_file([dict(GLOBALEVENTID=1, Actor1CountryCode="USA")], name="20150820.export.CSV")
+    make_daily_file([dict(GLOBALEVENTID=2, Actor1CountryCode="FRA")], name="20150821.export.CSV")
+    raw = tmp_path / "raw"
+    cols = ["GLOBALEVENTID", "Actor1CountryCode"]
+    process_directory(str(raw), str(tmp_path / "first.tsv"), ProcessorConfig(selected_columns=cols))
+    assert (raw / CATALOG_FILE).exists()
+    assert len(Catalog.load(str(raw)).files) == 2
+
+    reads.clear()
+    logs = []
+    cfg = ProcessorConfig(selected_columns=cols, a1=SideFilter(country_mode="custom", countries_csv="FRA"))
+    process_directory(str(raw), str(tmp_path / "out.tsv"), cfg, progress_cb=logs.append)
+    assert reads == ["20150821.export.CSV"]
+    assert any("統計目錄：略過 1 檔" in m for m in logs)
+    assert pd.read_csv(tmp_path / "out.tsv", sep="\t")["GLOBALEVENTID"].tolist() == [2]
+
+
+def test_changed_file_is_read_again(tmp_path, make_daily_file, reads):
+    path = make_daily_file([dict(Actor1CountryCode="USA")])
+    raw = tmp_path / "raw"
+    fra = ProcessorConfig(a1=SideFilter(country_mode="custom", countries_csv="FRA"))
+    process_directory(str(raw), str(tmp_path / "a.tsv"), fra)  # 建立統計
+
+    make_daily_file([dict(Actor1CountryCode="FRA")])
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    reads.clear()
+    result = process_directory(str(raw), str(tmp_path / "b.tsv"), fra)
+    assert reads == [path.name] and result["rows_out"] == 1  # 舊統計作廢，不會誤略
@@ -0,0 +1,71 @@
+# 落地轉檔（Parquet / Feather）與欄式檔讀取的測試
+import io
+import os
+import threading
+import zipfile
+
+import pandas as pd
+import pytest
+
+from GDELT_helper.download.pipeline import DownloadPipeline
+from GDELT_helper.processing.columnar import (
+    columnar_columns, columnar_path, convert_csv, iter_columnar, read_columnar,
+)
+from GDELT_helper.processing.core import ProcessorConfig, process_directory
+from GDELT_helper.processing.schema import DAILY_COLUMNS
+
+ROWS = [dict(GLOBALEVENTID=i, FractionDate="2015.6320", AvgTone="-3.69230769230769", EventCode="010",
+             Actor1CountryCode=("USA", "FRA")[i % 2], NumMentions=i % 7, SOURCEURL=f"http://x/{i}")
+        for i in range(1, 40)]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_convert_csv_types_and_projection(make_daily_file, fmt):
+    src = make_daily_file(ROWS)
+    logs = []
+    out = convert_csv(str(src), fmt, keep_raw=False, log=logs.append)
+    assert out == columnar_path(str(src), fmt) and out.endswith(f".export.{fmt}")
+    assert not src.exists() and len(logs) == 1
+    assert columnar_columns(out) == list(DAILY_COLUMNS)
+
+    df = read_columnar(out)
+    assert len(df) == len(ROWS)
+    assert df["GLOBALEVENTID"].dtype.kind == "i" and df["AvgTone"].dtype.kind == "f"
+    assert isinstance(df["Actor1CountryCode"].dtype, pd.CategoricalDtype)
+
+    # 只讀指定欄位；檔案中沒有的欄位略過
+    part = read_columnar(out, ["Actor1CountryCode", "NotAColumn", "GLOBALEVENTID"])
+    assert sorted(part.columns) == ["Actor1CountryCode", "GLOBALEVENTID"]
+    chunks = list(iter_columnar(out, ["GLOBALEVENTID"], chunksize=10))
+    assert pd.concat(chunks)["GLOBALEVENTID"].tolist() == list(range(1, 40))
+
+
+def test_bad_format_rejected(make_daily_file):
+    with pytest.raises(ValueError):
+        convert_csv(str(make_daily_file(1)), "orc")
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_processing_converted_folder_matches_raw(tmp_path, make_daily_file, fmt):
+    src = make_daily_file(ROWS)
+    converted = tmp_path / "converted"
+    converted.mkdir()
+    convert_csv(str(make_daily_file(ROWS, folder="converted")), fmt, keep_raw=False)
+    cfg = ProcessorConfig(selected_columns=list(DAILY_COLUMNS))
+    process_directory(str(src.parent), str(tmp_path / "raw.tsv"), cfg)
+    process_directory(str(converted), str(tmp_path / "conv.tsv"), cfg)
+    assert (tmp_path / "conv.tsv").read_bytes() == (tmp_path / "raw.tsv").read_bytes()
+
+
+def test_pipeline_converts_after_verification(http_server, tmp_path, make_daily_file):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.write(make_daily_file(ROWS), "20150820.export.CSV")
+    http_server({"20150820.export.CSV.zip": buf.getvalue()})
+    out = tmp_path / "out"
+    pipe = DownloadPipeline(str(out), lambda _m: None, threading.Event(), convert_to="parquet", keep_raw=False)
+    stats = pipe.run(["20150820"])
+    assert stats["downloaded"] == 1
+    assert os.listdir(out) == ["20150820.export.parquet"]
+    assert pipe.inventory.has_extracted("20150820") and not pipe.inventory.has("20150820.export.CSV")
+    assert len(read_columnar(str(out / "20150820.export.parquet"))) == len(ROWS)
@@ -0,0 +1,78 @@
+# 壓實成年/月分區資料集與分區裁剪的測試
+import os
+
+import pandas as pd
+import pytest
+
+from GDELT_helper.processing import core
+from GDELT_helper.processing.compact import STAGING_DIR, compact_directory
+from GDELT_helper.processing.core import ProcessorConfig, process_directory
+from GDELT_helper.processing.dataset import is_partitioned, part_source, partition_files
+
+
+@pytest.fixture
+def raw(tmp_path, make_daily_file):
+    make_daily_file([dict(GLOBALEVENTID=1, SQLDATE="20141231", Year="2014"),
+                     dict(GLOBALEVENTID=2, SQLDATE="20150101"),
+                     dict(GLOBALEVENTID=3, SQLDATE="")], name="20150101.export.CSV")
+    make_daily_file([dict(GLOBALEVENTID=4, SQLDATE="20150215"),
+                     dict(GLOBALEVENTID=5, SQLDATE="20150216"),
+                     dict(GLOBALEVENTID=6, SQLDATE="20160301", Year="2016")], name="20150216.export.CSV")
+    return tmp_path / "raw"
+
+
+def _ids(path):
+    return sorted(pd.read_csv(path, sep="\t", dtype=str)["GLOBALEVENTID"].astype(int).tolist())
+
+
+def test_compact_layout_and_rerun(tmp_path, raw):
+    dataset = tmp_path / "dataset"
+    stats = compact_directory(str(raw), str(dataset), log=lambda _m: None)
+    assert stats == {'files_total': 2, 'compacted': 2, 'skipped': 0, 'errors': 0, 'rows': 6}
+    parts = partition_files(str(dataset))
+    dirs = sorted({os.path.dirname(p) for p in parts})
+    assert dirs == sorted([
+        os.path.join("year=2014", "month=12"), os.path.join("year=2015", "month=1"),
+        os.path.join("year=2015", "month=2"), os.path.join("year=2016", "month=3"),
+        os.path.join("year=__HIVE_DEFAULT_PARTITION__", "month=__HIVE_DEFAULT_PARTITION__"),
+    ])
+    assert parts[0].startswith("year=__HIVE_DEFAULT_PARTITION__")  # 空值分區排最前
+    assert {part_source(p) for p in parts} == {"20150101", "20150216"}
+    assert is_partitioned(str(dataset)) and not is_partitioned(str(raw))
+    assert not (dataset / STAGING_DIR).exists()
+
+    assert compact_directory(str(raw), str(dataset), log=lambda _m: None)['skipped'] == 2
+    stats = compact_directory(str(raw), str(dataset), log=lambda _m: None, overwrite=True)
+    assert stats['compacted'] == 2 and partition_files(str(dataset)) == parts  # 取代，不重複
+
+
+def test_dataset_processes_like_raw(tmp_path, raw):
+    dataset = tmp_path / "dataset"
+    compact_directory(str(raw), str(dataset), log=lambda _m: None)
+    cfg = ProcessorConfig(selected_columns=["GLOBALEVENTID", "SQLDATE"])
+    process_directory(str(raw), str(tmp_path / "raw.tsv"), cfg)
+    process_directory(str(dataset), str(tmp_path / "dataset.tsv"), cfg)
+    assert _ids(tmp_path / "dataset.tsv") == _ids(tmp_path / "raw.tsv") == [1, 2, 3, 4, 5, 6]
+
+
+def test_year_filter_prunes_partitions(tmp_path, raw, monkeypatch):
+    dataset = tmp_path / "dataset"
+    compact_directory(str(raw), str(dataset), log=lambda _m: None)
+    opened = []
+    real = core.iter_columnar
+
+    def spy(path, columns=None, chunksize=None):
+        opened.append(os.path.relpath(path, dataset))
+        return real(path, columns, chunksize)
+
+    monkeypatch.setattr(core, "iter_columnar", spy)
+    logs = []
+    out = tmp_path / "out.tsv"
+    process_directory(str(dataset), str(out), ProcessorConfig(
+        selected_columns=["GLOBALEVENTID"], enable_year_filter=True, year_start=2015, year_end=2015,
+        use_catalog=False), progress_cb=logs.append)
+
+    # 2014、2016 分區連開檔都不做；空值分區無法依目錄判斷，保留給逐列篩選
+    assert {p.split(os.sep)[0] for p in opened} == {"year=2015", "year=__HIVE_DEFAULT_PARTITION__"}
+    assert any(m.startswith("分區裁剪：保留 3 檔，略過 2 檔") for m in logs)
+    assert _ids(out) == [2, 3, 4, 5]  # 空值分區的列依來源檔名的年份保留
@@ -0,0 +1,39 @@
+# pandas 與 Arrow 引擎的結果一致性
+import pytest
+
+from GDELT_helper.processing import arrow_engine
+from GDELT_helper.processing.core import ProcessorConfig, process_directory
+
+pytest.importorskip("pyarrow")
+
+
+def _truncate(line, fields):
+    return "\t".join(line.split("\t")[:fields])
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_truncated_rows_kept_by_both_engines(tmp_path, make_daily_file, monkeypatch, cache):
+    src = make_daily_file([{"GLOBALEVENTID": i, "SOURCEURL": f"http://x/{i}"} for i in range(3000)])
+    lines = src.read_text(encoding="utf-8").splitlines()
+    short = (1500, 1501, 2500)  # 都在後面的區塊：Arrow 失敗前已交出前面的結果
+    for i in short:
+        lines[i] = _truncate(lines[i], 40)
+    src.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    monkeypatch.setattr(arrow_engine, "BLOCK_SIZE", 16 << 10)
+
+    outputs = {}
+    for engine in ("pandas", "arrow"):
+        logs = []
+        cfg = ProcessorConfig(engine=engine, chunk_rows=500, cache=cache, cache_dir=str(tmp_path / f"c-{engine}"),
+                              selected_columns=["GLOBALEVENTID", "SQLDATE"])
+        out = tmp_path / f"{engine}.tsv"
+        r = process_directory(str(src.parent), str(out), cfg, progress_cb=logs.append)
+        assert r["rows_out"] == 3000 and r["errors"] == 0
+        outputs[engine] = out.read_bytes()
+        if engine == "arrow":
+            assert any("改用 pandas" in m for m in logs)
+    assert outputs["arrow"] == outputs["pandas"]
+    header, *rows = outputs["arrow"].decode().splitlines()
+    col = header.split("\t").index("GLOBALEVENTID")
+    ids = [line.split("\t")[col] for line in rows]
+    assert ids == [str(i) for i in range(3000)]
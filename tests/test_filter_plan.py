@@ -0,0 +1,71 @@
+# 篩選計畫（FilterPlan）編譯、指紋與遮罩的測試
+import pickle
+
+import pandas as pd
+import pytest
+
+from GDELT_helper.processing.core import FilterPlan, ProcessorConfig, SideFilter, process_directory
+
+
+def _plan(**kwargs):
+    return FilterPlan.compile(ProcessorConfig(**kwargs))
+
+
+def test_codes_normalised_once():
+    plan = _plan(a1=SideFilter(country_mode="custom", countries_csv=" usa, chn ,,USA"),
+                 a2=SideFilter(type_mode="custom", type_codes_csv="gov"))
+    assert plan.a1.country_rule == "codes" and plan.a1.countries == frozenset({"USA", "CHN"})
+    assert plan.a2.type_rule == "codes" and plan.a2.types == frozenset({"GOV"})
+    assert pickle.loads(pickle.dumps(plan)) == plan  # 平行處理時送往子程序
+
+
+def test_fingerprint_ignores_code_order_and_case():
+    a = _plan(a1=SideFilter(country_mode="custom", countries_csv="USA,CHN"))
+    b = _plan(a1=SideFilter(country_mode="custom", countries_csv="chn, usa"))
+    c = _plan(a1=SideFilter(country_mode="custom", countries_csv="USA"))
+    assert a.fingerprint() == b.fingerprint() != c.fingerprint()
+    assert _plan(only_cross_country=True).fingerprint() != _plan().fingerprint()
+    assert _plan(selected_columns=["SQLDATE"]).fingerprint() != _plan(selected_columns=["Year"]).fingerprint()
+
+
+@pytest.mark.parametrize("kwargs", [
+    dict(a1=SideFilter(country_mode="some")),
+    dict(a2=SideFilter(type_mode="odd")),
+    dict(enable_year_filter=True, year_start=2016, year_end=2015),
+])
+def test_invalid_config_rejected(kwargs):
+    with pytest.raises(ValueError):
+        _plan(**kwargs)
+
+
+def test_warnings_compiled_and_reported_once(tmp_path, make_daily_file):
+    for day in ("20150820", "20150821"):
+        make_daily_file(2, name=f"{day}.export.CSV")
+    cfg = ProcessorConfig(a1=SideFilter(country_mode="custom", countries_csv=""),
+                          a2=SideFilter(country_mode="custom", countries_csv="US"), chunk_rows=1)
+    plan = FilterPlan.compile(cfg)
+    assert plan.a1.country_rule == "any" and len(plan.warnings) == 2
+    logs = []
+    process_directory(str(tmp_path / "raw"), str(tmp_path / "out.tsv"), cfg, progress_cb=logs.append)
+    for w in plan.warnings:
+        assert logs.count(w) == 1
+
+
+def test_mask_combines_all_rules():
+    df = pd.DataFrame({
+        "Actor1CountryCode": ["USA", "USA", "CHN", "", "USA"],
+        "Actor2CountryCode": ["CHN", "USA", "USA", "CHN", "RUS"],
+        "Actor1Type1Code": ["GOV", "GOV", "GOV", "GOV", ""],
+        "Year": [2015, 2015, 2015, 2015, 2015],
+    })
+    plan = _plan(only_cross_country=True, a1=SideFilter(type_mode="labeled"),
+                 a2=SideFilter(country_mode="custom", countries_csv="CHN,USA"))
+    logs = []
+    assert plan.mask(df, "20150820.export.CSV", logs.append).tolist() == [True, False, True, False, False]
+    assert logs == []
+
+    # 缺欄位：略過對應條件並回報
+    logs = []
+    mask = plan.mask(df.drop(columns=["Actor1Type1Code"]), "20150820.export.CSV", logs.append)
+    assert mask.tolist() == [True, False, True, False, False]
+    assert len(logs) == 1 and "Actor1Type1Code" in logs[0]
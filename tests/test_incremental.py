@@ -0,0 +1,121 @@
+# 增量處理：未變更的檔案沿用既有輸出中的位元組範圍
+import os
+
+import pytest
+
+from GDELT_helper.processing import core
+from GDELT_helper.processing.core import ProcessorConfig, SideFilter, process_directory
+from GDELT_helper.processing.incremental import OutputManifest
+
+DAYS = ("20150820", "20150821", "20150822")
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """記錄實際被讀取的原始檔。"""
+    names = []
+    real = core.iter_typed_csv
+
+    def spy(path, columns=None, chunksize=None):
+        names.append(os.path.basename(path))
+        return real(path, columns, chunksize)
+
+    monkeypatch.setattr(core, "iter_typed_csv", spy)
+    return names
+
+
+def _day(make_daily_file, day, n=3, country="USA"):
+    return make_daily_file([dict(GLOBALEVENTID=f"{day}{i}", SQLDATE=day, Actor1CountryCode=country)
+                            for i in range(n)], name=f"{day}.export.CSV")
+
+
+def _run(tmp_path, name="out.tsv", incremental=True, **kwargs):
+    out = tmp_path / name
+    logs = []
+    cfg = ProcessorConfig(selected_columns=["GLOBALEVENTID", "SQLDATE", "Actor1CountryCode"],
+                          incremental=incremental, use_catalog=False, **kwargs)
+    result = process_directory(str(tmp_path / "raw"), str(out), cfg, progress_cb=logs.append)
+    return out, result, logs
+
+
+def _full(tmp_path, **kwargs):
+    return _run(tmp_path, name="full.tsv", incremental=False, **kwargs)[0].read_bytes()
+
+
+def _touch_later(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def test_unchanged_rerun_reads_nothing(tmp_path, make_daily_file, reads):
+    for day in DAYS:
+        _day(make_daily_file, day)
+    out, _, _ = _run(tmp_path)
+    before = out.read_bytes()
+    entries = OutputManifest.load(str(out)).entries
+    assert [entries[f"{d}.export.CSV"].rows for d in DAYS] == [3, 3, 3]
+
+    reads.clear()
+    _, result, logs = _run(tmp_path)
+    assert reads == [] and result["rows_out"] == 9
+    assert any("輸出已是最新" in m for m in logs)
+    assert out.read_bytes() == before
+
+
+def test_new_file_at_end_is_appended(tmp_path, make_daily_file, reads):
+    for day in DAYS[:2]:
+        _day(make_daily_file, day)
+    out, _, _ = _run(tmp_path)
+    _day(make_daily_file, DAYS[2])
+
+    reads.clear()
+    _, result, logs = _run(tmp_path)
+    assert reads == [f"{DAYS[2]}.export.CSV"] and result["rows_out"] == 9
+    assert any("附加至既有輸出" in m for m in logs)
+    assert out.read_bytes() == _full(tmp_path)
+
+
+def test_changed_middle_file_reprocessed_others_copied(tmp_path, make_daily_file, reads):
+    for day in DAYS:
+        _day(make_daily_file, day)
+    out, _, _ = _run(tmp_path)
+    changed = _day(make_daily_file, DAYS[1], n=5, country="FRA")
+    _touch_later(changed)
+
+    reads.clear()
+    _, result, _ = _run(tmp_path)
+    assert reads == [f"{DAYS[1]}.export.CSV"] and result["rows_out"] == 11
+    assert out.read_bytes() == _full(tmp_path)
+    # 重組後的清單仍對應正確的位元組範圍
+    data = out.read_bytes()
+    e = OutputManifest.load(str(out)).entries[f"{DAYS[1]}.export.CSV"]
+    assert data[e.offset:e.offset + e.length].decode().count("FRA") == 5
+
+
+def test_removed_file_drops_its_rows(tmp_path, make_daily_file, reads):
+    paths = [_day(make_daily_file, day) for day in DAYS]
+    out, _, _ = _run(tmp_path)
+    paths[0].unlink()
+
+    reads.clear()
+    _, result, _ = _run(tmp_path)
+    assert reads == [] and result["rows_out"] == 6
+    assert out.read_bytes() == _full(tmp_path)
+
+
+@pytest.mark.parametrize("change", ["filter", "output_edited"])
+def test_invalidated_manifest_reprocesses_everything(tmp_path, make_daily_file, reads, change):
+    for day in DAYS:
+        _day(make_daily_file, day)
+    out, _, _ = _run(tmp_path)
+    kwargs = {}
+    if change == "filter":
+        kwargs = dict(a1=SideFilter(country_mode="custom", countries_csv="USA"))
+    else:
+        with open(out, "a") as f:
+            f.write("edited by hand\n")
+
+    reads.clear()
+    _, result, _ = _run(tmp_path, **kwargs)
+    assert sorted(reads) == [f"{d}.export.CSV" for d in DAYS] and result["rows_out"] == 9
+    assert out.read_bytes() == _full(tmp_path, **kwargs)
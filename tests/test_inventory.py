@@ -0,0 +1,67 @@
+# LocalInventory 本地檔案清冊的測試
+import io
+import threading
+import zipfile
+
+from GDELT_helper.download import core
+from GDELT_helper.inventory import LocalInventory, base_of
+
+
+def _zip_bytes(member: str) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr(member, "1\t2\n")
+    return buf.getvalue()
+
+
+def test_index_and_queries(tmp_path):
+    (tmp_path / "20150101.export.CSV").write_text("abc")
+    (tmp_path / "20150102.export.CSV.zip").write_bytes(b"zz")
+    (tmp_path / "20150103.parquet").write_bytes(b"p")
+    (tmp_path / ".gdelt_manifest.json").write_text("{}")  # 隱藏檔不列入
+    (tmp_path / "sub.csv").mkdir()  # 資料夾不列入
+    inv = LocalInventory(str(tmp_path))
+
+    assert len(inv) == 3
+    assert inv.has("20150101.export.CSV") and not inv.has(".gdelt_manifest.json")
+    assert inv.stat("20150101.export.CSV")[0] == 3
+    assert inv.has_extracted("20150101") and inv.has_extracted("20150103")
+    assert not inv.has_extracted("20150102")  # 只有壓縮檔，尚未解壓
+    assert inv.files() == ["20150101.export.CSV"]  # 副檔名不分大小寫
+    assert inv.files((".csv", ".zip")) == ["20150101.export.CSV", "20150102.export.CSV.zip"]
+    assert base_of("/x/1979.zip") == "1979"
+
+
+def test_add_discard_and_refresh(tmp_path):
+    inv = LocalInventory(str(tmp_path / "missing"))  # 資料夾不存在：空清冊
+    assert len(inv) == 0
+
+    inv = LocalInventory(str(tmp_path))
+    (tmp_path / "20150101.export.CSV").write_text("abc")
+    assert not inv.has("20150101.export.CSV")  # 不會自行重掃
+    inv.add("20150101.export.CSV")
+    inv.add("20150199.export.CSV")  # 不存在的檔案不加入
+    assert inv.has_extracted("20150101") and len(inv) == 1
+
+    inv.discard("20150101.export.CSV")
+    assert not inv.has_extracted("20150101") and len(inv) == 0
+    inv.refresh()
+    assert inv.has("20150101.export.CSV")
+
+
+def test_download_uses_and_updates_inventory(http_server, tmp_path):
+    served = http_server({"20150102.export.CSV.zip": _zip_bytes("20150102.export.CSV")})
+    out = tmp_path / "out"
+    out.mkdir()
+    (out / "20150101.export.CSV").write_text("abc")
+    inv = LocalInventory(str(out))
+    logs = []
+
+    # 已解壓的目標：直接略過，不連線
+    assert core.download_one("20150101", str(out), logs.append, threading.Event(), inventory=inv) == core.STATUS_SKIPPED
+    assert served.hits == []
+
+    # 新下載的目標：解壓後清冊就地更新（壓縮檔移除、CSV 加入）
+    assert core.download_one("20150102", str(out), logs.append, threading.Event(), inventory=inv) == core.STATUS_DOWNLOADED
+    assert inv.has_extracted("20150102") and not inv.has("20150102.export.CSV.zip")
+    assert inv.files() == ["20150101.export.CSV", "20150102.export.CSV"]
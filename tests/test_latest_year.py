@@ -0,0 +1,56 @@
+# 最新資料年份偵測（檔案清單與 HEAD 探測）的測試
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from GDELT_helper.download import core
+
+
+def _day(offset: int) -> str:
+    return (datetime.now(timezone.utc).date() - timedelta(days=offset)).strftime("%Y%m%d")
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(core, "_latest_cache", {})
+
+
+@pytest.fixture
+def serve_days(http_server):
+    """伺服器上有「往前第 newest 天」到第 oldest 天的每日檔。"""
+    def serve(newest, oldest=600):
+        return http_server({f"{_day(n)}.export.CSV.zip": b"" for n in range(newest, oldest + 1)})
+    return serve
+
+
+def test_manifest_needs_no_probes(serve_days):
+    served = serve_days(3)
+    manifest = {"20140301.export.CSV.zip": None, "20190705.export.CSV.zip": None, "2005.zip": None}
+    assert core.detect_latest_available_year(manifest=manifest) == 2019
+    assert served.head_hits == []
+
+
+@pytest.mark.parametrize("newest", [0, 2, 40, 300])
+def test_probes_find_latest_year(serve_days, newest):
+    served = serve_days(newest)
+    expected = datetime.strptime(_day(newest), "%Y%m%d").year
+    assert core.detect_latest_available_year() == expected
+    # 每個日期最多兩個 HEAD（兩種副檔名）；倍增回溯加多點二分，總數遠少於逐日探測
+    assert 0 < len(served.head_hits) <= 2 * 40
+
+
+def test_result_is_cached(serve_days):
+    served = serve_days(40)
+    year = core.detect_latest_available_year()
+    probes = len(served.head_hits)
+    assert core.cached_latest_year() == year
+    assert core.detect_latest_available_year() == year
+    assert len(served.head_hits) == probes
+    assert core.cached_latest_year(ttl=-1) is None
+
+
+def test_nothing_found_falls_back_uncached(serve_days):
+    serve_days(newest=700, oldest=699)  # 超出 max_back_days
+    today = datetime.now(timezone.utc).date()
+    assert core.detect_latest_available_year(max_back_days=540) == today.year
+    assert core.cached_latest_year() is None
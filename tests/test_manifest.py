@@ -0,0 +1,81 @@
+# 官方檔案清單（md5sums / filesizes）解析、快取與 MD5 驗證的測試
+import hashlib
+import os
+import threading
+
+import pytest
+
+from GDELT_helper.download import core
+from GDELT_helper.download.manifest import (
+    MANIFEST_CACHE_NAME, load_manifest, parse_manifest, plan_targets, total_bytes,
+)
+
+NAME = "20150101.export.CSV.zip"
+DATA = bytes(range(256)) * 1000
+MD5 = hashlib.md5(DATA).hexdigest()
+
+
+@pytest.fixture
+def served(http_server):
+    return http_server({
+        NAME: DATA,
+        "md5sums": f"{MD5}  {NAME}\n{'0' * 32}  2014.zip\n".encode(),
+        "filesizes": f"{len(DATA)} {NAME}\n".encode(),
+    })
+
+
+def test_parse_manifest_merges_and_filters():
+    md5_text = (f"{MD5.upper()}  {NAME}\n"
+                f"{'a' * 32}  200601.zip\n"
+                f"{'b' * 32}  1979.zip\n"
+                f"{'c' * 32}  20150101.gkg.csv.zip\n")  # 非事件資料：略過
+    sizes_text = f"{NAME} {len(DATA)}\n123 1979.zip\n"  # 欄位順序不拘
+    entries = parse_manifest(md5_text, sizes_text)
+    assert sorted(entries) == ["1979.zip", "200601.zip", NAME]
+    assert entries[NAME].md5 == MD5 and entries[NAME].size == len(DATA)
+    assert entries["200601.zip"].size is None
+    assert [e.filename for e in plan_targets(entries, [1979, 2015])] == ["1979.zip", NAME]
+    assert total_bytes(entries.values()) == len(DATA) + 123
+
+
+def test_load_manifest_caches_and_falls_back(served, tmp_path):
+    cache_dir = str(tmp_path / "out")
+    entries = load_manifest(cache_dir)
+    assert entries[NAME].md5 == MD5 and entries[NAME].size == len(DATA)
+    assert os.path.exists(os.path.join(cache_dir, MANIFEST_CACHE_NAME))
+    hits = len(served.hits)
+
+    assert load_manifest(cache_dir)[NAME].md5 == MD5  # 快取未過期：不連線
+    assert len(served.hits) == hits
+
+    served.unavailable = frozenset({"md5sums"})
+    logs = []
+    stale = load_manifest(cache_dir, max_age=0, log=logs.append)  # 過期且更新失敗：沿用舊快取
+    assert stale[NAME].md5 == MD5
+    assert any("沿用舊快取" in m for m in logs)
+
+
+def test_md5_mismatch_deletes_and_redownloads(served, tmp_path):
+    out = tmp_path / "out"
+    out.mkdir()
+    # 內容錯誤的 .part：續傳後 MD5 不符，應刪除並從頭重抓
+    (out / (NAME + core.PART_SUFFIX)).write_bytes(b"\0" * 1000)
+    logs = []
+    status, zip_path = core.fetch_one("20150101", str(out), logs.append, threading.Event(), filename=NAME,
+                                      expected_size=len(DATA), expected_md5=MD5)
+    assert status == core.STATUS_DOWNLOADED
+    assert open(zip_path, "rb").read() == DATA
+    assert any("MD5 驗證失敗" in m for m in logs)
+    assert served.range_hits == [(NAME, "bytes=1000-")] and len(served.hits) == 2
+
+
+def test_md5_never_matching_fails_without_leftovers(served, tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "backoff_delay", lambda _attempt: 0)
+    out = tmp_path / "out"
+    deltas = []
+    status, zip_path = core.fetch_one("20150101", str(out), lambda _m: None, threading.Event(), filename=NAME,
+                                      expected_size=len(DATA), expected_md5="f" * 32, bytes_cb=deltas.append)
+    assert status == core.STATUS_FAILED and zip_path is None
+    assert os.listdir(out) == []
+    assert len(served.hits) == core.MAX_ATTEMPTS
+    assert sum(deltas) == 0  # 作廢的內容已扣回進度
@@ -0,0 +1,44 @@
+# DownloadMetrics 累計摘要
+import random
+import time
+
+from GDELT_helper.download.metrics import DownloadMetrics, histogram
+
+
+def _metric(metrics, i, rnd):
+    m = metrics.begin(f"t{i}")
+    m.ttfb = rnd.choice([None, rnd.uniform(0, 90)])
+    m.bytes = rnd.choice([0, rnd.randint(1, 10_000)])
+    m.elapsed = rnd.uniform(0, 90)
+    m.retries = rnd.choice([0, 0, 1, 3])
+    return m
+
+
+def test_summary_matches_records():
+    rnd = random.Random(7)
+    seen = []
+    metrics = DownloadMetrics(on_record=lambda _m, s: seen.append(s))
+    for i in range(500):
+        metrics.record(_metric(metrics, i, rnd), rnd.choice(["downloaded", "skipped", "failed"]))
+    s = metrics.summary()
+    recs = metrics.records
+    assert s["files"] == 500 and len(seen) == 500 and seen[-1]["files"] == 500
+    assert sum(s["status"].values()) == 500
+    assert s["bytes"] == sum(m.bytes for m in recs)
+    assert s["retries"] == sum(m.retries for m in recs)
+    assert s["files_retried"] == sum(1 for m in recs if m.retries)
+    ttfbs = sorted(m.ttfb for m in recs if m.ttfb is not None)
+    elapsed = [m.elapsed for m in recs if m.bytes > 0]
+    assert s["ttfb_histogram"] == histogram(ttfbs)
+    assert s["elapsed_histogram"] == histogram(elapsed)
+    assert s["ttfb"]["max"] == round(ttfbs[-1], 4)
+    assert s["ttfb"]["p50"] == round(ttfbs[len(ttfbs) // 2], 4)
+
+
+def test_record_cost_does_not_grow_with_history():
+    rnd = random.Random(1)
+    metrics = DownloadMetrics(on_record=lambda _m, _s: None)
+    t0 = time.perf_counter()
+    for i in range(5000):
+        metrics.record(_metric(metrics, i, rnd), "downloaded")
+    assert time.perf_counter() - t0 < 2.0
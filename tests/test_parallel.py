@@ -0,0 +1,97 @@
+# 平行處理（程序池）路徑：子程序錯誤與中止
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from GDELT_helper.processing import core
+from GDELT_helper.processing.core import FilterPlan, ProcessorConfig, process_directory
+
+
+@pytest.fixture
+def parallel(monkeypatch):
+    """本機可能只有一顆 CPU；放寬程序數上限，讓 process_directory 走程序池。"""
+    monkeypatch.setattr(core.os, "cpu_count", lambda: 4)
+
+
+def test_worker_crash_is_reported_not_masked(tmp_path, make_daily_file, parallel, monkeypatch):
+    for day in ("20150820", "20150821"):
+        raw = make_daily_file(20, f"{day}.export.CSV").parent
+    # 無法 pickle 的工作函式：future 直接拋出例外，等同子程序異常結束
+    monkeypatch.setattr(core, "_filter_file", lambda *a: None)
+    logs = []
+    r = process_directory(str(raw), str(tmp_path / "out.tsv"), ProcessorConfig(workers=2, use_catalog=False),
+                          progress_cb=logs.append)
+    assert r["errors"] == 2 and r["rows_out"] == 0
+    errors = [m for m in logs if m.startswith("錯誤")]
+    assert len(errors) == 2 and all("pickle" in m for m in errors)
+
+
+def test_parallel_output_matches_serial(tmp_path, make_daily_file, parallel):
+    for day in ("20150820", "20150821", "20150822"):
+        raw = make_daily_file(500, f"{day}.export.CSV").parent
+    serial, par = tmp_path / "serial.tsv", tmp_path / "parallel.tsv"
+    process_directory(str(raw), str(serial), ProcessorConfig(chunk_rows=120))
+    r = process_directory(str(raw), str(par), ProcessorConfig(chunk_rows=120, workers=3))
+    assert r["rows_out"] == 1500
+    assert par.read_bytes() == serial.read_bytes()
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(core.SPILL_PREFIX)]
+
+
+def test_worker_spills_each_chunk(tmp_path, make_daily_file):
+    src = make_daily_file(500)
+    spill = tmp_path / "spill"
+    spill.mkdir()
+    plan = FilterPlan.compile(ProcessorConfig())
+    paths, _msgs, err, _stats = core._filter_file(str(src), plan, 120, spill_dir=str(spill))
+    assert err is None and len(paths) == 5
+    assert sum(len(df) for df in core._load_spilled(paths)) == 500
+    assert not list(spill.iterdir())
+
+
+def _slow_filter_file(*_args):
+    time.sleep(3)
+    return [], [], None, None
+
+
+def test_stop_does_not_wait_for_running_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "_filter_file", _slow_filter_file)
+    plan = FilterPlan.compile(ProcessorConfig())
+    stop = threading.Event()
+    threading.Timer(0.3, stop.set).start()
+    t0 = time.monotonic()
+    results = list(core._iter_results(str(tmp_path), ["a.CSV", "b.CSV"], plan, 1000, "pandas", None, frozenset(),
+                                      True, None, 2, stop.is_set))
+    assert results == []
+    assert time.monotonic() - t0 < 2
+
+
+@pytest.mark.parametrize("name, aggregate, kept", [
+    ("out.tsv", False, 0), ("out.parquet", False, 0), ("out.csv", True, 0),
+    ("out.tsv.gz", False, 50),  # 壓縮輸出無法撤回：保留並記錄
+])
+def test_file_failing_mid_read_is_rolled_back(tmp_path, make_daily_file, monkeypatch, name, aggregate, kept):
+    make_daily_file(100, "20150820.export.CSV")
+    raw = make_daily_file(100, "20150821.export.CSV").parent
+    real = core.read_chunks
+
+    def failing(path, *args):
+        for i, chunk in enumerate(real(path, *args)):
+            if i and path.endswith("20150821.export.CSV"):
+                raise OSError("讀取中斷")
+            yield chunk
+
+    monkeypatch.setattr(core, "read_chunks", failing)
+    cfg = ProcessorConfig(chunk_rows=50, use_catalog=False, aggregate_by=["dyad"] if aggregate else [])
+    logs = []
+    r = process_directory(str(raw), str(tmp_path / name), cfg, progress_cb=logs.append)
+    assert r["errors"] == 1
+    assert any("無法撤回" in m for m in logs) == bool(kept)
+    if aggregate:
+        out = pd.read_csv(tmp_path / name, sep="\t")
+        assert out["count"].tolist() == [100]
+    elif name.endswith(".parquet"):
+        assert len(pd.read_parquet(tmp_path / name)) == 100
+    else:
+        assert len(pd.read_csv(tmp_path / name, sep="\t")) == 100 + kept
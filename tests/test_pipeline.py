@@ -0,0 +1,100 @@
+# 三段式 DownloadPipeline（下載 → 解壓 → 驗證）的測試
+import io
+import os
+import threading
+import zipfile
+
+import pytest
+
+from GDELT_helper.download import pipeline
+from GDELT_helper.download.core import STATUS_DOWNLOADED, STATUS_FAILED, STATUS_SKIPPED
+from GDELT_helper.download.pipeline import DownloadPipeline
+
+DAYS = [f"201501{d:02d}" for d in range(1, 5)]
+
+
+def _zip_bytes(member: str) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(member, "1\t2\t3\n" * 100)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def served(http_server):
+    return http_server({f"{d}.export.CSV.zip": _zip_bytes(f"{d}.export.CSV") for d in DAYS})
+
+
+def _run(out, targets, **kwargs):
+    counted, snapshots = [], []
+    pipe = DownloadPipeline(str(out), lambda _m: None, threading.Event(), fetch_workers=2, extract_workers=2,
+                            perfile_cb=counted.append, progress_cb=snapshots.append, **kwargs)
+    return pipe.run(targets), counted, snapshots
+
+
+def test_all_stages_run_on_their_own_threads(served, tmp_path, monkeypatch):
+    threads = {"unzip": set(), "verify": set()}
+    unzip, verify = pipeline.unzip_and_cleanup, DownloadPipeline._verify_loop
+
+    def tracked_unzip(*args, **kwargs):
+        threads["unzip"].add(threading.current_thread().name)
+        return unzip(*args, **kwargs)
+
+    def tracked_verify(self):
+        threads["verify"].add(threading.current_thread().name)
+        return verify(self)
+
+    monkeypatch.setattr(pipeline, "unzip_and_cleanup", tracked_unzip)
+    monkeypatch.setattr(DownloadPipeline, "_verify_loop", tracked_verify)
+    out = tmp_path / "out"
+    stats, counted, snapshots = _run(out, DAYS)
+
+    assert stats["done"] == stats[STATUS_DOWNLOADED] == len(DAYS)
+    assert counted == [1] * len(DAYS)
+    assert sorted(os.listdir(out)) == [f"{d}.export.CSV" for d in DAYS]
+    assert all(name.startswith("gdelt-unzip-") for name in threads["unzip"])
+    assert all(name.startswith("gdelt-verify-") for name in threads["verify"])
+    assert len(snapshots) == len(DAYS)
+    assert set(snapshots[-1]["backlog"]) == {"fetch", "extract", "verify"}
+
+
+def test_existing_zip_goes_straight_to_extraction(served, tmp_path):
+    out = tmp_path / "out"
+    out.mkdir()
+    name = f"{DAYS[0]}.export.CSV.zip"
+    (out / name).write_bytes((served.root / name).read_bytes())
+    stats, counted, _ = _run(out, DAYS[:1])
+    assert stats[STATUS_SKIPPED] == 1 and counted == [1]
+    assert served.hits == []
+    assert os.listdir(out) == [f"{DAYS[0]}.export.CSV"]
+
+
+def test_bad_zip_fails_in_extraction(http_server, tmp_path):
+    http_server({f"{DAYS[0]}.export.CSV.zip": b"not a zip"})
+    out = tmp_path / "out"
+    stats, counted, _ = _run(out, DAYS[:1])
+    assert stats[STATUS_FAILED] == 1 and counted == []
+    assert os.listdir(out) == []
+
+
+def test_size_mismatch_fails_in_verification(served, tmp_path, monkeypatch):
+    unzip = pipeline.unzip_and_cleanup
+
+    def truncating_unzip(file_path, out_dir, log, inventory=None):
+        infos = unzip(file_path, out_dir, log, inventory=inventory)
+        with open(os.path.join(out_dir, infos[0].filename), "r+b") as f:
+            f.truncate(10)
+        return infos
+
+    monkeypatch.setattr(pipeline, "unzip_and_cleanup", truncating_unzip)
+    out = tmp_path / "out"
+    stats, counted, _ = _run(out, DAYS[:2])
+    assert stats[STATUS_FAILED] == 2 and counted == []
+    assert os.listdir(out) == []  # 不完整的 CSV 已刪除，下次會重新下載
+
+
+def test_keep_zip_skips_extraction(served, tmp_path):
+    out = tmp_path / "out"
+    stats, counted, _ = _run(out, DAYS, keep_zip=True)
+    assert stats[STATUS_DOWNLOADED] == len(DAYS) and counted == [1] * len(DAYS)
+    assert sorted(os.listdir(out)) == [f"{d}.export.CSV.zip" for d in DAYS]
@@ -0,0 +1,55 @@
+# 只解析需要的欄位（欄位投影）的測試
+import pandas as pd
+import pytest
+
+from GDELT_helper.processing import core
+from GDELT_helper.processing.core import FilterPlan, ProcessorConfig, SideFilter, process_directory
+from GDELT_helper.processing.schema import iter_typed_csv
+
+
+def test_read_columns_cover_output_and_filters():
+    plan = FilterPlan.compile(ProcessorConfig(selected_columns=["EventCode", "GLOBALEVENTID"]))
+    assert plan.read_columns == ("EventCode", "GLOBALEVENTID", "Actor1CountryCode", "Actor2CountryCode")
+    assert set(plan.output_columns) == {"GLOBALEVENTID", "EventCode"}  # 篩選用欄位只讀不輸出
+
+    plan = FilterPlan.compile(ProcessorConfig(
+        selected_columns=["EventCode"], enable_year_filter=True, year_start=2010, year_end=2015,
+        a2=SideFilter(type_mode="labeled")))
+    assert set(plan.read_columns) == {"EventCode", "Actor1CountryCode", "Actor2CountryCode",
+                                      "Actor2Type1Code", "Year", "SQLDATE"}
+
+    plan = FilterPlan.compile(ProcessorConfig(selected_columns=[]))
+    assert plan.read_columns is None and plan.select is None  # 未選欄位：全部讀入並輸出
+
+
+def test_typed_reader_parses_only_requested_columns(make_daily_file):
+    path = make_daily_file([dict(GLOBALEVENTID=1, EventCode="010", AvgTone="1.5")])
+    df = next(iter_typed_csv(str(path), ["AvgTone", "GLOBALEVENTID", "NotAColumn"]))
+    assert list(df.columns) == ["GLOBALEVENTID", "AvgTone"]  # 依檔案欄序；不存在的欄位略過
+    assert df["AvgTone"].tolist() == [1.5]
+
+
+@pytest.mark.parametrize("chunk_rows", [0, 2])
+def test_run_reads_projected_columns_and_filters_on_unselected_ones(tmp_path, make_daily_file, monkeypatch,
+                                                                     chunk_rows):
+    make_daily_file([dict(GLOBALEVENTID=1, Actor1Type1Code="GOV"),
+                     dict(GLOBALEVENTID=2, Actor1Type1Code="MIL"),
+                     dict(GLOBALEVENTID=3, Actor1Type1Code="GOV")])
+    requested = []
+    real = core.iter_typed_csv
+
+    def spy(path, columns=None, chunksize=None):
+        requested.append(columns)
+        return real(path, columns, chunksize)
+
+    monkeypatch.setattr(core, "iter_typed_csv", spy)
+    out = tmp_path / "out.tsv"
+    cfg = ProcessorConfig(selected_columns=["GLOBALEVENTID"], use_catalog=False, chunk_rows=chunk_rows,
+                          a1=SideFilter(type_mode="custom", type_codes_csv="gov"))
+    process_directory(str(tmp_path / "raw"), str(out), cfg)
+
+    assert [set(c) for c in requested] == [{"GLOBALEVENTID", "Actor1CountryCode", "Actor2CountryCode",
+                                            "Actor1Type1Code"}]
+    got = pd.read_csv(out, sep="\t", dtype=str)
+    assert list(got.columns) == ["GLOBALEVENTID"]  # 篩選用欄位不輸出
+    assert got["GLOBALEVENTID"].tolist() == ["1", "3"]
@@ -0,0 +1,91 @@
+# .part 續傳（HTTP Range）與 416 重來的測試
+import hashlib
+import os
+import threading
+
+import pytest
+
+from GDELT_helper.download import core
+
+NAME = "20150101.export.CSV.zip"
+DATA = bytes(range(256)) * 2000  # 512,000 bytes，跨越數個 CHUNK_SIZE
+
+
+@pytest.fixture
+def served(http_server):
+    return http_server({NAME: DATA})
+
+
+def _fetch(out, **kwargs):
+    return core.fetch_one("20150101", str(out), lambda _m: None, threading.Event(), filename=NAME,
+                          expected_size=len(DATA), expected_md5=hashlib.md5(DATA).hexdigest(), **kwargs)
+
+
+def _write_part(out, data):
+    out.mkdir(parents=True, exist_ok=True)
+    (out / (NAME + core.PART_SUFFIX)).write_bytes(data)
+
+
+def test_resumes_from_part(served, tmp_path):
+    out = tmp_path / "out"
+    _write_part(out, DATA[:100_000])
+    deltas = []
+    status, zip_path = _fetch(out, bytes_cb=deltas.append)
+    assert status == core.STATUS_DOWNLOADED
+    assert open(zip_path, "rb").read() == DATA
+    assert not os.path.exists(zip_path + core.PART_SUFFIX)
+    assert served.range_hits == [(NAME, "bytes=100000-")]
+    assert sum(deltas) == len(DATA)  # 既有內容先回報一次，其餘邊收邊回報
+
+
+def test_complete_part_answered_with_416(served, tmp_path):
+    out = tmp_path / "out"
+    _write_part(out, DATA)
+    status, zip_path = _fetch(out)
+    assert status == core.STATUS_DOWNLOADED  # 416 且總長相符：視為已完成，MD5 涵蓋既有內容
+    assert open(zip_path, "rb").read() == DATA
+    assert served.range_hits == [(NAME, f"bytes={len(DATA)}-")] and served.hits == [f"/{NAME}"]
+
+
+def test_part_longer_than_server_restarts(served, tmp_path):
+    out = tmp_path / "out"
+    _write_part(out, DATA + b"stale tail")
+    deltas = []
+    status, zip_path = _fetch(out, bytes_cb=deltas.append)
+    assert status == core.STATUS_DOWNLOADED
+    assert open(zip_path, "rb").read() == DATA
+    # 第一次帶 Range 被 416 拒絕，作廢後第二次從頭抓（不帶 Range）
+    assert len(served.range_hits) == 1 and served.hits == [f"/{NAME}"] * 2
+    assert sum(deltas) == len(DATA)
+
+
+def test_server_without_range_rewrites_from_scratch(served, tmp_path):
+    served.ranges = False
+    out = tmp_path / "out"
+    _write_part(out, b"x" * 1000)  # 內容不符：若被當成前綴續傳，MD5 會失敗
+    deltas = []
+    status, zip_path = _fetch(out, bytes_cb=deltas.append)
+    assert status == core.STATUS_DOWNLOADED
+    assert open(zip_path, "rb").read() == DATA
+    assert served.hits == [f"/{NAME}"]
+    assert sum(deltas) == len(DATA)
+
+
+def test_stop_keeps_part_for_next_run(served, tmp_path, monkeypatch):
+    out = tmp_path / "out"
+    stop = threading.Event()
+    monkeypatch.setattr(core, "CHUNK_SIZE", 64 * 1024)
+
+    def bytes_cb(_delta):
+        stop.set()  # 收到第一塊就中止
+
+    status, zip_path = core.fetch_one("20150101", str(out), lambda _m: None, stop, filename=NAME,
+                                      expected_size=len(DATA), bytes_cb=bytes_cb)
+    assert status == core.STATUS_STOPPED and zip_path is None
+    kept = (out / (NAME + core.PART_SUFFIX)).read_bytes()
+    assert 0 < len(kept) < len(DATA) and DATA.startswith(kept)
+
+    status, zip_path = _fetch(out)
+    assert status == core.STATUS_DOWNLOADED
+    assert open(zip_path, "rb").read() == DATA
+    assert served.range_hits == [(NAME, f"bytes={len(kept)}-")]
@@ -0,0 +1,103 @@
+# download_targets 對本機 HTTP 替身伺服器的整合測試
+import hashlib
+import io
+import os
+import threading
+import zipfile
+
+import pytest
+
+from GDELT_helper.download import core
+from GDELT_helper.download.manifest import load_manifest, plan_targets
+from GDELT_helper.download.scheduler import download_targets
+
+DAYS = [f"201501{d:02d}" for d in range(1, 7)]
+
+
+def _make_zip(name: str) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        row = "\t".join([f"{i}" for i in range(58)])
+        zf.writestr(name, "\n".join([row] * 50) + "\n")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def server(http_server):
+    """提供數個每日壓縮檔與 md5sums/filesizes 的伺服器；回傳 (Handler 類別, 根目錄)。"""
+    files, md5_lines, size_lines = {}, [], []
+    for day in DAYS:
+        name = f"{day}.export.CSV.zip"
+        data = files[name] = _make_zip(f"{day}.export.CSV")
+        md5_lines.append(f"{hashlib.md5(data).hexdigest()}  {name}")
+        size_lines.append(f"{len(data)} {name}")
+    files["md5sums"] = ("\n".join(md5_lines) + "\n").encode()
+    files["filesizes"] = ("\n".join(size_lines) + "\n").encode()
+    handler = http_server(files)
+    return handler, handler.root
+
+
+def test_downloads_manifest_targets(server, tmp_path):
+    out = tmp_path / "out"
+    manifest = load_manifest(str(out))
+    targets = plan_targets(manifest, [2015])
+    assert [t.base for t in targets] == DAYS
+
+    calls = []
+    stats = download_targets(targets, str(out), lambda _m: None, threading.Event(),
+                             perfile_cb=calls.append, workers=3)
+    assert stats["total"] == stats["done"] == stats["downloaded"] == len(DAYS)
+    assert stats["failed"] == stats["missing"] == stats["stopped"] == 0
+    assert calls == [1] * len(DAYS)
+    assert sorted(f for f in os.listdir(out) if not f.startswith(".")) == [f"{d}.export.CSV" for d in DAYS]
+
+    # 再跑一次：都已存在，全數略過，仍逐檔回報進度
+    calls.clear()
+    stats = download_targets(targets, str(out), lambda _m: None, threading.Event(),
+                             perfile_cb=calls.append, workers=3)
+    assert stats["skipped"] == len(DAYS) and stats["downloaded"] == 0
+    assert calls == [1] * len(DAYS)
+
+
+def test_missing_target_is_counted(server, tmp_path):
+    calls = []
+    stats = download_targets([DAYS[0], "20150131"], str(tmp_path / "out"), lambda _m: None,
+                             threading.Event(), perfile_cb=calls.append, workers=2)
+    assert stats["downloaded"] == 1 and stats["missing"] == 1
+    assert calls == [1]
+
+
+def test_stop_event_halts_run(server, tmp_path):
+    handler, _ = server
+    handler.delay = 0.2
+    stop = threading.Event()
+    calls = []
+
+    def perfile_cb(delta):
+        calls.append(delta)
+        stop.set()  # 第一個檔案完成就要求中止
+
+    stats = download_targets(DAYS, str(tmp_path / "out"), lambda _m: None, stop,
+                             perfile_cb=perfile_cb, workers=1)
+    assert stats["downloaded"] < len(DAYS)
+    assert stats["done"] < len(DAYS) or stats["stopped"] > 0
+    assert len(calls) == stats["downloaded"] + stats["skipped"]
+
+
+def test_stop_before_start_downloads_nothing(server, tmp_path):
+    stop = threading.Event()
+    stop.set()
+    stats = download_targets(DAYS, str(tmp_path / "out"), lambda _m: None, stop, workers=2)
+    assert stats["downloaded"] == 0
+    assert not any(f.endswith(".zip") for f in os.listdir(tmp_path / "out"))
+
+
+def test_server_error_retried_by_one_layer_only(server, tmp_path, monkeypatch):
+    handler, _ = server
+    name = f"{DAYS[0]}.export.CSV.zip"
+    handler.unavailable = frozenset({name})
+    monkeypatch.setattr(core, "backoff_delay", lambda _attempt: 0)
+    stats = download_targets([DAYS[0]], str(tmp_path / "out"), lambda _m: None, threading.Event(), workers=1)
+    assert stats["failed"] == 1
+    # 連線層不重試狀態碼：總請求數等於 fetch_one 的嘗試次數
+    assert sum(1 for p in handler.hits if p.endswith(name)) == core.MAX_ATTEMPTS
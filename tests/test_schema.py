@@ -0,0 +1,30 @@
+# 文字輸出與原始 CSV 的往返一致性
+import pandas as pd
+import pytest
+
+from GDELT_helper.processing.core import ProcessorConfig, process_directory
+from GDELT_helper.processing.schema import DAILY_COLUMNS
+
+# 原始檔常見的浮點寫法：FractionDate 固定四位小數（含結尾的 0）、極小值、整數值、長小數
+FLOATS = [
+    {"FractionDate": "2015.6320", "GoldsteinScale": "-10", "AvgTone": "0.00001",
+     "ActionGeo_Lat": "38", "ActionGeo_Long": "-77.0364"},
+    {"FractionDate": "2015.0027", "GoldsteinScale": "3.4", "AvgTone": "-3.69230769230769",
+     "ActionGeo_Lat": "-0.5", "ActionGeo_Long": ""},
+    {"FractionDate": "2015.1000", "GoldsteinScale": "0", "AvgTone": "12.5",
+     "ActionGeo_Lat": "", "ActionGeo_Long": "179.9999"},
+]
+
+
+@pytest.mark.parametrize("engine", ["pandas", "arrow"])
+def test_text_output_reproduces_source_text(tmp_path, make_daily_file, engine):
+    src = make_daily_file([dict(GLOBALEVENTID=i, EventCode="010", QuadClass=1, NumMentions=10, DATEADDED=20150820,
+                                SOURCEURL="http://x", **floats) for i, floats in enumerate(FLOATS)])
+    out = tmp_path / "out.tsv"
+    process_directory(str(src.parent), str(out), ProcessorConfig(selected_columns=list(DAILY_COLUMNS), engine=engine))
+
+    got = pd.read_csv(out, sep="\t", dtype=str, keep_default_na=False)
+    assert len(got) == len(FLOATS)
+    # 依原始欄序排回後逐行比對位元組
+    lines = ["\t".join(r) for r in got[list(DAILY_COLUMNS)].itertuples(index=False)]
+    assert ("\n".join(lines) + "\n").encode() == src.read_bytes()
@@ -0,0 +1,51 @@
+# 內建欄位登錄表與依欄數判斷檔案格式的測試
+import pandas as pd
+import pytest
+
+from GDELT_helper.processing.core import ProcessorConfig, process_directory
+from GDELT_helper.processing.schema import (
+    DAILY_COLUMNS, HISTORICAL_COLUMNS, SCHEMAS, schema_for_count, sniff_columns, union_columns,
+)
+
+
+def test_registry_widths():
+    assert SCHEMAS["daily"].width == 58 and SCHEMAS["historical"].width == 57
+    assert schema_for_count(58) is SCHEMAS["daily"] and schema_for_count(57) is SCHEMAS["historical"]
+    assert schema_for_count(3) is None
+    assert union_columns() == list(DAILY_COLUMNS)  # 歷史檔欄位是每日檔的前 57 欄
+
+
+@pytest.mark.parametrize("width, expected", [
+    (58, list(DAILY_COLUMNS)),
+    (57, list(HISTORICAL_COLUMNS)),
+    (60, list(DAILY_COLUMNS) + ["Column59", "Column60"]),
+    (40, list(DAILY_COLUMNS)),  # 欄數不符：採每日檔欄位
+])
+def test_sniff_columns_by_width(tmp_path, width, expected):
+    path = tmp_path / "f.CSV"
+    path.write_text("\t".join(["1"] * width) + "\r\n" + "x\n")
+    assert sniff_columns(str(path)) == expected
+
+
+def test_empty_file_sniffs_as_daily(tmp_path):
+    path = tmp_path / "empty.CSV"
+    path.write_text("")
+    assert sniff_columns(str(path)) == list(DAILY_COLUMNS)
+
+
+@pytest.mark.parametrize("engine", ["pandas", "arrow"])
+def test_historical_and_daily_files_in_one_run(tmp_path, make_daily_file, engine):
+    make_daily_file([dict(GLOBALEVENTID=2, SOURCEURL="http://x")])
+    historical = "\t".join(
+        {"GLOBALEVENTID": "1", "SQLDATE": "19790101", "Year": "1979",
+         "Actor1CountryCode": "USA", "Actor2CountryCode": "CHN"}.get(c, "") for c in HISTORICAL_COLUMNS)
+    (tmp_path / "raw" / "1979.csv").write_text(historical + "\n")
+
+    out = tmp_path / "out.tsv"
+    process_directory(str(tmp_path / "raw"), str(out),
+                      ProcessorConfig(selected_columns=["GLOBALEVENTID", "Year", "SOURCEURL"], engine=engine))
+    got = pd.read_csv(out, sep="\t", dtype=str, keep_default_na=False)
+    assert got.sort_values("GLOBALEVENTID")[["GLOBALEVENTID", "Year", "SOURCEURL"]].values.tolist() == [
+        ["1", "1979", ""],  # 歷史檔沒有 SOURCEURL：留空，不會錯位
+        ["2", "2015", "http://x"],
+    ]
@@ -0,0 +1,71 @@
+# 逐塊篩選、立即寫出（串流輸出）的測試
+import pandas as pd
+import pytest
+
+from GDELT_helper.processing import core
+from GDELT_helper.processing.core import ProcessorConfig, process_directory
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """記錄每次寫給輸出檔的列數。"""
+    sizes = []
+    real = core.open_writer
+
+    def open_writer(*args, **kwargs):
+        writer = real(*args, **kwargs)
+        write = writer.write
+
+        def recording_write(df):
+            sizes.append(len(df))
+            write(df)
+
+        writer.write = recording_write
+        return writer
+
+    monkeypatch.setattr(core, "open_writer", open_writer)
+    return sizes
+
+
+def _files(make_daily_file):
+    for day in ("20150820", "20150821", "20150822"):
+        make_daily_file([dict(GLOBALEVENTID=f"{day}{i}", SQLDATE=day) for i in range(7)],
+                        name=f"{day}.export.CSV")
+
+
+@pytest.mark.parametrize("name", ["out.tsv", "out.parquet"])
+def test_each_chunk_is_written_as_read(tmp_path, make_daily_file, written, name):
+    _files(make_daily_file)
+    out = tmp_path / name
+    cfg = ProcessorConfig(selected_columns=["GLOBALEVENTID", "SQLDATE"], chunk_rows=3, use_catalog=False)
+    result = process_directory(str(tmp_path / "raw"), str(out), cfg)
+    assert result["rows_out"] == 21
+    assert written == [3, 3, 1] * 3  # 每塊一寫，不先在記憶體合併整檔
+
+    whole = tmp_path / f"whole{out.suffix}"
+    process_directory(str(tmp_path / "raw"), str(whole), ProcessorConfig(
+        selected_columns=["GLOBALEVENTID", "SQLDATE"], chunk_rows=0, use_catalog=False))
+    read = (lambda p: pd.read_csv(p, sep="\t", dtype=str)) if name.endswith(".tsv") else pd.read_parquet
+    pd.testing.assert_frame_equal(read(out), read(whole))
+
+
+def test_header_written_once(tmp_path, make_daily_file):
+    _files(make_daily_file)
+    out = tmp_path / "out.tsv"
+    process_directory(str(tmp_path / "raw"), str(out),
+                      ProcessorConfig(selected_columns=["GLOBALEVENTID"], chunk_rows=2, use_catalog=False))
+    lines = out.read_text().splitlines()
+    assert lines[0] == "GLOBALEVENTID" and len(lines) == 22
+    assert sum(line == "GLOBALEVENTID" for line in lines) == 1
+
+
+def test_stop_keeps_rows_already_written(tmp_path, make_daily_file, written):
+    _files(make_daily_file)
+    out = tmp_path / "out.tsv"
+    logs = []
+    result = process_directory(str(tmp_path / "raw"), str(out),
+                               ProcessorConfig(selected_columns=["GLOBALEVENTID"], chunk_rows=3, use_catalog=False),
+                               stop_flag=lambda: len(written) >= 4, progress_cb=logs.append)
+    assert "處理已中止。" in logs and result["files_used"] == 1
+    got = pd.read_csv(out, sep="\t", dtype=str)["GLOBALEVENTID"].tolist()
+    assert got == [f"20150820{i}" for i in range(7)] + ["201508210", "201508211", "201508212"]
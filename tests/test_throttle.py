@@ -0,0 +1,105 @@
+# 頻寬上限（RateLimiter）與 AIMD 自適應並行（AdaptiveConcurrency）的測試
+import threading
+import time
+import types
+
+import pytest
+
+from GDELT_helper.download import throttle
+from GDELT_helper.download.pipeline import DownloadPipeline
+from GDELT_helper.download.throttle import AdaptiveConcurrency, RateLimiter
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(throttle, "time", types.SimpleNamespace(monotonic=clock.monotonic, sleep=time.sleep))
+    return clock
+
+
+def test_rate_limiter_allows_burst_then_waits():
+    limiter = RateLimiter(100_000)
+    start = time.monotonic()
+    limiter.consume(100_000)  # 一秒額度：不等待
+    assert time.monotonic() - start < 0.2
+    limiter.consume(40_000)
+    assert time.monotonic() - start >= 0.3
+
+
+def test_rate_limiter_wait_ends_on_stop():
+    limiter = RateLimiter(1000)
+    stop = threading.Event()
+    stop.set()
+    start = time.monotonic()
+    limiter.consume(100_000, stop)  # 本應等約 100 秒
+    assert time.monotonic() - start < 0.5
+
+
+def test_additive_increase_while_throughput_holds(clock):
+    ctl = AdaptiveConcurrency(2, max_limit=4)
+    for limit in (2, 3, 4):
+        assert ctl.limit == limit
+        for _ in range(limit):  # 一個觀測窗：limit 次成功
+            clock.now += 1
+            ctl.on_success(1000)
+    assert ctl.limit == 4  # 不超過上限
+
+
+def test_no_increase_when_throughput_drops(clock):
+    ctl = AdaptiveConcurrency(2)
+    for _ in range(2):
+        clock.now += 1
+        ctl.on_success(1000)
+    assert ctl.limit == 3
+    for _ in range(3):
+        clock.now += 10  # 吞吐量掉到十分之一
+        ctl.on_success(1000)
+    assert ctl.limit == 3
+
+
+def test_multiplicative_decrease_with_cooldown(clock):
+    logs = []
+    ctl = AdaptiveConcurrency(8, min_limit=2, log=logs.append)
+    ctl.on_error()
+    assert ctl.limit == 4
+    ctl.on_error()  # 冷卻期內：不再減
+    assert ctl.limit == 4
+    clock.now += AdaptiveConcurrency.ERROR_COOLDOWN + 0.1
+    ctl.on_error()
+    assert ctl.limit == 2
+    clock.now += AdaptiveConcurrency.ERROR_COOLDOWN + 0.1
+    ctl.on_error()
+    assert ctl.limit == 2  # 不低於下限
+    assert len(logs) == 2
+
+
+def test_acquire_blocks_at_limit_and_honours_stop():
+    ctl = AdaptiveConcurrency(1)
+    assert ctl.acquire()
+    stop = threading.Event()
+    stop.set()
+    assert not ctl.acquire(stop)  # 名額已滿且要求中止
+    released = threading.Timer(0.2, ctl.release)
+    released.start()
+    assert ctl.acquire(threading.Event())  # 等到前一個釋放
+    released.join()
+
+
+def test_pipeline_respects_bandwidth_cap(http_server, tmp_path):
+    payload = bytes(range(256)) * 1200  # 307,200 bytes；只量測下載時間，內容不必是有效壓縮檔
+    http_server({f"201501{d:02d}.zip": payload for d in (1, 2)})
+    pipe = DownloadPipeline(str(tmp_path / "out"), lambda _m: None, threading.Event(), fetch_workers=2,
+                            max_bytes_per_sec=300_000, keep_zip=True)
+    start = time.monotonic()
+    pipe.run(["20150101", "20150102"])
+    # 共 614,400 bytes：前 300,000 為一秒額度，其餘以 300 KB/s 送出，至少約 1 秒
+    assert time.monotonic() - start >= 0.9
+    assert pipe.limiter is not None and pipe.limiter.rate == 300_000
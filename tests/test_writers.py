@@ -0,0 +1,131 @@
+# 串流寫出器（processing.writers）
+import io
+
+import pandas as pd
+import pytest
+
+from GDELT_helper.processing import writers
+from GDELT_helper.processing.core import ProcessorConfig, process_directory
+from GDELT_helper.processing.schema import to_text
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.feather as feather  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+
+def test_arrow_writer_without_open_fails_on_construction(tmp_path):
+    class Incomplete(writers._ArrowStreamWriter):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete(str(tmp_path / "out.parquet"), ["Year"])
+    assert not list(tmp_path.iterdir())
+
+
+COLUMNS = ["SQLDATE", "Actor1CountryCode", "GoldsteinScale", "NumMentions"]
+
+
+def _frame():
+    return pd.DataFrame({
+        "SQLDATE": pd.array([20150820, None], dtype="Int64"),
+        "Actor1CountryCode": pd.Series(["USA", None], dtype="category"),
+        "GoldsteinScale": [1.5, None],
+        "NumMentions": pd.array([3, 4], dtype="Int64"),
+    })
+
+
+def _write(path, df, **kw):
+    w = writers.open_writer(str(path), COLUMNS, **kw)
+    w.write(to_text(df) if w.wants_text else df)
+    w.close()
+    return w
+
+
+@pytest.mark.parametrize("name", ["out.csv", "out.tsv", "out.csv.gz", "out.csv.zst"])
+def test_text_round_trip(tmp_path, name):
+    path = tmp_path / name
+    _write(path, _frame())
+    if name.endswith(".zst"):  # pandas 讀 .zst 需要 zstandard，改用 pyarrow 解壓
+        with pa.CompressedInputStream(pa.OSFile(str(path)), "zstd") as f:
+            path = io.BytesIO(f.read())
+    back = pd.read_csv(path, sep="\t", dtype=str, keep_default_na=False)
+    assert list(back.columns) == COLUMNS
+    assert back.values.tolist() == [["20150820", "USA", "1.5", "3"], ["", "", "", "4"]]
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_csv_is_tab_separated_unless_comma_requested(tmp_path):
+    _write(tmp_path / "tab.csv", _frame())
+    _write(tmp_path / "comma.csv", _frame(), sep=",")
+    assert (tmp_path / "tab.csv").read_text().splitlines()[0] == "\t".join(COLUMNS)
+    assert (tmp_path / "comma.csv").read_text().splitlines()[0] == ",".join(COLUMNS)
+
+
+@pytest.mark.parametrize("name", ["out.parquet", "out.feather"])
+def test_columnar_schema_and_null_coercion(tmp_path, name):
+    df = _frame()
+    df["NumMentions"] = pd.Series(["3", "x"], dtype=object)  # 讀檔時因髒值保留成字串的數值欄
+    path = tmp_path / name
+    w = _write(path, df)
+    assert w.coerced == ["NumMentions"]
+    table = (pq.read_table if name.endswith(".parquet") else feather.read_table)(path)
+    assert [str(t) for t in table.schema.types] == ["int64", "string", "double", "int64"]
+    assert table.column("NumMentions").to_pylist() == [3, None]
+    assert table.column("Actor1CountryCode").to_pylist() == ["USA", None]
+    assert table.column("SQLDATE").null_count == 1
+
+
+@pytest.mark.parametrize("name", ["out.tsv", "out.tsv.gz", "out.parquet", "out.feather"])
+def test_no_rows_leaves_no_file(tmp_path, name):
+    w = writers.open_writer(str(tmp_path / name), COLUMNS)
+    w.write(_frame().iloc[:0])
+    w.close()
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize("name", ["out.tsv", "out.parquet"])
+def test_abort_removes_partial_output(tmp_path, name):
+    w = writers.open_writer(str(tmp_path / name), COLUMNS)
+    df = _frame()
+    w.write(to_text(df) if w.wants_text else df)
+    w.abort()
+    assert not list(tmp_path.iterdir())
+
+
+def test_sav_requires_pyreadstat(tmp_path):
+    try:
+        import pyreadstat  # noqa: F401
+    except ImportError:
+        with pytest.raises(ImportError, match="pyreadstat"):
+            writers.open_writer(str(tmp_path / "out.sav"), COLUMNS)
+    else:
+        pytest.skip("pyreadstat 已安裝")
+
+
+@pytest.mark.parametrize("name", ["out.parquet.gz", "out.sav.zst"])
+def test_compressed_columnar_rejected(tmp_path, name):
+    with pytest.raises(ValueError):
+        writers.open_writer(str(tmp_path / name), COLUMNS)
+
+
+def test_incremental_rerun_with_other_separator_rewrites(tmp_path, make_daily_file):
+    raw = make_daily_file(3).parent
+    out = tmp_path / "out.csv"
+    cfg = dict(incremental=True, selected_columns=["SQLDATE", "Actor1CountryCode"])
+    process_directory(str(raw), str(out), ProcessorConfig(**cfg))
+    assert out.read_text().splitlines()[1] == "20150820\tUSA"
+    process_directory(str(raw), str(out), ProcessorConfig(text_sep=",", **cfg))
+    assert out.read_text().splitlines() == ["SQLDATE,Actor1CountryCode"] + ["20150820,USA"] * 3
+
+
+def test_columnar_rollback_only_within_buffer(tmp_path, monkeypatch):
+    w = writers.open_writer(str(tmp_path / "out.parquet"), COLUMNS)
+    w.write(_frame())
+    mark = w.mark()
+    w.write(_frame())
+    assert w.rollback(mark) and w.rows == 2
+    monkeypatch.setattr(writers, "ROW_GROUP_ROWS", 1)
+    w.write(_frame())  # 立即寫出 row group
+    assert not w.rollback(mark) and w.rows == 4
+    w.close()
+    assert len(pq.read_table(tmp_path / "out.parquet")) == 4